@@ -1,15 +1,43 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.schemas.api_schema import CrawlRequest, CrawlResponse
-from app.schemas.error_schema import ErrorResponse, WebScraperError
+from app.schemas.api_schema import CrawlRequest, CrawlResponse, ProfilingUpdate
+from app.schemas.error_schema import ErrorResponse, WebScraperError, RETRY_ERROR_TYPES
+from app.config.strigil_config import config
+from app.services.cancellation import cancel_crawl, crawl_deadline
 from app.services.crawler import run_crawl
+from app.services.crawl_pool import crawl_pool
+from app.services.metrics import metrics
+from app.services.profiling import profile_artifact, profile_next, profiling_status, should_profile
+from app.services.throttle import domain_throttle  # registers per-domain limits with /metrics
+from app.services.page_cache import page_cache  # registers cache hit rate with /metrics
+from app.services.warmup import warmup
+import asyncio
 import traceback
+import uuid
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy components are warmed up in the background so the API answers /health right away
+    warmup_task = None
+    if config.warmup.enabled:
+        warmup_task = asyncio.create_task(warmup.run())
+    elif config.crawl_pool.enabled:
+        crawl_pool.start()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await crawl_pool.close()
+    if config.crawl_engine == "asyncio":
+        from app.services.async_engine import close_browser
+        await close_browser()
 
 app = FastAPI(
     title="WebStrigil API",
     description="API for recursive web scraping with LLM integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -21,10 +49,32 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+async def cancel_on_disconnect(http_request: Request, crawl_id: str):
+    """Cancel a crawl once the client that asked for it has gone; nobody would get its result"""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(config.deadlines.disconnect_poll_interval)
+    print(f"DEBUG: Client of crawl {crawl_id} disconnected")
+    if config.crawl_pool.enabled:
+        crawl_pool.cancel(crawl_id, "client_disconnected")
+    else:
+        cancel_crawl(crawl_id, "client_disconnected")
+
 @app.post("/crawl", response_model=CrawlResponse)
-async def crawl_endpoint(request: CrawlRequest):
+async def crawl_endpoint(request: CrawlRequest, http_request: Request):
+    watcher = None
     try:
-        session, errors = await run_crawl(request.start_url, request.user_instruction, request.max_depth)
+        crawl_id = uuid.uuid4().hex
+        if config.deadlines.cancel_on_disconnect:
+            watcher = asyncio.create_task(cancel_on_disconnect(http_request, crawl_id))
+        # Crawls run in worker processes when the pool is enabled, otherwise in this process
+        crawl = crawl_pool.submit if config.crawl_pool.enabled else run_crawl
+        session, errors = await crawl(
+            request.start_url, request.user_instruction, request.max_depth,
+            fresh_only=request.fresh_only,
+            crawl_id=crawl_id,
+            profile=should_profile(request.profile),
+            deadline=crawl_deadline(request.deadline_seconds),
+        )
         
         # Convert session history to public format
         public_history = []
@@ -32,13 +82,26 @@ async def crawl_endpoint(request: CrawlRequest):
             if hasattr(ctx, 'to_public_context'):
                 public_history.append(ctx.to_public_context())
         errors = [*session.errors,*errors]
+        # Retries and circuit breaker pauses are reported, but do not fail the crawl on their own
+        failures = [error for error in errors if error.error_type not in RETRY_ERROR_TYPES]
         
+        completion = session.completion
+        if completion.truncated:
+            message = f"Crawl truncated ({completion.truncated_reason}) after {len(public_history)} pages"
+        else:
+            message = "Crawl completed successfully" if not failures else "Crawl completed with errors"
+
         # Prepare response
         response_data = {
-            "success": len(errors) == 0,
+            "success": len(failures) == 0,
             "history": [ctx.model_dump() for ctx in public_history],
             "errors": [error.model_dump() for error in errors] if errors else None,
-            "message": "Crawl completed successfully" if not errors else "Crawl completed with errors"
+            "message": message,
+            "completion": session.completion.model_dump(),
+            "crawl_id": session.crawl_id,
+            "profile": session.profile.model_dump() if session.profile is not None else None,
+            "export": session.export.model_dump() if session.export is not None else None,
+            "truncated": completion.truncated,
         }
         
         return JSONResponse(content=response_data)
@@ -61,7 +124,39 @@ async def crawl_endpoint(request: CrawlRequest):
             status_code=500,
             content=error_response.model_dump()
         )
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return JSONResponse(content=metrics.snapshot())
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    # 503 until the warm-up has finished, so load balancers only route crawls to warm instances
+    return JSONResponse(status_code=200 if warmup.ready else 503, content=warmup.report()) 
+
+@app.get("/admin/profiling")
+async def profiling_settings():
+    return profiling_status()
+
+@app.post("/admin/profiling")
+async def update_profiling(update: ProfilingUpdate):
+    # Applies to crawls started by this process; pool workers are told per crawl
+    if update.sample_rate is not None:
+        config.profiling.sample_rate = update.sample_rate
+    if update.profile_next is not None:
+        profile_next(update.profile_next)
+    return profiling_status()
+
+@app.get("/profiles/{crawl_id}/{name}")
+async def profile_artifact_endpoint(crawl_id: str, name: str):
+    path = profile_artifact(crawl_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    return FileResponse(path)
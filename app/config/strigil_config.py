@@ -1,6 +1,8 @@
+import importlib.util
 import json
-from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+import os
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, Any, Optional, List, Literal
 
 class LLMTimeoutConfig(BaseModel):
     """Timeout configuration for LLM API calls"""
@@ -22,6 +24,190 @@ class TimeoutConfig(BaseModel):
     scrapy: ScrapyTimeoutConfig = Field(default_factory=ScrapyTimeoutConfig)
     playwright: PlaywrightTimeoutConfig = Field(default_factory=PlaywrightTimeoutConfig)
 
+class ThrottleConfig(BaseModel):
+    """Per-domain adaptive concurrency and politeness settings (AIMD)"""
+    enabled: bool = Field(default=True, description="Enable the adaptive per-domain throttle")
+    initial_concurrency: float = Field(default=2.0, description="Concurrent requests allowed per domain before any feedback")
+    min_concurrency: float = Field(default=1.0, description="Lower bound for per-domain concurrency")
+    max_concurrency: float = Field(default=8.0, description="Upper bound for per-domain concurrency")
+    concurrency_step: float = Field(default=0.5, description="Additive concurrency increase after a fast, successful response")
+    backoff_factor: float = Field(default=0.5, description="Multiplicative concurrency decrease after an error or throttling response")
+    initial_delay: float = Field(default=0.0, description="Delay between request starts per domain in seconds")
+    min_delay: float = Field(default=0.0, description="Lower bound for the per-domain delay in seconds")
+    max_delay: float = Field(default=30.0, description="Upper bound for the per-domain delay in seconds")
+    delay_step: float = Field(default=0.1, description="Additive delay decrease after a fast, successful response in seconds")
+    target_latency: float = Field(default=5.0, description="Render latency in seconds below which a domain is considered healthy")
+    throttled_statuses: List[int] = Field(default=[429, 503], description="HTTP statuses treated as a throttling signal")
+    max_throttle_retries: int = Field(default=3, description="Times a throttled request is re-queued before it is reported as an error")
+    default_retry_after: float = Field(default=5.0, description="Pause applied to a throttled domain without a Retry-After header, in seconds")
+    max_retry_after: float = Field(default=120.0, description="Upper bound for honoured Retry-After values in seconds")
+    obey_robots_crawl_delay: bool = Field(default=False, description="Use the robots.txt Crawl-delay as a minimum delay per domain")
+    poll_interval: float = Field(default=0.05, description="Interval in seconds at which waiting requests re-check their domain slot")
+
+class PageCacheConfig(BaseModel):
+    """Shared on-disk cache of extracted page details"""
+    enabled: bool = Field(default=False, description="Serve fresh cached extractions instead of rendering pages; off by default, so every page goes through the browser unless this is turned on")
+    directory: str = Field(default=".cache/pages", description="Directory holding the cached extractions")
+    ttl: float = Field(default=900.0, description="Seconds a cached extraction is served without revalidation")
+    max_bytes: int = Field(default=256 * 1024 * 1024, description="Total size of the cache directory before least recently used entries are evicted")
+    revalidate: bool = Field(default=True, description="Revalidate expired entries with a conditional HEAD request using ETag/Last-Modified")
+    revalidate_timeout: float = Field(default=5.0, description="Timeout for the revalidation request in seconds")
+
+class LLMBackendConfig(BaseModel):
+    """An OpenAI-compatible API endpoint"""
+    name: str = Field(description="Name the routes refer to")
+    base_url: str = Field(default="https://openrouter.ai/api/v1", description="Base URL of the OpenAI-compatible API")
+    api_key_env: str = Field(default="OPEN_ROUTER_KEY", description="Environment variable holding the API key")
+
+class LLMRouteConfig(BaseModel):
+    """A model served by one of the configured backends"""
+    backend: str = Field(default="openrouter", description="Name of the backend serving the model")
+    model: str = Field(description="Model identifier sent to the backend")
+    input_cost_per_1k: float = Field(default=0.0, description="Cost per 1000 prompt tokens, used for cost accounting")
+    output_cost_per_1k: float = Field(default=0.0, description="Cost per 1000 completion tokens, used for cost accounting")
+
+class LLMTierConfig(BaseModel):
+    """One step of the model cascade"""
+    route: LLMRouteConfig
+    hedge: Optional[LLMRouteConfig] = Field(default=None, description="Alternate route raced against the primary when hedging is enabled")
+
+class LLMRoutingConfig(BaseModel):
+    """Model cascade and request hedging across OpenAI-compatible backends"""
+    backends: List[LLMBackendConfig] = Field(
+        default_factory=lambda: [LLMBackendConfig(name="openrouter")],
+        description="Available OpenAI-compatible endpoints"
+    )
+    tiers: List[LLMTierConfig] = Field(
+        default_factory=list,
+        description="Cascade ordered from cheapest to strongest model; empty uses llm_model on the first backend"
+    )
+    escalate_below_confidence: float = Field(default=0.5, description="Escalate to the next tier when the reported confidence is below this value")
+    hedging: bool = Field(default=False, description="Race a tier's hedge route once the primary exceeds its hedge delay")
+    hedge_quantile: float = Field(default=95.0, description="Latency percentile of the primary route used as the hedge delay")
+    hedge_min_samples: int = Field(default=20, description="Latency samples needed before the percentile replaces the default hedge delay")
+    hedge_default_delay: float = Field(default=8.0, description="Hedge delay in seconds until enough latency samples exist")
+    hedge_min_delay: float = Field(default=1.0, description="Lower bound for the hedge delay in seconds")
+
+class ResilienceConfig(BaseModel):
+    """Retries, backoff and circuit breaking for LLM calls and page fetches"""
+    llm_max_retries: int = Field(default=3, description="Retries of a transient LLM failure (timeout, 429, 5xx) per tier")
+    fetch_max_retries: int = Field(default=2, description="Times a failed page fetch is re-queued")
+    retry_base_delay: float = Field(default=0.5, description="Base of the jittered exponential backoff in seconds")
+    retry_max_delay: float = Field(default=20.0, description="Upper bound for a single backoff in seconds")
+    retry_budget: int = Field(default=50, description="Total retries (LLM and fetch) allowed per crawl")
+    breaker_failure_threshold: int = Field(default=5, description="Consecutive transient failures that open a backend's circuit")
+    breaker_reset_timeout: float = Field(default=30.0, description="Seconds an open circuit fails fast before a probe request is let through")
+    max_outage_pause: float = Field(default=120.0, description="Seconds a crawl stays paused waiting for an open circuit before giving up on a page")
+
+class CrawlPoolConfig(BaseModel):
+    """Process-pool crawl backend: each worker process runs its own reactor and browser"""
+    enabled: bool = Field(default=False, description="Run crawls in worker processes instead of the API process")
+    workers: int = Field(default=4, description="Number of worker processes")
+    jobs_per_worker: int = Field(default=2, description="Crawls a worker runs concurrently")
+    max_job_attempts: int = Field(default=2, description="Times a crawl is dispatched before a worker crash fails it")
+    restart_delay: float = Field(default=1.0, description="Seconds to wait before restarting a crashed worker")
+
+class AsyncEngineConfig(BaseModel):
+    """Native asyncio Playwright engine settings"""
+    concurrency: int = Field(default=8, description="Pages rendered concurrently per crawl")
+    headless: bool = Field(default=True, description="Launch Chromium headless")
+    wait_until: str = Field(default="networkidle", description="Playwright load state awaited after navigation")
+
+class LLMBatchingConfig(BaseModel):
+    """Batched LLM decisions for sibling pages reached from the same parent"""
+    enabled: bool = Field(default=False, description="Ask for sibling pages in one LLM request instead of one request per page")
+    window: float = Field(default=0.25, description="Seconds to wait for more siblings after the first page of a batch arrives")
+    max_batch_size: int = Field(default=6, description="Pages sent in one request; a full batch is sent without waiting")
+    page_text_chars: int = Field(default=1000, description="Characters of page text included per page in a batch")
+
+class MemoryConfig(BaseModel):
+    """Compaction of the page history sent to the LLM on deep crawls"""
+    enabled: bool = Field(default=True, description="Compact the history block once the crawl grows past full_history_pages")
+    full_history_pages: int = Field(default=12, description="Pages visited before the history is compacted; below this every summary is sent")
+    recent_summaries: int = Field(default=6, description="Most recent page summaries kept verbatim")
+    relevant_summaries: int = Field(default=4, description="Older summaries sharing the most words with the instruction, kept verbatim")
+    branch_depth: int = Field(default=1, description="Depth of the page that roots a branch of the crawl tree; pages above it share the root branch")
+    max_branch_digests: int = Field(default=8, description="Branches with their own digest; the least recently active are merged")
+    digest_max_chars: int = Field(default=500, description="Size limit of one branch digest")
+    fold: Literal["local", "llm"] = Field(default="local", description="Fold older summaries by truncation, or with a batched LLM call on the cheapest tier")
+    fold_every: int = Field(default=5, description="Pages a branch collects before its LLM digest is refreshed")
+
+class EarlyStopConfig(BaseModel):
+    """Ending the whole crawl once the LLM reports the instruction as answered"""
+    enabled: bool = Field(default=False, description="Stop the crawl once the aggregated satisfaction reaches the threshold; off by default so crawls only end when their pages run out")
+    threshold: float = Field(default=0.9, description="Combined satisfaction confidence at which the crawl stops")
+    min_pages: int = Field(default=1, description="Pages that must report the instruction satisfied before the crawl can stop")
+    default_confidence: float = Field(default=0.7, description="Confidence assumed when a page reports satisfaction without one")
+
+class RecordingConfig(BaseModel):
+    """Record crawls into a local archive, or replay an archive fully offline"""
+    mode: Literal["off", "record", "replay"] = Field(default="off", description="Record rendered pages and LLM exchanges, or serve them from the archive")
+    directory: str = Field(default=".cache/recordings", description="Directory holding archives given by name")
+    archive: Optional[str] = Field(default=None, description="Archive name or path; recording defaults to a new timestamped archive")
+    strip_scripts: bool = Field(default=True, description="Remove <script> elements from snapshots so replayed pages render the recorded DOM unchanged")
+    har: bool = Field(default=False, description="Also write a HAR file of each recorded browser context, for inspection")
+
+class ProfilingConfig(BaseModel):
+    """Opt-in per-crawl profiling of allocations, CPU time and Chromium memory"""
+    sample_rate: float = Field(default=0.0, description="Fraction of crawls profiled without being asked for it, e.g. 0.01")
+    directory: str = Field(default=".cache/profiles", description="Directory for profile artifacts, one subdirectory per crawl")
+    tracemalloc: bool = Field(default=True, description="Trace Python allocations of requested profiles; slows allocation-heavy code in the whole process several times while it runs")
+    sampled_tracemalloc: bool = Field(default=False, description="Also trace allocations of crawls profiled by sampling, which otherwise get only the low-overhead CPU and Chromium profiles")
+    tracemalloc_frames: int = Field(default=1, description="Stack frames kept per traced allocation")
+    top_allocators: int = Field(default=25, description="Allocation sites listed in the crawl result")
+    cpu_interval: float = Field(default=0.01, description="Seconds between CPU stack samples")
+    top_functions: int = Field(default=25, description="Functions listed in the crawl result, by CPU samples")
+    browser_interval: float = Field(default=1.0, description="Seconds between samples of Chromium process memory")
+    page_metrics: bool = Field(default=True, description="Read Chromium performance metrics of every page over CDP, for full profiles only")
+
+class ExportConfig(BaseModel):
+    """Streaming export of crawl pages and errors to files while the crawl runs"""
+    sinks: List[Literal["jsonl", "parquet", "sqlite"]] = Field(default_factory=list, description="Sinks every crawl is exported to; parquet needs pyarrow")
+    directory: str = Field(default=".cache/exports", description="Directory for exported files, one subdirectory per crawl")
+    batch_size: int = Field(default=200, description="Records written to the sinks in one batch")
+    flush_interval: float = Field(default=1.0, description="Seconds after which a partial batch is written")
+    max_queue: int = Field(default=2000, description="Records waiting for the writer; a full queue holds the crawl back until it catches up")
+    rotate_bytes: int = Field(default=256 * 1024 * 1024, description="Start a new file once the current one reaches this size")
+    parquet_row_group: int = Field(default=1000, description="Rows per Parquet row group")
+    release_page_text: bool = Field(default=False, description="Drop page text from the in-memory history once exported; the API response then has empty page text")
+
+    @field_validator("sinks")
+    @classmethod
+    def check_sinks(cls, sinks: List[str]) -> List[str]:
+        if "parquet" in sinks and importlib.util.find_spec("pyarrow") is None:
+            raise ValueError("Parquet export needs pyarrow: pip install pyarrow")
+        return sinks
+
+class SummaryStoreConfig(BaseModel):
+    """Instruction-independent page summaries shared by the crawls of a process"""
+    enabled: bool = Field(default=True, description="Send a known page's stored summary and structure with a text excerpt instead of its full text, and reuse the summary in the history")
+    max_entries: int = Field(default=10000, description="Summaries kept before the least recently used are evicted")
+    max_age: float = Field(default=86400.0, description="Seconds a summary is used before it is stale and the page is summarized again")
+    digest_max_chars: int = Field(default=300, description="Size limit of the structural digest of a page")
+    excerpt_chars: int = Field(default=500, description="Characters of a known page's text still sent with its stored summary, so actions can be grounded in the page")
+
+class InteractionConfig(BaseModel):
+    """Clicking elements without an href in the rendered page instead of navigating"""
+    enabled: bool = Field(default=True, description="Click buttons, tabs and client-side route links in place and crawl the states they reveal")
+    max_states_per_page: int = Field(default=10, description="Clicks tried on one rendered page, including the states reached from it")
+    click_timeout: float = Field(default=2.0, description="Seconds to wait for an element to become clickable")
+    settle_timeout: float = Field(default=3.0, description="Seconds to wait for the DOM or the route to change after a click")
+    quiet_period: float = Field(default=0.2, description="Seconds without DOM mutations after which a changed page is considered settled")
+
+class DeadlineConfig(BaseModel):
+    """Crawl deadlines and cancellation when the API client goes away"""
+    default_seconds: Optional[float] = Field(default=None, description="Wall-clock deadline of crawls that do not set one, in seconds; None for no deadline")
+    max_seconds: Optional[float] = Field(default=None, description="Upper bound for the deadline a crawl may ask for, in seconds")
+    cancel_on_disconnect: bool = Field(default=True, description="Cancel a crawl when the client that requested it disconnects")
+    disconnect_poll_interval: float = Field(default=1.0, description="Seconds between checks whether the client is still connected")
+
+class WarmupConfig(BaseModel):
+    """Start-up warm-up run by the API lifespan and reported by /ready"""
+    enabled: bool = Field(default=True, description="Warm up heavy components at start-up instead of on the first crawl")
+    prelaunch_browser: bool = Field(default=True, description="Launch the shared browser of the asyncio engine ahead of the first crawl")
+    preopen_llm_connections: bool = Field(default=True, description="Open connections to the LLM backends ahead of the first call")
+    stage_timeout: float = Field(default=30.0, description="Seconds a single warm-up stage may take before it is marked failed")
+
 class StrigilConfig(BaseModel):
     """Main configuration for the WebStrigil application"""
     system_prompt: str = Field(
@@ -33,22 +219,49 @@ class StrigilConfig(BaseModel):
         default="deepseek/deepseek-chat-v3-0324:free",
         description="Model used by the crawl guiding LLM"
     )
+    llm_routing: LLMRoutingConfig = Field(default_factory=LLMRoutingConfig)
+    resilience: ResilienceConfig = Field(default_factory=ResilienceConfig)
+    throttle: ThrottleConfig = Field(default_factory=ThrottleConfig)
+    crawl_pool: CrawlPoolConfig = Field(default_factory=CrawlPoolConfig)
+    crawl_engine: Literal["scrapy", "asyncio"] = Field(
+        default="scrapy",
+        description="Crawl engine: Scrapy with scrapy-playwright, or Playwright driven directly from asyncio"
+    )
+    async_engine: AsyncEngineConfig = Field(default_factory=AsyncEngineConfig)
+    page_cache: PageCacheConfig = Field(default_factory=PageCacheConfig)
+    warmup: WarmupConfig = Field(default_factory=WarmupConfig)
+    memory: MemoryConfig = Field(default_factory=MemoryConfig)
+    llm_batching: LLMBatchingConfig = Field(default_factory=LLMBatchingConfig)
+    early_stop: EarlyStopConfig = Field(default_factory=EarlyStopConfig)
+    recording: RecordingConfig = Field(default_factory=RecordingConfig)
+    profiling: ProfilingConfig = Field(default_factory=ProfilingConfig)
+    export: ExportConfig = Field(default_factory=ExportConfig)
+    deadlines: DeadlineConfig = Field(default_factory=DeadlineConfig)
+    interaction: InteractionConfig = Field(default_factory=InteractionConfig)
+    summary_store: SummaryStoreConfig = Field(default_factory=SummaryStoreConfig)
+
+    @model_validator(mode="after")
+    def check_recording(self) -> "StrigilConfig":
+        if self.recording.mode == "record" and self.crawl_pool.enabled:
+            raise ValueError("recording.mode 'record' needs crawl_pool.enabled off: worker processes would write to the same archive")
+        return self
     
     # Add additional configuration sections as needed
     # For example:
     # crawler_settings: CrawlerSettings = Field(default_factory=CrawlerSettings)
     # api_settings: APISettings = Field(default_factory=APISettings)
 
-def load_config(config_path: str = 'app/config/strigil_config.json') -> StrigilConfig:
+def load_config(config_path: Optional[str] = None) -> StrigilConfig:
     """
     Load configuration from JSON file and validate with Pydantic
     
     Args:
-        config_path: Path to the configuration JSON file
+        config_path: Path to the configuration JSON file, defaults to the STRIGIL_CONFIG environment variable
         
     Returns:
         Validated StrigilConfig object
     """
+    config_path = config_path or os.getenv("STRIGIL_CONFIG", 'app/config/strigil_config.json')
     try:
         with open(config_path) as f:
             config_data = json.load(f)
@@ -75,11 +288,34 @@ def load_config(config_path: str = 'app/config/strigil_config.json') -> StrigilC
             - `"target"`: the `key` of the element
             - `"reason"`: a short sentence explaining why
             - `"goal:`: the new goal you would like to achieve after performing the action
+            3) A `"confidence"` between 0 and 1 for how sure you are about the chosen actions
+            4) `"instruction_satisfied"`: true if the pages seen so far, including this one, already answer the user's prompt, with a `"satisfaction_confidence"` between 0 and 1
 
             Only include clickable elements that seem promising. If nothing looks useful, return only a single 'stop' action.
             """
         )
 
-# Load the configuration
-config = load_config()
+_config: Optional[StrigilConfig] = None
+
+def get_config() -> StrigilConfig:
+    """Return the application configuration, reading and validating it on first use"""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+class _LazyConfig:
+    """
+    Stand-in for the configuration object that loads it on first attribute access,
+    so importing a module that reads `config` does not touch the file system
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_config(), name, value)
+
+# The configuration, loaded on first use
+config = _LazyConfig()
 
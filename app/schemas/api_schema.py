@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Dict, Optional, List
 from app.schemas.response_schema import LLMAction
 from app.schemas.error_schema import WebScraperError
 
@@ -7,6 +7,9 @@ class CrawlRequest(BaseModel):
     start_url: HttpUrl
     user_instruction: str
     max_depth: Optional[int] = 3
+    fresh_only: bool = False  # bypass the shared page cache and render every page
+    profile: bool = False  # profile allocations, CPU time and Chromium memory of this crawl
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)  # wall-clock limit; the crawl is cut short and returns what it has
 
 
 class PageDetailsPublic(BaseModel):
@@ -26,8 +29,55 @@ class PageContextPublic(BaseModel):
     actions: List[LLMAction]
     visited_keys: List[str]  # convert from set
 
+class CrawlCompletion(BaseModel):
+    """Whether the crawl answered the instruction, and what stopping early saved"""
+    instruction_satisfied: bool = False
+    confidence: float = 0.0  # combined satisfaction confidence across pages
+    satisfied_by: List[str] = []  # pages that reported the instruction satisfied
+    stopped_early: bool = False
+    pages_avoided: int = 0  # queued or in-flight pages dropped by the early stop
+    estimated_seconds_saved: Optional[float] = None
+    truncated: bool = False  # cancelled before it finished; the history holds the pages done until then
+    truncated_reason: Optional[str] = None  # "deadline" or "client_disconnected"
+    pages_dropped: int = 0  # queued or in-flight pages abandoned by the cancellation
+    release_seconds: Optional[float] = None  # from the cancellation until the crawl had let go of its browser pages and LLM calls
+
+class CrawlExport(BaseModel):
+    """Files a crawl was streamed to"""
+    directory: str
+    files: List[str] = []
+    pages: int = 0
+    errors: int = 0
+    failures: List[str] = []  # sink errors; records may be missing from the failing sink
+
+class ProfilingUpdate(BaseModel):
+    """Admin change to crawl profiling; fields left out are unchanged"""
+    sample_rate: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    profile_next: Optional[int] = Field(default=None, ge=0)  # profile this many upcoming crawls
+
+class CrawlProfile(BaseModel):
+    """Headline numbers of a profiled crawl and where its artifacts are"""
+    crawl_id: str
+    level: str = "full"  # "sampled" profiles leave out allocations unless configured otherwise
+    seconds: float
+    directory: str
+    artifacts: Dict[str, str] = {}  # artifact name to the API path serving it
+    peak_traced_mb: Optional[float] = None  # peak Python memory traced while the crawl ran, process-wide; approximate when profiled crawls overlap
+    top_allocators: List[dict] = []
+    cpu_samples: int = 0
+    idle_ratio: Optional[float] = None  # share of event loop samples waiting for I/O
+    top_functions: List[dict] = []
+    browser_peak_rss_mb: Optional[float] = None
+    browser_processes: Optional[int] = None
+    page_metrics: Dict[str, float] = {}  # peak Chromium per-page metrics, e.g. JSHeapUsedSize
+
 class CrawlResponse(BaseModel):
     success: bool = True
     history: List[PageContextPublic]
     errors: Optional[List[WebScraperError]] = None
     message: Optional[str] = None
+    completion: Optional[CrawlCompletion] = None
+    crawl_id: Optional[str] = None
+    profile: Optional[CrawlProfile] = None
+    export: Optional[CrawlExport] = None
+    truncated: bool = False
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional, Set, Tuple
 from app.schemas.response_schema import LLMAction
-from app.schemas.api_schema import PageContextPublic, PageDetailsPublic, PageActionPublic
+from app.schemas.api_schema import CrawlCompletion, CrawlExport, CrawlProfile, PageContextPublic, PageDetailsPublic, PageActionPublic
 from app.schemas.error_schema import WebScraperError
 
 class Interactable(BaseModel):
@@ -108,6 +108,11 @@ class CrawlSession(BaseModel):
     visited_urls: Set[str] = Field(default_factory=set)
     history: List[PageContext] = Field(default_factory=list)
     errors: List[WebScraperError] = Field(default_factory=list)
+    fresh_only: bool = False
+    completion: CrawlCompletion = Field(default_factory=CrawlCompletion)
+    crawl_id: Optional[str] = None
+    profile: Optional[CrawlProfile] = None
+    export: Optional[CrawlExport] = None
 
     def __init__(
         self,
@@ -166,7 +171,8 @@ class CrawlSession(BaseModel):
         if page_ctx.prev_page_action:
             _, action = self.get_by_page_action(page_ctx.prev_page_action)
             summary["previous_url"] =  str(page_ctx.prev_page_action.url)
-            summary["previous_action"] = action.summarized()
+            # The parent may not be in the history, e.g. when its decision was dropped
+            summary["previous_action"] = action.summarized() if action is not None else None
         return summary
 # from pydantic import BaseModel
 # from typing import List, Optional, Set
@@ -27,6 +27,13 @@ class ValidationError(WebScraperError):
     """Error during validation of data"""
     pass
 
+class RetryError(WebScraperError):
+    """A transient failure that was retried or waited out; informational on its own"""
+    pass
+
+# Error types recorded for retry and circuit breaker activity, which do not fail a crawl
+RETRY_ERROR_TYPES = {"llm_retry", "request_retry", "circuit_open", "llm_escalation"}
+
 class ErrorResponse(BaseModel):
     """Response model for error cases"""
     success: bool = False
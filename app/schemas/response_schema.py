@@ -25,9 +25,15 @@ class LLMAction(BaseModel):
 class LLMResponse(BaseModel):
     summary: str
     actions: List[LLMAction] 
+    confidence: Optional[float] = None  # self-reported, drives escalation in the model cascade
+    instruction_satisfied: Optional[bool] = None  # the pages seen so far answer the user's instruction
+    satisfaction_confidence: Optional[float] = None
     
     def __str__(self) -> str:
         return str({
             "summary": self.summary,
-            "actions": [str(action) for action in self.actions]
+            "actions": [str(action) for action in self.actions],
+            "confidence": self.confidence,
+            "instruction_satisfied": self.instruction_satisfied,
+            "satisfaction_confidence": self.satisfaction_confidence
         })
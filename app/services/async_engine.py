@@ -0,0 +1,256 @@
+import asyncio
+import time
+from typing import List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from w3lib.url import canonicalize_url
+
+from app.config.strigil_config import config
+from app.schemas.context_schema import CrawlSession, PageAction
+from app.schemas.error_schema import NetworkError, ParsingError, RetryError, WebScraperError
+from app.services.crawl_controller import CrawlController
+from app.services.metrics import metrics
+from app.services.page_cache import page_cache
+from app.services.recording import recorder
+from app.services.resilience import backoff_delay
+from app.services.throttle import domain_throttle, parse_retry_after
+
+
+class FrontierRequest(BaseModel):
+    """A page waiting in the asyncio engine's frontier"""
+    url: str
+    depth: int
+    prev_url: Optional[str] = None
+    prev_action_key: Optional[str] = None
+    fetch_retries: int = 0
+    throttle_retries: int = 0
+    not_before: float = 0.0
+
+
+_playwright: Optional[Playwright] = None
+_browser: Optional[Browser] = None
+_browser_lock = asyncio.Lock()
+
+
+async def get_browser() -> Browser:
+    """Process-wide Chromium instance shared by all asyncio-engine crawls, launched on first use"""
+    global _playwright, _browser
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            _browser = await _playwright.chromium.launch(headless=config.async_engine.headless)
+        return _browser
+
+
+async def close_browser() -> None:
+    global _playwright, _browser
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+
+
+class AsyncCrawlEngine:
+    """
+    Crawl engine that drives Playwright directly from asyncio, without Scrapy or the
+    Twisted reactor. Worker tasks take pages from an asyncio frontier, render them in
+    a browser context owned by the crawl and pass them to the shared `CrawlController`.
+    Politeness, the page cache and fetch retries mirror the Scrapy middlewares.
+    """
+
+    def __init__(self, session: CrawlSession):
+        self.session = session
+        self.controller = CrawlController(session, self)
+        self.errors = self.controller.errors
+        self.frontier: "asyncio.Queue[FrontierRequest]" = asyncio.Queue()
+        self.seen: Set[str] = set()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self.context: Optional[BrowserContext] = None
+        self._workers: List[asyncio.Task] = []
+
+    def make_request(self, url: str, depth: int, prev_url: Optional[str], prev_action_key: Optional[str]) -> FrontierRequest:
+        return FrontierRequest(url=url, depth=depth, prev_url=prev_url, prev_action_key=prev_action_key)
+
+    def pause(self):
+        self._resumed.clear()
+
+    def unpause(self):
+        self._resumed.set()
+
+    def stop(self, reason: str) -> int:
+        """Drop every queued page; returns how many were dropped"""
+        dropped = 0
+        while True:
+            try:
+                self.frontier.get_nowait()
+            except asyncio.QueueEmpty:
+                return dropped
+            self.frontier.task_done()
+            dropped += 1
+
+    def abort(self) -> None:
+        """Cancel the workers; pages they are rendering are closed and the frontier drains"""
+        for worker in self._workers:
+            worker.cancel()
+
+    def enqueue(self, request: FrontierRequest, dont_filter: bool = False) -> None:
+        if self.controller.stopped:
+            return
+        key = canonicalize_url(request.url)
+        if not dont_filter:
+            if key in self.seen:
+                return
+            self.seen.add(key)
+        self.frontier.put_nowait(request)
+
+    async def run(self) -> None:
+        browser = await get_browser()
+        self.context = await browser.new_context(record_har_path=recorder.har_path())
+        if recorder.replaying:
+            await self.context.route("**/*", recorder.route)
+        self.context.set_default_navigation_timeout(config.timeouts.playwright.navigation_timeout)
+        for url in self.session.start_urls:
+            self.enqueue(self.make_request(str(url), 0, None, None))
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(config.async_engine.concurrency)]
+        try:
+            await self.frontier.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            await self.context.close()
+            self.session.errors = self.errors
+
+    async def _worker(self) -> None:
+        while True:
+            request = await self.frontier.get()
+            try:
+                await self._resumed.wait()
+                await self._process(request)
+            except Exception as e:
+                self.errors.append(ParsingError(
+                    error_type="parsing_error",
+                    message=f"Error parsing page {request.url}: {str(e)}",
+                    details={"url": request.url, "error_type": "parse_page_error"}
+                ))
+            finally:
+                self.frontier.task_done()
+
+    async def _process(self, request: FrontierRequest) -> None:
+        if request.not_before > time.monotonic():
+            await asyncio.sleep(request.not_before - time.monotonic())
+
+        prev_page_action = None
+        if request.prev_url is not None and request.prev_action_key is not None:
+            prev_page_action = PageAction(url=request.prev_url, action_key=request.prev_action_key)
+
+        cached = await page_cache.get(request.url, fresh_only=self.session.fresh_only)
+        if cached is not None:
+            next_requests = await self.controller.handle_page(request.url, request.depth, None, prev_page_action, cached_details=cached)
+            for next_request in next_requests:
+                self.enqueue(next_request)
+            return
+
+        page, url, headers = await self._render(request)
+        if page is None:
+            return
+        try:
+            next_requests = await self.controller.handle_page(url, request.depth, page, prev_page_action, headers=headers, request_url=request.url)
+        finally:
+            await page.close()
+        for next_request in next_requests:
+            self.enqueue(next_request)
+
+    async def _render(self, request: FrontierRequest) -> Tuple[Optional[object], str, dict]:
+        """Open and load a page, applying the domain throttle and fetch retries; returns (None, ...) on failure"""
+        domain = urlparse(request.url).hostname or ""
+        if config.throttle.enabled:
+            await domain_throttle.acquire(domain, request.url)
+        started = time.monotonic()
+        page = None
+        try:
+            page = await self.context.new_page()
+            response = await asyncio.wait_for(
+                page.goto(request.url, wait_until="load"),
+                timeout=config.timeouts.scrapy.download_timeout
+            )
+            await page.wait_for_load_state(config.async_engine.wait_until)
+        except (Exception, asyncio.CancelledError) as e:
+            # Also on cancellation, so an aborted crawl does not leak the page or its throttle slot
+            if page is not None:
+                await page.close()
+            if config.throttle.enabled:
+                domain_throttle.release(domain, None)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._fetch_failed(request, str(e) or type(e).__name__, transient=True)
+            return None, request.url, {}
+
+        latency = time.monotonic() - started
+        status = response.status if response is not None else 200
+        headers = response.headers if response is not None else {}
+        metrics.observe("stage.render", latency)
+        if config.throttle.enabled:
+            domain_throttle.release(domain, latency, status, parse_retry_after(headers.get("retry-after")))
+
+        if status in config.throttle.throttled_statuses and request.throttle_retries < config.throttle.max_throttle_retries:
+            await page.close()
+            metrics.incr("throttle.requeued")
+            self.enqueue(request.model_copy(update={"throttle_retries": request.throttle_retries + 1}), dont_filter=True)
+            return None, request.url, {}
+        if status >= 400:
+            await page.close()
+            self._fetch_failed(request, f"HTTP status {status}", transient=status >= 500)
+            return None, request.url, {}
+        return page, page.url, headers
+
+    def _fetch_failed(self, request: FrontierRequest, reason: str, transient: bool) -> None:
+        """Re-queue a failed fetch with backoff under the crawl's retry budget, or record a NetworkError"""
+        retries = request.fetch_retries
+        if transient and retries < config.resilience.fetch_max_retries:
+            delay = backoff_delay(retries)
+            notice = RetryError(
+                error_type="request_retry",
+                message=f"Re-queueing {request.url} in {delay:.2f}s after: {reason}",
+                details={"url": request.url, "attempt": retries + 1, "delay": delay}
+            )
+            if self.controller.retry_budget.take(notice):
+                metrics.incr("fetch.retries")
+                self.enqueue(request.model_copy(update={
+                    "fetch_retries": retries + 1,
+                    "not_before": time.monotonic() + delay,
+                }), dont_filter=True)
+                return
+        self.errors.append(NetworkError(
+            error_type="network_error",
+            message=f"Request failed: {request.url}: {reason}",
+            details={"url": request.url, "error": reason, "depth": request.depth, "retries": retries}
+        ))
+
+
+async def run_async_crawl(session: CrawlSession, on_page=None) -> List[WebScraperError]:
+    """
+    Run a crawl session on the asyncio engine.
+
+    Returns:
+        Errors that ended the crawl itself; page level errors are in `session.errors`
+    """
+    engine = AsyncCrawlEngine(session)
+    if on_page is not None:
+        engine.controller.page_listeners.append(on_page)
+    try:
+        await engine.run()
+    except Exception as e:
+        return [WebScraperError(
+            error_type="crawl_error",
+            message=f"Crawl failed: {str(e)}",
+            details={"error_type": "async_engine_error"}
+        )]
+    return []
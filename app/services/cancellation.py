@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.config.strigil_config import config, DeadlineConfig
+from app.schemas.context_schema import CrawlSession
+from app.services.metrics import metrics
+
+if TYPE_CHECKING:
+    from app.services.crawl_controller import CrawlController
+
+_active: Dict[str, "CrawlCancellation"] = {}
+
+
+def crawl_deadline(requested: Optional[float], settings: Optional[DeadlineConfig] = None) -> Optional[float]:
+    """Deadline of a crawl in seconds: the requested one or the default, capped at `max_seconds`"""
+    settings = settings or config.deadlines
+    deadline = requested if requested is not None else settings.default_seconds
+    if settings.max_seconds is not None:
+        deadline = min(deadline, settings.max_seconds) if deadline is not None else settings.max_seconds
+    return deadline
+
+
+def cancellation_for(session: CrawlSession) -> Optional["CrawlCancellation"]:
+    return _active.get(session.crawl_id) if session.crawl_id else None
+
+
+def cancel_crawl(crawl_id: str, reason: str) -> bool:
+    """Cancel a crawl running in this process; returns False if there is none with this id"""
+    cancellation = _active.get(crawl_id)
+    if cancellation is None:
+        return False
+    cancellation.cancel(reason)
+    return True
+
+
+class CrawlCancellation:
+    """
+    Cancels one crawl when its deadline passes or when asked to, e.g. because the API
+    client disconnected.
+
+    Cancellation is cooperative: the crawl's controller stops scheduling pages, cancels
+    its LLM calls and has the engine close the pages it is rendering. Pages finished by
+    then are kept and the session is marked truncated. The controller attaches itself
+    when it is created; a cancellation that comes first makes it drop every page.
+    """
+
+    def __init__(self, crawl_id: str, deadline: Optional[float] = None):
+        self.crawl_id = crawl_id
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+        self.controller: Optional["CrawlController"] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def start(self) -> None:
+        _active[self.crawl_id] = self
+        if self.deadline is not None and self.deadline <= 0:
+            # Spent waiting for a worker
+            self.cancel("deadline")
+        elif self.deadline is not None:
+            self._timer = asyncio.get_running_loop().call_later(self.deadline, self.cancel, "deadline")
+
+    def attach(self, controller: "CrawlController") -> None:
+        self.controller = controller
+        if self.cancelled:
+            # The engine is still being set up, so there is nothing to abort yet
+            controller.stopped = controller.cancelled = True
+
+    def cancel(self, reason: str) -> None:
+        if self.cancelled:
+            return
+        self.reason = reason
+        self.cancelled_at = time.monotonic()
+        print(f"DEBUG: Cancelling crawl {self.crawl_id}: {reason}")
+        metrics.incr(f"crawl.cancelled.{reason}")
+        if self.controller is not None:
+            self.controller.cancel(reason)
+
+    def close(self, session: CrawlSession) -> None:
+        """Called once the engine has returned; marks the session truncated and records the time to release"""
+        _active.pop(self.crawl_id, None)
+        if self._timer is not None:
+            self._timer.cancel()
+        if not self.cancelled:
+            return
+        completion = session.completion
+        completion.truncated = True
+        completion.truncated_reason = self.reason
+        completion.release_seconds = round(time.monotonic() - self.cancelled_at, 3)
+        metrics.observe("crawl.release", completion.release_seconds)
+        print(f"DEBUG: Crawl {self.crawl_id} released {completion.release_seconds}s after it was cancelled")
@@ -1,74 +1,454 @@
-from scrapy import Spider, Request
-from scrapy.utils.reactor import install_reactor
 from urllib.parse import urljoin
-from app.services.llm import ask_llm
+from app.services.llm import PAGE_TEXT_CHARS, ask_llm, prompt_chars_saved
+from app.services.llm_batcher import DecisionBatcher
+from app.services.llm_router import llm_router, route_label
+from app.services.memory import SessionMemory
+from app.services.metrics import metrics
+from app.services.resilience import RetryBudget
 from pprint import pprint
+import asyncio
 import json
 import re
-from typing import List, Tuple, Optional
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, Set, Tuple, Optional
 from pydantic import BaseModel, ValidationError
 from app.config.strigil_config import config
+from app.services.cancellation import cancellation_for
+from app.services.export import exporter_for
+from app.services.interaction import DESCRIBE_ELEMENT_JS, click_in_place, go_back, state_fingerprint, state_url
+from app.services.page_cache import page_cache
+from app.services.profiling import profiler_for
+from app.services.recording import recorder
+from app.services.summary_store import PageSummary, summary_store
 from app.schemas.context_schema import Interactable, PageDetails, PageContext, PageAction, CrawlSession
-from playwright.async_api import Page
 from app.schemas.response_schema import LLMResponse, LLMAction
-from app.schemas.error_schema import ValidationError as SchemaValidationError
+from app.schemas.error_schema import WebScraperError, LLMError, RetryError, ValidationError as SchemaValidationError
 import traceback
 
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+class ErrorLog(list):
+    """Page-level errors of a crawl; `listeners` are called with every error appended"""
+
+    def __init__(self):
+        super().__init__()
+        self.listeners: List[Callable[[WebScraperError], None]] = []
+
+    def append(self, error: WebScraperError) -> None:
+        super().append(error)
+        for listener in self.listeners:
+            listener(error)
+
+
 class CrawlController:
-    def __init__(self, session: CrawlSession):
+    """
+    Engine-independent crawl logic: page extraction, LLM decisions and follow-up pages.
+
+    The engine (the Scrapy spider or the asyncio engine) renders pages and provides
+    `make_request(url, depth, prev_url, prev_action_key)` for follow-up pages,
+    `pause()` / `unpause()` to stop scheduling renders during an LLM outage,
+    `stop(reason)` to end the crawl early, returning the number of pages it dropped,
+    and `abort()` to close the pages it is rendering when the crawl is cancelled.
+    """
+    def __init__(self, session: CrawlSession, engine=None):
         self.session = session
+        self.engine = engine
+        self.errors = ErrorLog()
+        self.retry_budget = RetryBudget(config.resilience.retry_budget, self.errors)
+        self._outage_pauses = 0
+        self.memory = SessionMemory(session, self.retry_budget) if config.memory.enabled else None
+        self.batcher = DecisionBatcher(self) if config.llm_batching.enabled else None
+        self.stopped = False
+        self.cancelled = False
+        self._llm_calls: Set[asyncio.Task] = set()
+        # Fingerprints of the page states handled so far, to skip states reached again by clicking
+        self._seen_states: Set[str] = set()
+        self._started_at = time.monotonic()
+        self._seconds_per_page: Optional[float] = None
+        # Called with every PageContext as soon as it is added to the session history
+        self.page_listeners: List[Callable[[PageContext], None]] = []
+        self.exporter = exporter_for(session)
+        if self.exporter is not None:
+            self.page_listeners.append(self.exporter.on_page)
+            self.errors.listeners.append(self.exporter.on_error)
+        cancellation = cancellation_for(session)
+        if cancellation is not None:
+            cancellation.attach(self)
 
-    async def handle_page(self, url: str, depth: int, page:Page, prev_page_action: Optional[PageAction]) -> List[Request]:
+    async def handle_page(self, url: str, depth: int, page: Optional["Page"], prev_page_action: Optional[PageAction], cached_details: Optional[PageDetails] = None, headers=None, request_url: Optional[str] = None) -> List[Any]:
+        """
+        Extract a rendered page, or use its cached extraction, decide it and return the
+        requests for the pages to follow. `request_url` is the URL the page was requested
+        under when a redirect led to `url`.
+        """
         if url in self.session.visited_urls or depth > self.session.max_depth:
             return []
+        if self.stopped:
+            # Rendered before the crawl stopped; skip the LLM call
+            self._page_dropped()
+            return []
         self.session.visited_urls.add(url)
+        page_started = time.monotonic()
+        # Seconds spent waiting for LLM decisions, which `stage.page_work` leaves out
+        llm_waits: List[float] = []
+
+        if cached_details is not None:
+            details = cached_details
+            print("Using cached extraction for: ", url)
+        else:
+            started = time.monotonic()
+            details = await extract_details(page)
+            metrics.observe("stage.extract", time.monotonic() - started)
+            if recorder.recording:
+                await recorder.record_page(url, page)
+            profiler = profiler_for(self.session)
+            if profiler is not None:
+                await profiler.record_page(url, page)
+            if config.recording.mode == "off":
+                await page_cache.put(url, details, headers)
+                if request_url is not None and request_url != url:
+                    # The cache is looked up by request URL, so a redirected page is stored under both
+                    await page_cache.put(request_url, details, headers)
+        self._seen_states.add(state_fingerprint(details))
+        next_requests, in_place = await self._decide(url, depth, prev_page_action, details, llm_waits=llm_waits)
+        if in_place and page is not None and config.interaction.enabled:
+            next_requests.extend(await self._interact(page, url, depth, in_place, llm_waits))
+        metrics.observe("stage.page_work", time.monotonic() - page_started - sum(llm_waits))
+        return next_requests
+
+    async def _decide(self, url: str, depth: int, prev_page_action: Optional[PageAction], details: PageDetails, batch: bool = True, llm_waits: Optional[List[float]] = None) -> Tuple[List[Any], List[Interactable]]:
+        """
+        Ask for a decision on a page state and add it to the history. States reached by
+        clicking in place are decided one at a time, so they skip the batching window.
+        The time spent waiting for the decision is appended to `llm_waits`.
 
-        details = await extract_details(page)
+        Returns:
+            Requests for the links to follow, and the elements without an href to click in place
+        """
         print("Parsing page: ",details, prev_page_action)
-        llm_response = await self.spider._ask_llm(details, self.session.user_instruction, prev_page_action)
+        # Looked up once per decision, so the prompts of every tier send the same summary
+        known = summary_store.get(details)
+        batched = self.batcher is not None and batch
+        waited = time.monotonic()
+        if batched:
+            llm_response = await self.batcher.decide(details, depth, prev_page_action, known)
+        else:
+            llm_response = await self._ask_llm(details, self.session.user_instruction, prev_page_action, known_summary=known)
+        if llm_waits is not None:
+            llm_waits.append(time.monotonic() - waited)
         print("LLM response:")
         pprint(not llm_response)
         if not llm_response:
-            return []
+            if self.cancelled:
+                self._page_dropped()
+            return [], []
+
+        # The history keeps the shared, instruction-independent summary once there is one
+        if known is not None:
+            # The reply's summary is empty as asked, even if the entry was evicted or went stale since
+            summary = known.summary
+            text_chars = config.llm_batching.page_text_chars if batched and self.batcher.batches(prev_page_action) else PAGE_TEXT_CHARS
+            metrics.incr("summary_store.prompt_chars_saved", prompt_chars_saved(details, text_chars, known))
+        else:
+            stored = summary_store.peek(details)
+            if stored is not None:
+                # Stored by another crawl while this one waited for its reply
+                summary = stored.summary
+            else:
+                summary = llm_response.summary
+                summary_store.put(details, summary)
 
         context = PageContext(
             depth = depth,
             details = details,
             prev_page_action = prev_page_action,
-            summary = llm_response.summary,
+            summary = summary,
             actions = llm_response.actions,
             visited_keys =  set()
         )
         print("page context:",context)
         self.session.history.append(context)
+        for listener in self.page_listeners:
+            listener(context)
+        if self.exporter is not None:
+            await self.exporter.wait_for_room()
+        self._record_satisfaction(url, llm_response)
+        if self.stopped:
+            return [], []
 
         next_requests = []
+        in_place = []
         for action in llm_response.actions:
             if action.action == "click":
                 match = next((el for el in details.interactables if el.key == action.target), None)
-                if match and match.href and match.key not in context.visited_keys:
+                if not match or match.key in context.visited_keys:
+                    continue
+                if match.href:
                     next_url = urljoin(url, match.href)
                     context.visited_keys.add(match.key)
-                    next_requests.append(Request(
-                        next_url,
-                        meta={
-                            "playwright": True,
-                            "playwright_include_page": True,
-                            "playwright_page_methods": [
-                                {"method": "wait_for_load_state", "args": ["networkidle"]}
-                            ],
-                            "download_timeout": config.timeouts.scrapy.download_timeout,
-                            "depth": depth + 1,
-                            "prev_url": url,
-                            "prev_action_key": action.target,
-                        },
-                        callback=self.spider.parse
-                    ))
+                    next_requests.append(self.engine.make_request(next_url, depth + 1, url, action.target))
+                elif match.dom_path:
+                    context.visited_keys.add(match.key)
+                    in_place.append(match)
             elif action.action == "stop":
                 break
 
+        return next_requests, in_place
+
+    async def _interact(self, page: "Page", url: str, depth: int, elements: List[Interactable], llm_waits: Optional[List[float]] = None) -> List[Any]:
+        """
+        Click elements without an href in the rendered page and handle each new state as
+        a child page, without navigating. States are explored depth first; after a state
+        reached by a client-side route change, the page goes back through its history so
+        the next element is clicked in the parent state. States seen before, by
+        fingerprint, are skipped, and at most `max_states_per_page` clicks are made.
+        A state whose URL is already taken, e.g. by the state it was reached from after
+        a DOM change, is identified by `state_url`, and its children point back at it.
+
+        Returns:
+            Requests for the links to follow from the states reached
+        """
+        settings = config.interaction
+        next_requests = []
+        clicks = 0
+
+        async def explore(parent_url: str, parent_depth: int, elements: List[Interactable]) -> None:
+            nonlocal clicks
+            for element in elements:
+                if clicks >= settings.max_states_per_page or self.stopped or parent_depth + 1 > self.session.max_depth:
+                    return
+                clicks += 1
+                change = await click_in_place(page, element, settings)
+                if change is None:
+                    continue
+                started = time.monotonic()
+                details = await extract_details(page)
+                metrics.observe("stage.extract", time.monotonic() - started)
+                fingerprint = state_fingerprint(details)
+                if fingerprint in self._seen_states:
+                    metrics.incr("interaction.duplicate_states")
+                else:
+                    self._seen_states.add(fingerprint)
+                    metrics.incr("interaction.states")
+                    state_id = str(details.url)
+                    if state_id in self.session.visited_urls:
+                        state_id = state_url(state_id, fingerprint)
+                        details = PageDetails(state_id, details.title, details.body_text, details.interactables)
+                    print(f"DEBUG: Clicking {element.key!r} on {parent_url} changed the {change}, now at {state_id}")
+                    self.session.visited_urls.add(state_id)
+                    prev_page_action = PageAction(url=parent_url, action_key=element.key)
+                    requests, in_place = await self._decide(state_id, parent_depth + 1, prev_page_action, details, batch=False, llm_waits=llm_waits)
+                    next_requests.extend(requests)
+                    await explore(state_id, parent_depth + 1, in_place)
+                if change == "route":
+                    await go_back(page, settings)
+
+        await explore(url, depth, elements)
         return next_requests
 
+    def _record_satisfaction(self, url: str, llm_response: LLMResponse) -> None:
+        """Fold a page's satisfaction report into the session and stop the crawl once it is confident enough"""
+        if not llm_response.instruction_satisfied:
+            return
+        settings = config.early_stop
+        completion = self.session.completion
+        confidence = llm_response.satisfaction_confidence
+        confidence = min(1.0, max(0.0, confidence if confidence is not None else settings.default_confidence))
+        completion.satisfied_by.append(url)
+        # Reports from different pages are combined as independent evidence (noisy-OR)
+        completion.confidence = 1 - (1 - completion.confidence) * (1 - confidence)
+        if completion.confidence < settings.threshold or len(completion.satisfied_by) < settings.min_pages:
+            return
+        completion.instruction_satisfied = True
+        if settings.enabled and not self.stopped:
+            self.stop("instruction_satisfied")
+
+    def stop(self, reason: str) -> None:
+        """End the whole crawl: the engine drops queued pages and pages still in flight are skipped"""
+        self.stopped = True
+        elapsed = time.monotonic() - self._started_at
+        self._seconds_per_page = elapsed / max(len(self.session.history), 1)
+        self.session.completion.stopped_early = True
+        print(f"DEBUG: Stopping crawl after {len(self.session.history)} pages: {reason}")
+        metrics.incr("crawl.early_stops")
+        self._pages_avoided(self.engine.stop(reason))
+
+    def cancel(self, reason: str) -> None:
+        """
+        Abort the crawl: besides stopping it, cancel the LLM calls and page renders in
+        flight. Pages already in the history are kept.
+        """
+        if self.cancelled:
+            return
+        self.cancelled = True
+        print(f"DEBUG: Cancelling crawl after {len(self.session.history)} pages: {reason}")
+        metrics.incr("crawl.cancellations")
+        if not self.stopped:
+            self.stopped = True
+            self.session.completion.pages_dropped += self.engine.stop(reason)
+        self.engine.abort()
+        if self.batcher is not None:
+            self.batcher.cancel()
+        for task in list(self._llm_calls):
+            task.cancel()
+
+    def _page_dropped(self) -> None:
+        if self.cancelled:
+            self.session.completion.pages_dropped += 1
+        else:
+            self._pages_avoided(1)
+
+    def _pages_avoided(self, count: int) -> None:
+        completion = self.session.completion
+        completion.pages_avoided += count
+        # At the throughput reached before the stop; pages the avoided ones would have led to are not counted
+        completion.estimated_seconds_saved = round(completion.pages_avoided * self._seconds_per_page, 3)
+        metrics.incr("crawl.pages_avoided", count)
+
+    async def _ask_llm(self, details, instruction, prev_page_action, first_tier: int = 0, known_summary: Optional[PageSummary] = None) -> LLMResponse | None:
+        """
+        Ask the model cascade about a page, starting at tier `first_tier`. While every
+        backend's circuit is open the crawl is paused and the page waits for recovery,
+        up to `max_outage_pause`. Cancelling the crawl cancels the call, and the page
+        gets no decision.
+        """
+        if self.cancelled:
+            return None
+        call = asyncio.ensure_future(self._ask_llm_until_answered(details, instruction, prev_page_action, first_tier, known_summary))
+        self._llm_calls.add(call)
+        try:
+            return await call
+        except asyncio.CancelledError:
+            # Only swallow the cancellation if it came from `cancel`, not from the caller's task
+            if self.cancelled and not asyncio.current_task().cancelling():
+                return None
+            raise
+        finally:
+            self._llm_calls.discard(call)
+
+    async def _ask_llm_until_answered(self, details, instruction, prev_page_action, first_tier: int = 0, known_summary: Optional[PageSummary] = None) -> LLMResponse | None:
+        paused_for = 0.0
+        while True:
+            result, error = await self._ask_llm_cascade(details, instruction, prev_page_action, first_tier, known_summary)
+            if error and error.error_type == "llm_circuit_open" and paused_for < config.resilience.max_outage_pause:
+                wait = min(error.details["retry_in"], config.resilience.max_outage_pause - paused_for)
+                await self._pause_for_outage(wait, error)
+                paused_for += wait
+                continue
+            if error:
+                self.errors.append(error)
+            return result
+
+    async def _pause_for_outage(self, wait: float, error: WebScraperError):
+        """Stop scheduling new page renders until the LLM backend's circuit can be probed again"""
+        self.errors.append(RetryError(
+            error_type="circuit_open",
+            message=f"Pausing crawl for {wait:.1f}s: {error.message}",
+            details=error.details
+        ))
+        metrics.incr("crawl.outage_pauses")
+        if self._outage_pauses == 0:
+            self.engine.pause()
+        self._outage_pauses += 1
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self._outage_pauses -= 1
+            if self._outage_pauses == 0:
+                self.engine.unpause()
+
+    async def _ask_llm_cascade(self, details, instruction, prev_page_action, first_tier: int = 0, known_summary: Optional[PageSummary] = None) -> Tuple[Optional[LLMResponse], Optional[WebScraperError]]:
+        """
+        Walk the model cascade, escalating on errors, unparseable replies or low confidence.
+        Errors of the tiers escalated from are recorded; if every later tier fails, the most
+        confident low-confidence answer is used rather than dropping the page.
+        """
+        tiers = llm_router.tiers()
+        tiers = tiers[min(first_tier, len(tiers) - 1):]
+        best: Optional[LLMResponse] = None
+        for index, tier in enumerate(tiers):
+            result, error = await self._ask_llm_tier(details, instruction, prev_page_action, tier, known_summary)
+            is_last_tier = index == len(tiers) - 1
+            if error:
+                if is_last_tier:
+                    if best is not None:
+                        print(f"DEBUG: Using the low-confidence answer after {route_label(tier.route)} failed:", error)
+                        metrics.incr("llm.escalation_fallbacks")
+                        self.errors.append(self._escalation_notice(tier, error, "using the earlier low-confidence answer"))
+                        return best, None
+                    return None, error
+                print(f"DEBUG: Escalating from {route_label(tier.route)} after error:", error)
+                metrics.incr("llm.escalations")
+                self.errors.append(self._escalation_notice(tier, error, "escalating"))
+                continue
+            if (
+                not is_last_tier
+                and result.confidence is not None
+                and result.confidence < config.llm_routing.escalate_below_confidence
+            ):
+                print(f"DEBUG: Escalating from {route_label(tier.route)}, confidence {result.confidence}")
+                metrics.incr("llm.escalations")
+                if best is None or result.confidence > best.confidence:
+                    best = result
+                continue
+            return result, None
+        return best, None
+
+    @staticmethod
+    def _escalation_notice(tier, error: WebScraperError, outcome: str) -> RetryError:
+        """Record of a tier's error that the cascade recovered from"""
+        return RetryError(
+            error_type="llm_escalation",
+            message=f"{route_label(tier.route)} failed, {outcome}: {error.message}",
+            details={"model": route_label(tier.route), "error_type": error.error_type, **error.details}
+        )
+
+    async def _ask_llm_tier(self, details, instruction, prev_page_action, tier, known_summary: Optional[PageSummary] = None) -> Tuple[Optional[LLMResponse], Optional[WebScraperError]]:
+        try:
+            system_prompt = config.system_prompt
+            decision_text, error = await ask_llm(self.session, system_prompt, instruction, details, prev_page_action, tier=tier, retry_budget=self.retry_budget, memory=self.memory, known_summary=known_summary)
+            
+            if error:
+                print("DEBUG: LLM API error:", error)
+                return None, error
+                
+            if not decision_text:
+                error = LLMError(
+                    error_type="llm_error",
+                    message="LLM returned no response",
+                    details={"url": str(details.url), "model": route_label(tier.route)}
+                )
+                print("DEBUG: LLM returned no response:", error)
+                return None, error
+            
+            print("DEBUG: LLM raw response:", decision_text)
+            result, validation_error = extract_json_from_response(decision_text)
+            
+            if validation_error:
+                print("DEBUG: JSON validation error:", validation_error)
+                return None, validation_error
+                
+            if not result:
+                error = LLMError(
+                    error_type="llm_error",
+                    message="Failed to parse LLM response",
+                    details={"url": str(details.url), "response": decision_text}
+                )
+                print("DEBUG: Failed to parse LLM response:", error)
+                return None, error
+            
+            print("DEBUG: Successfully parsed LLM response:", result)
+            return result, None
+        except Exception as e:
+            error = LLMError(
+                error_type="llm_error",
+                message=f"Error in LLM processing: {str(e)}",
+                details={"url": str(details.url), "error_type": "llm_processing_error"}
+            )
+            print("DEBUG: Unexpected error in LLM processing:", e)
+            return None, error
+    
 
 async def extract_details(page):
     title = await page.title()
@@ -86,8 +466,8 @@ async def extract_details(page):
                 key = text if text not in seen else f"{text} ({seen[text]})"
                 seen[text] = seen.get(text, 0) + 1
                 href = await el.get_attribute("href")
-                tag = await el.evaluate("el => el.tagName.toLowerCase()")
-                elements.append(Interactable(tag,text,href,key))
+                described = await el.evaluate(DESCRIBE_ELEMENT_JS)
+                elements.append(Interactable(described["tag"],text,href,key,dom_path=described["domPath"]))
             except:
                 continue
     return PageDetails(
@@ -0,0 +1,322 @@
+import asyncio
+import multiprocessing
+import signal
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from app.config.strigil_config import config, CrawlPoolConfig
+from app.schemas.context_schema import CrawlSession, PageContext
+from app.schemas.error_schema import CrawlError, WebScraperError
+from app.services.metrics import metrics
+
+
+class CrawlJob(BaseModel):
+    """A crawl sent to a worker process"""
+    job_id: str
+    start_url: str
+    user_instruction: str
+    max_depth: int
+    fresh_only: bool = False
+    crawl_id: Optional[str] = None
+    profile: Optional[str] = None  # profile level, see profiling.should_profile
+    deadline_at: Optional[float] = None  # wall-clock time, so time spent waiting for a worker counts
+    attempts: int = 0
+
+
+def _worker_main(worker_id: int, job_queue, result_queue) -> None:
+    """Entry point of a worker process: runs crawls from `job_queue` on its own event loop and reactor"""
+    # Shutdown is driven by the parent through the job queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(worker_id, job_queue, result_queue))
+
+
+async def _worker_loop(worker_id: int, job_queue, result_queue) -> None:
+    # Imported here so Scrapy, Twisted and Playwright load in the worker, not the API process
+    from app.services.cancellation import cancel_crawl
+    from app.services.crawler import run_crawl
+
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    print(f"DEBUG: Crawl worker {worker_id} ready")
+    while True:
+        payload = await loop.run_in_executor(None, job_queue.get)
+        if payload is None:
+            break
+        if isinstance(payload, tuple):
+            # ("cancel", crawl_id, reason)
+            cancel_crawl(payload[1], payload[2])
+            continue
+        task = asyncio.create_task(_run_job(CrawlJob.model_validate_json(payload), result_queue, run_crawl))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _run_job(job: CrawlJob, result_queue, run_crawl) -> None:
+    def on_page(context: PageContext):
+        result_queue.put(("page", job.job_id, context.model_dump_json()))
+
+    try:
+        session, errors = await run_crawl(
+            job.start_url, job.user_instruction, job.max_depth,
+            fresh_only=job.fresh_only, on_page=on_page,
+            crawl_id=job.crawl_id, profile=job.profile,
+            deadline=job.deadline_at - time.time() if job.deadline_at is not None else None,
+        )
+        result_queue.put(("done", job.job_id, session.model_dump_json(), [error.model_dump() for error in errors]))
+    except Exception as e:
+        result_queue.put(("failed", job.job_id, f"{type(e).__name__}: {str(e)}"))
+
+
+class _Worker:
+    def __init__(self, worker_id: int, process, job_queue):
+        self.worker_id = worker_id
+        self.process = process
+        self.job_queue = job_queue
+        self.in_flight: Set[str] = set()
+
+
+class _PendingJob:
+    def __init__(self, job: CrawlJob, future: asyncio.Future, on_page: Optional[Callable[[PageContext], None]]):
+        self.job = job
+        self.future = future
+        self.on_page = on_page
+        self.worker: Optional[_Worker] = None
+        # Pages already streamed, so a crawl dispatched again after a crash does not repeat them
+        self.streamed_urls: Set[str] = set()
+
+
+class CrawlWorkerPool:
+    """
+    Runs crawls in supervised worker processes so that crawling, browser control and
+    response parsing do not share the API's event loop and core.
+
+    Every worker has its own job queue; the pool dispatches each crawl to the least
+    loaded live worker and streams its pages back through a shared result queue.
+    A worker that dies is restarted, and its in-flight crawls are dispatched again
+    up to `max_job_attempts` times before they fail with a `CrawlError`; pages a crawl
+    streamed before the crash are not streamed again.
+    """
+
+    def __init__(self, settings: Optional[CrawlPoolConfig] = None):
+        self._settings = settings
+        self.workers: List[_Worker] = []
+        self.pending: Dict[str, _PendingJob] = {}
+        self.backlog: Deque[str] = deque()
+        self.restarts = 0
+        self.completed = 0
+        self._closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._supervisor: Optional[asyncio.Task] = None
+
+    @property
+    def settings(self) -> CrawlPoolConfig:
+        return self._settings or config.crawl_pool
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self.workers = [self._spawn(worker_id) for worker_id in range(self.settings.workers)]
+        threading.Thread(target=self._read_results, name="crawl-pool-results", daemon=True).start()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    def _spawn(self, worker_id: int) -> _Worker:
+        job_queue = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, job_queue, self._results),
+            name=f"strigil-crawl-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        return _Worker(worker_id, process, job_queue)
+
+    async def submit(
+        self,
+        start_url: str,
+        user_instruction: str,
+        max_depth: int = 3,
+        fresh_only: bool = False,
+        on_page: Optional[Callable[[PageContext], None]] = None,
+        crawl_id: Optional[str] = None,
+        profile: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[CrawlSession, List[WebScraperError]]:
+        """Run a crawl on a worker process; same contract as `run_crawl`"""
+        if not self.started:
+            self.start()
+        job = CrawlJob(
+            job_id=uuid.uuid4().hex,
+            start_url=str(start_url),
+            user_instruction=user_instruction,
+            max_depth=max_depth,
+            fresh_only=fresh_only,
+            crawl_id=crawl_id,
+            profile=profile,
+            deadline_at=time.time() + deadline if deadline is not None else None,
+        )
+        future = self._loop.create_future()
+        self.pending[job.job_id] = _PendingJob(job, future, on_page)
+        self.backlog.append(job.job_id)
+        self._dispatch()
+        return await future
+
+    def cancel(self, crawl_id: str, reason: str) -> bool:
+        """
+        Cancel a crawl submitted to the pool; returns False if it is not pending. A crawl
+        still waiting for a worker returns right away, truncated and without pages.
+        """
+        pending = next((p for p in self.pending.values() if p.job.crawl_id == crawl_id), None)
+        if pending is None:
+            return False
+        if pending.worker is not None:
+            pending.worker.job_queue.put(("cancel", crawl_id, reason))
+            return True
+        job = pending.job
+        session = CrawlSession(start_urls=[job.start_url], user_instruction=job.user_instruction, max_depth=job.max_depth, crawl_id=crawl_id)
+        session.completion.truncated = True
+        session.completion.truncated_reason = reason
+        session.completion.release_seconds = 0.0
+        self._finish(pending, session, [])
+        return True
+
+    def _dispatch(self) -> None:
+        while self.backlog:
+            candidates = [
+                worker for worker in self.workers
+                if worker.process.is_alive() and len(worker.in_flight) < self.settings.jobs_per_worker
+            ]
+            if not candidates:
+                return
+            worker = min(candidates, key=lambda w: len(w.in_flight))
+            pending = self.pending.get(self.backlog.popleft())
+            if pending is None:
+                continue
+            pending.job.attempts += 1
+            pending.worker = worker
+            worker.in_flight.add(pending.job.job_id)
+            worker.job_queue.put(pending.job.model_dump_json())
+
+    def _read_results(self) -> None:
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._handle_message, message)
+
+    def _handle_message(self, message) -> None:
+        kind, job_id = message[0], message[1]
+        pending = self.pending.get(job_id)
+        if pending is None:
+            return
+        if kind == "page":
+            if pending.on_page is not None:
+                context = PageContext.model_validate_json(message[2])
+                url = str(context.details.url)
+                if url not in pending.streamed_urls:
+                    pending.streamed_urls.add(url)
+                    pending.on_page(context)
+            return
+
+        if kind == "done":
+            session = CrawlSession.model_validate_json(message[2])
+            errors = [WebScraperError.model_validate(error) for error in message[3]]
+            self._finish(pending, session, errors)
+        else:
+            self._fail(pending, f"Crawl failed in worker: {message[2]}", "worker_job_error")
+
+    def _finish(self, pending: _PendingJob, session: CrawlSession, errors: List[WebScraperError]) -> None:
+        self.pending.pop(pending.job.job_id, None)
+        if pending.worker is not None:
+            pending.worker.in_flight.discard(pending.job.job_id)
+        self.completed += 1
+        if not pending.future.done():
+            pending.future.set_result((session, errors))
+        self._dispatch()
+
+    def _fail(self, pending: _PendingJob, message: str, error_type: str) -> None:
+        job = pending.job
+        session = CrawlSession(start_urls=[job.start_url], user_instruction=job.user_instruction, max_depth=job.max_depth)
+        error = CrawlError(
+            error_type="crawl_error",
+            message=message,
+            details={"error_type": error_type, "attempts": job.attempts}
+        )
+        self._finish(pending, session, [error])
+
+    async def _supervise(self) -> None:
+        while not self._closing:
+            await asyncio.sleep(0.5)
+            try:
+                await self._restart_dead_workers()
+                self._dispatch()
+            except Exception as e:
+                # The supervisor must outlive a failed restart, which is tried again on the next round
+                print(f"WARNING: Crawl pool supervision failed: {type(e).__name__}: {str(e)}")
+                metrics.incr("crawl_pool.supervisor_errors")
+
+    async def _restart_dead_workers(self) -> None:
+        for index, worker in enumerate(self.workers):
+            if worker.process.is_alive() or self._closing:
+                continue
+            print(f"WARNING: Crawl worker {worker.worker_id} exited with code {worker.process.exitcode}, restarting")
+            self.restarts += 1
+            metrics.incr("crawl_pool.worker_restarts")
+            for job_id in list(worker.in_flight):
+                pending = self.pending.get(job_id)
+                if pending is None:
+                    continue
+                if pending.job.attempts < self.settings.max_job_attempts:
+                    pending.worker = None
+                    self.backlog.appendleft(job_id)
+                else:
+                    self._fail(pending, f"Crawl worker {worker.worker_id} crashed", "worker_crashed")
+            worker.in_flight.clear()
+            await asyncio.sleep(self.settings.restart_delay)
+            # Starting a process pickles its arguments and waits for it, so it runs off the event loop
+            self.workers[index] = await asyncio.to_thread(self._spawn, worker.worker_id)
+
+    async def close(self) -> None:
+        if not self.started:
+            return
+        self._closing = True
+        self._supervisor.cancel()
+        for worker in self.workers:
+            worker.job_queue.put(None)
+        for worker in self.workers:
+            await self._loop.run_in_executor(None, worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._results.put(None)
+        for pending in list(self.pending.values()):
+            self._fail(pending, "Crawl pool shut down", "pool_closed")
+        self.workers = []
+        self._loop = None
+        self._supervisor = None
+        self._closing = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": [
+                {"worker_id": w.worker_id, "pid": w.process.pid, "alive": w.process.is_alive(), "in_flight": len(w.in_flight)}
+                for w in self.workers
+            ],
+            "backlog": len(self.backlog),
+            "completed": self.completed,
+            "restarts": self.restarts,
+        }
+
+
+crawl_pool = CrawlWorkerPool()
+metrics.register("crawl_pool", crawl_pool.stats)
@@ -1,20 +1,28 @@
-from scrapy.crawler import CrawlerRunner
-from scrapy.utils.project import get_project_settings
-from twisted.internet.asyncioreactor import install as install_reactor
-from twisted.internet.defer import Deferred
-from app.spiders.llm_spider import LLMPlaywrightSpider  # adjust if needed
-from app.schemas.context_schema import CrawlSession
+from app.config.strigil_config import config
+from app.schemas.context_schema import CrawlSession, PageContext
 from app.schemas.error_schema import WebScraperError, CrawlError, NetworkError
+from app.services.cancellation import CrawlCancellation
+from app.services.export import open_exporter
+from app.services.profiling import CrawlProfiler, ProfileLevel
+from app.services.recording import recorder
 import asyncio
 import traceback
-from typing import Tuple, List, Optional
+import uuid
+from typing import Callable, Tuple, List, Optional
 
 _reactor_installed = False
 
-async def run_crawl(start_url: str, user_instruction: str, max_depth: int = 3) -> Tuple[CrawlSession, List[WebScraperError]]:
+def prepare_scrapy_engine():
+    """
+    Import Scrapy and the spider and install the asyncio reactor on the running event loop.
+
+    Scrapy and Twisted are imported here instead of at module level so the API starts
+    without them; the lifespan warm-up calls this ahead of the first crawl.
+    """
     global _reactor_installed
-    errors = []
-    
+    from twisted.internet.asyncioreactor import install as install_reactor
+    import app.spiders.llm_spider  # noqa: F401
+
     if not _reactor_installed:
         try:
             install_reactor()
@@ -22,20 +30,84 @@ async def run_crawl(start_url: str, user_instruction: str, max_depth: int = 3) -
             pass
         _reactor_installed = True
 
+async def run_crawl(
+    start_url: str,
+    user_instruction: str,
+    max_depth: int = 3,
+    fresh_only: bool = False,
+    on_page: Optional[Callable[[PageContext], None]] = None,
+    crawl_id: Optional[str] = None,
+    profile: Optional[ProfileLevel] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[CrawlSession, List[WebScraperError]]:
+    """
+    Run one crawl on the configured engine.
+
+    With a `deadline` in seconds, the crawl is cancelled once it passes and returns the
+    pages done until then, marked truncated in `session.completion`. Crawls can also be
+    cancelled through `cancellation.cancel_crawl(crawl_id, reason)`.
+    """
+    session = CrawlSession(
+        start_urls=[start_url],
+        user_instruction=user_instruction,
+        max_depth=max_depth,
+        fresh_only=fresh_only,
+        crawl_id=crawl_id or uuid.uuid4().hex,
+    )
+    cancellation = CrawlCancellation(session.crawl_id, deadline)
+    exporter = None
+    profiler = None
+    errors: List[WebScraperError] = []
+    try:
+        # Set up inside the try, so whatever was started is cleaned up if a later step fails
+        recorder.begin(session)
+        cancellation.start()
+        exporter = open_exporter(session)
+        if profile:
+            profiler = CrawlProfiler(session.crawl_id, profile)
+            profiler.start()
+        if cancellation.cancelled:
+            # The deadline passed before the crawl started
+            pass
+        elif config.crawl_engine == "asyncio":
+            # Imported lazily so deployments on the Scrapy engine never load it
+            from app.services.async_engine import run_async_crawl
+            errors = await run_async_crawl(session, on_page=on_page)
+        else:
+            errors = await _run_scrapy_crawl(session, on_page)
+    finally:
+        cancellation.close(session)
+        # Saved even when the crawl failed, so the pages recorded so far are kept
+        recorder.end(session)
+        if profiler is not None:
+            session.profile = await profiler.stop()
+        if exporter is not None:
+            # Crawl-level errors are not seen by the controller
+            for error in errors:
+                exporter.on_error(error)
+            session.export = await exporter.close()
+    return session, errors
+
+async def _run_scrapy_crawl(session: CrawlSession, on_page: Optional[Callable[[PageContext], None]]) -> List[WebScraperError]:
+    errors = []
+    prepare_scrapy_engine()
+    from scrapy.crawler import CrawlerRunner
+    from scrapy.utils.project import get_project_settings
+    from app.spiders.llm_spider import LLMPlaywrightSpider
+
     try:
         settings = get_project_settings()
+        har_path = recorder.har_path()
+        if har_path is not None:
+            settings.set("PLAYWRIGHT_CONTEXTS", {"default": {"record_har_path": har_path}})
         runner = CrawlerRunner(settings)
 
-        session = CrawlSession(
-            start_urls= [start_url],
-            user_instruction=user_instruction,
-            max_depth=max_depth
-        )
-
         # Define a dynamic subclass of your spider to inject `session`
         class CustomLLMPlaywrightSpider(LLMPlaywrightSpider):
             def __init__(self, *args, **kwargs):
                 super().__init__(session,*args, **kwargs)
+                if on_page is not None:
+                    self.controller.page_listeners.append(on_page)
 
         # Run it as an asyncio-friendly Twisted call
         future_resp = asyncio.Future()
@@ -66,5 +138,4 @@ async def run_crawl(start_url: str, user_instruction: str, max_depth: int = 3) -
         )
         errors.append(error)
         
-    return session, errors
-
+    return errors
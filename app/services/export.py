@@ -0,0 +1,332 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config.strigil_config import config, ExportConfig
+from app.schemas.api_schema import CrawlExport
+from app.schemas.context_schema import CrawlSession, PageContext
+from app.schemas.error_schema import WebScraperError
+from app.services.metrics import metrics
+
+PAGE_COLUMNS = ["crawl_id", "url", "title", "depth", "prev_url", "prev_action_key", "summary", "body_text", "actions", "interactables", "exported_at"]
+ERROR_COLUMNS = ["crawl_id", "error_type", "message", "details", "exported_at"]
+
+_active: Dict[str, "ResultExporter"] = {}
+
+
+def exporter_for(session: CrawlSession) -> Optional["ResultExporter"]:
+    return _active.get(session.crawl_id) if session.crawl_id else None
+
+
+def page_row(crawl_id: str, page_ctx: PageContext) -> dict:
+    """Flat record of a page; nested values are JSON strings so every sink has the same columns"""
+    prev = page_ctx.prev_page_action
+    return {
+        "crawl_id": crawl_id,
+        "url": str(page_ctx.details.url),
+        "title": page_ctx.details.title,
+        "depth": page_ctx.depth,
+        "prev_url": str(prev.url) if prev else None,
+        "prev_action_key": prev.action_key if prev else None,
+        "summary": page_ctx.summary,
+        "body_text": page_ctx.details.body_text,
+        "actions": json.dumps([action.model_dump(mode="json") for action in page_ctx.actions]),
+        "interactables": json.dumps([item.model_dump(mode="json") for item in page_ctx.details.interactables]),
+        "exported_at": time.time(),
+    }
+
+
+def error_row(crawl_id: str, error: WebScraperError) -> dict:
+    return {
+        "crawl_id": crawl_id,
+        "error_type": error.error_type,
+        "message": error.message,
+        "details": json.dumps(error.details, default=str),
+        "exported_at": time.time(),
+    }
+
+
+class ResultSink:
+    """
+    Writes batches of page and error records to numbered files under `directory`,
+    starting a new file once the current one reaches `rotate_bytes`.
+
+    Sinks run on the exporter's writer thread, never on the event loop.
+    """
+    suffix = ""
+
+    def __init__(self, directory: Path, settings: ExportConfig):
+        self.directory = directory
+        self.settings = settings
+        self.parts: Dict[str, int] = {}
+        self.files: List[str] = []
+
+    def _next_path(self, stem: str = "results") -> Path:
+        self.parts[stem] = self.parts.get(stem, 0) + 1
+        path = self.directory / f"{stem}-{self.parts[stem]:05d}{self.suffix}"
+        self.files.append(str(path))
+        return path
+
+    def write(self, kind: str, rows: List[dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSink(ResultSink):
+    """One JSON object per line, pages and errors in the same file with a `kind` field"""
+    suffix = ".jsonl"
+
+    def __init__(self, directory: Path, settings: ExportConfig):
+        super().__init__(directory, settings)
+        self._file = None
+
+    def write(self, kind: str, rows: List[dict]) -> None:
+        if self._file is None or self._file.tell() >= self.settings.rotate_bytes:
+            self.close()
+            self._file = open(self._next_path(), "w", encoding="utf-8")
+        self._file.writelines(json.dumps({"kind": kind, **row}) + "\n" for row in rows)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SqliteSink(ResultSink):
+    """`pages` and `errors` tables, one transaction per batch"""
+    suffix = ".sqlite"
+
+    def __init__(self, directory: Path, settings: ExportConfig):
+        super().__init__(directory, settings)
+        self._db: Optional[sqlite3.Connection] = None
+        self._path: Optional[Path] = None
+
+    def _open(self) -> None:
+        self._path = self._next_path()
+        self._db = sqlite3.connect(self._path)
+        self._db.execute(f"CREATE TABLE pages ({', '.join(PAGE_COLUMNS)})")
+        self._db.execute(f"CREATE TABLE errors ({', '.join(ERROR_COLUMNS)})")
+
+    def write(self, kind: str, rows: List[dict]) -> None:
+        if self._db is None or self._path.stat().st_size >= self.settings.rotate_bytes:
+            self.close()
+            self._open()
+        table, columns = ("pages", PAGE_COLUMNS) if kind == "page" else ("errors", ERROR_COLUMNS)
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row[column] for column in columns) for row in rows],
+            )
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class ParquetSink(ResultSink):
+    """
+    Separate `pages-*.parquet` and `errors-*.parquet` files; rows are buffered and written
+    as row groups of `parquet_row_group` rows. Needs pyarrow.
+    """
+    suffix = ".parquet"
+
+    def __init__(self, directory: Path, settings: ExportConfig):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from e
+        super().__init__(directory, settings)
+        self._writers: Dict[str, Tuple[object, Path]] = {}
+        self._buffers: Dict[str, List[dict]] = {"page": [], "error": []}
+
+    def _schema(self, kind: str):
+        import pyarrow as pa
+
+        columns = PAGE_COLUMNS if kind == "page" else ERROR_COLUMNS
+        types = {"depth": pa.int64(), "exported_at": pa.float64()}
+        return pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+    def write(self, kind: str, rows: List[dict]) -> None:
+        buffer = self._buffers[kind]
+        buffer.extend(rows)
+        while len(buffer) >= self.settings.parquet_row_group:
+            self._write_group(kind, buffer[:self.settings.parquet_row_group])
+            del buffer[:self.settings.parquet_row_group]
+
+    def _write_group(self, kind: str, rows: List[dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer, path = self._writers.get(kind, (None, None))
+        if writer is not None and path.stat().st_size >= self.settings.rotate_bytes:
+            writer.close()
+            writer = None
+        if writer is None:
+            path = self._next_path("pages" if kind == "page" else "errors")
+            writer = pq.ParquetWriter(str(path), self._schema(kind))
+            self._writers[kind] = (writer, path)
+        writer.write_table(pa.Table.from_pylist(rows, schema=self._schema(kind)))
+
+    def close(self) -> None:
+        for kind, buffer in self._buffers.items():
+            if buffer:
+                self._write_group(kind, buffer)
+                buffer.clear()
+        for writer, _ in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+SINKS = {"jsonl": JsonlSink, "parquet": ParquetSink, "sqlite": SqliteSink}
+
+
+class ResultExporter:
+    """
+    Streams the pages and errors of one crawl to the configured sinks as they are produced.
+
+    Records are serialized when they arrive and written in batches by a writer thread,
+    every `batch_size` records or `flush_interval` seconds. The queue between them holds
+    at most `max_queue` records. When it is full, records wait in an overflow that a
+    task moves to the queue from a worker thread, and the crawl awaits `wait_for_room`
+    after each page until the overflow is empty, so memory stays bounded however large
+    the crawl gets without blocking the event loop. Error records, which are not waited
+    for, are dropped once `max_queue` of them overflow. With `release_page_text` the
+    in-memory history also drops page text once it is exported.
+    """
+
+    def __init__(self, crawl_id: str, settings: Optional[ExportConfig] = None):
+        self.crawl_id = crawl_id
+        self.settings = settings or config.export
+        self.directory = Path(self.settings.directory) / crawl_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sinks = [SINKS[name](self.directory, self.settings) for name in self.settings.sinks]
+        self.counts = {"page": 0, "error": 0}
+        self.failures: List[str] = []
+        self.dropped_errors = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=self.settings.max_queue)
+        self._overflow: Deque[Tuple[str, dict]] = deque()
+        self._feeder: Optional[asyncio.Task] = None
+        self._thread = threading.Thread(target=self._write_loop, name=f"export-{crawl_id[:8]}", daemon=True)
+
+    def start(self) -> None:
+        _active[self.crawl_id] = self
+        self._thread.start()
+
+    def _put(self, kind: str, row: dict) -> None:
+        self.counts[kind] += 1
+        if not self._overflow:
+            try:
+                self._queue.put_nowait((kind, row))
+                return
+            except queue.Full:
+                pass
+        # Listeners are called from the event loop, so a full queue must not be waited on here
+        if kind == "error" and len(self._overflow) >= self.settings.max_queue:
+            # Errors are appended without awaiting `wait_for_room`, so their overflow is capped
+            self.counts[kind] -= 1
+            self.dropped_errors += 1
+            metrics.incr("export.dropped_errors")
+            return
+        metrics.incr("export.backpressure")
+        self._overflow.append((kind, row))
+        if self._feeder is None or self._feeder.done():
+            self._feeder = asyncio.get_running_loop().create_task(self._feed())
+
+    async def _feed(self) -> None:
+        while self._overflow:
+            await asyncio.to_thread(self._queue.put, self._overflow[0])
+            self._overflow.popleft()
+
+    async def wait_for_room(self) -> None:
+        """Wait until the writer has taken every record that did not fit in the queue"""
+        if self._feeder is not None and not self._feeder.done():
+            metrics.incr("export.backpressure_waits")
+            await asyncio.shield(self._feeder)
+
+    def on_page(self, page_ctx: PageContext) -> None:
+        self._put("page", page_row(self.crawl_id, page_ctx))
+        if self.settings.release_page_text:
+            # A copy, so the caller's PageDetails (and anything sharing it) keeps its text
+            page_ctx.details = page_ctx.details.model_copy(update={"body_text": ""})
+
+    def on_error(self, error: WebScraperError) -> None:
+        self._put("error", error_row(self.crawl_id, error))
+
+    def _write_loop(self) -> None:
+        batches: Dict[str, List[dict]] = {"page": [], "error": []}
+        last_flush = time.monotonic()
+        done = False
+        while not done:
+            try:
+                item = self._queue.get(timeout=self.settings.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                done = True
+            elif item:
+                batches[item[0]].append(item[1])
+            pending = sum(len(rows) for rows in batches.values())
+            if done or pending >= self.settings.batch_size or (pending and time.monotonic() - last_flush >= self.settings.flush_interval):
+                self._flush(batches)
+                last_flush = time.monotonic()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self._failed(sink, e)
+
+    def _flush(self, batches: Dict[str, List[dict]]) -> None:
+        started = time.monotonic()
+        for kind, rows in batches.items():
+            if not rows:
+                continue
+            for sink in self.sinks:
+                try:
+                    sink.write(kind, rows)
+                except Exception as e:
+                    # A failing sink must not stop the others or the crawl
+                    print(f"DEBUG: Export to {type(sink).__name__} failed: {str(e)}")
+                    self._failed(sink, e)
+                    metrics.incr("export.failures")
+            metrics.incr(f"export.{kind}s", len(rows))
+            rows.clear()
+        metrics.observe("stage.export", time.monotonic() - started)
+
+    def _failed(self, sink: ResultSink, error: Exception) -> None:
+        if len(self.failures) < 20:
+            self.failures.append(f"{type(sink).__name__}: {str(error)}")
+
+    async def close(self) -> CrawlExport:
+        """Write what is still queued, close the sinks and summarize the export"""
+        _active.pop(self.crawl_id, None)
+        if self._feeder is not None:
+            await self._feeder
+        await asyncio.to_thread(self._queue.put, None)
+        await asyncio.to_thread(self._thread.join)
+        return CrawlExport(
+            directory=str(self.directory),
+            files=[path for sink in self.sinks for path in sink.files],
+            pages=self.counts["page"],
+            errors=self.counts["error"],
+            failures=self.failures + ([f"{self.dropped_errors} error records dropped while the export queue was full"] if self.dropped_errors else []),
+        )
+
+
+def open_exporter(session: CrawlSession, settings: Optional[ExportConfig] = None) -> Optional[ResultExporter]:
+    """Start exporting a crawl if any sink is configured"""
+    settings = settings or config.export
+    if not settings.sinks:
+        return None
+    exporter = ResultExporter(session.crawl_id, settings)
+    exporter.start()
+    return exporter
@@ -0,0 +1,130 @@
+import hashlib
+import time
+from typing import Optional
+
+from app.config.strigil_config import config, InteractionConfig
+from app.schemas.context_schema import Interactable, PageDetails
+from app.services.metrics import metrics
+
+# Tag name and a CSS path from the nearest ancestor with an id, by element type and position
+DESCRIBE_ELEMENT_JS = """el => {
+    const parts = [];
+    let node = el;
+    for (; node && node.nodeType === 1 && node !== document.documentElement; node = node.parentElement) {
+        if (node.id) {
+            parts.unshift("#" + CSS.escape(node.id));
+            break;
+        }
+        let index = 1;
+        for (let sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.tagName === node.tagName) index++;
+        }
+        parts.unshift(node.tagName.toLowerCase() + ":nth-of-type(" + index + ")");
+    }
+    if (!node || node === document.documentElement) parts.unshift("html");
+    return {tag: el.tagName.toLowerCase(), domPath: parts.join(" > ")};
+}"""
+
+# Records DOM mutations and the URL from before the click on `window`
+OBSERVE_JS = """() => {
+    const state = {href: location.href, changedAt: 0};
+    window.__strigilInteraction = state;
+    const observer = new MutationObserver(() => { state.changedAt = performance.now(); });
+    observer.observe(document.documentElement, {subtree: true, childList: true, characterData: true, attributes: true});
+    state.observer = observer;
+}"""
+
+# Resolves with "route" or "dom" once the page changed and has been quiet for `quiet` ms, or null at `timeout`
+SETTLE_JS = """({timeout, quiet}) => new Promise(resolve => {
+    const state = window.__strigilInteraction;
+    const started = performance.now();
+    const check = () => {
+        const now = performance.now();
+        const routed = location.href !== state.href;
+        const quietFor = now - (state.changedAt || started);
+        if ((routed || state.changedAt) && quietFor >= quiet) {
+            state.observer.disconnect();
+            resolve(routed ? "route" : "dom");
+        } else if (now - started >= timeout) {
+            state.observer.disconnect();
+            resolve(routed || state.changedAt ? (routed ? "route" : "dom") : null);
+        } else {
+            setTimeout(check, 25);
+        }
+    };
+    check();
+})"""
+
+
+def state_fingerprint(details: PageDetails) -> str:
+    """Hash of what a page state shows: title, text and the elements on it, not the URL"""
+    digest = hashlib.sha256()
+    digest.update(details.title.encode())
+    digest.update(b"\0")
+    digest.update(details.body_text.encode())
+    for item in details.interactables:
+        digest.update(f"\0{item.tag}\0{item.key}\0{item.href}".encode())
+    return digest.hexdigest()
+
+
+def state_url(url: str, fingerprint: str) -> str:
+    """
+    URL identifying a page state reached by clicking in place, for states that share the
+    URL of another state: the URL with the state's fingerprint in its fragment.
+    """
+    separator = "&" if "#" in url else "#"
+    return f"{url}{separator}state-{fingerprint[:16]}"
+
+
+async def click_in_place(page, element: Interactable, settings: Optional[InteractionConfig] = None) -> Optional[str]:
+    """
+    Click an element of a rendered page and wait for the page to react, without a navigation.
+
+    Args:
+        page: The Playwright page, left in the state the click led to
+        element: The element, located by the `dom_path` recorded by `extract_details`
+        settings: Interaction settings, defaults to the `interaction` configuration
+
+    Returns:
+        "route" if the client-side route changed, "dom" if only the DOM changed, or None if
+        nothing changed or the element could not be clicked
+    """
+    settings = settings or config.interaction
+    started = time.monotonic()
+    try:
+        locator = page.locator(f"css={element.dom_path}").first
+        # The path is positional, so after an earlier click it may be gone or point at another element
+        if await locator.count() == 0 or (await locator.inner_text()).strip() != element.text:
+            metrics.incr("interaction.missing")
+            return None
+        await page.evaluate(OBSERVE_JS)
+        await locator.click(timeout=settings.click_timeout * 1000)
+        change = await _settle(page, settings)
+    except Exception as e:
+        print(f"DEBUG: Could not click {element.key!r} in place: {str(e)}")
+        metrics.incr("interaction.failures")
+        return None
+    metrics.observe("stage.interact", time.monotonic() - started)
+    metrics.incr("interaction.clicks")
+    if change is None:
+        metrics.incr("interaction.no_change")
+    return change
+
+
+async def go_back(page, settings: Optional[InteractionConfig] = None) -> bool:
+    """Return to the state before a client-side route change through the page's history; False if it did not change"""
+    settings = settings or config.interaction
+    try:
+        await page.evaluate(OBSERVE_JS)
+        await page.evaluate("() => history.back()")
+        return await _settle(page, settings) is not None
+    except Exception as e:
+        print(f"DEBUG: Could not go back from {page.url}: {str(e)}")
+        return False
+
+
+async def _settle(page, settings: InteractionConfig) -> Optional[str]:
+    return await page.evaluate(SETTLE_JS, {
+        "timeout": settings.settle_timeout * 1000,
+        "quiet": settings.quiet_period * 1000,
+    })
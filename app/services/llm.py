@@ -1,60 +1,91 @@
 import asyncio
 import os
 from pprint import pprint
-from openai import AsyncOpenAI
-from playwright.async_api import async_playwright, Playwright
 import json
 import re
 import httpx
 import traceback
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from app.schemas.error_schema import WebScraperError, LLMError
 from app.schemas.context_schema import CrawlSession, PageDetails, PageAction
 from pydantic import HttpUrl
-from app.config.strigil_config import config
-
-openai_api_key = os.getenv("OPEN_ROUTER_KEY")
-client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=openai_api_key,
-    timeout=httpx.Timeout(
-        config.timeouts.llm.request_timeout,
-        connect=config.timeouts.llm.connect_timeout
-    ),
-)
-
-async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions: str, page_details: PageDetails,prev_page_action : Optional[PageAction]= None) -> Tuple[Optional[str], Optional[WebScraperError]]:
+from app.config.strigil_config import config, LLMTierConfig
+from app.services.llm_router import llm_router, route_label
+from app.services.memory import SessionMemory
+from app.services.metrics import metrics
+from app.services.resilience import CircuitOpenError, RetryBudget
+from app.services.summary_store import PageSummary
+
+# Characters of the page text sent when a page is decided on its own
+PAGE_TEXT_CHARS = 2000
+
+def format_compact_history(history) -> str:
+    """Render a `CompactHistory` for the prompt, leaving out empty sections"""
+    block = f"""
+                Here is the history of previous pages you have searched: 
+                {history.summaries}"""
+    if history.digests:
+        block += f"""
+
+                Digest of {history.folded_pages} earlier pages, by branch of the crawl:
+                {history.digests}"""
+    if history.ancestors:
+        block += f"""
+
+                Path from the start page to the previous page:
+                {history.ancestors}"""
+    return block
+
+def page_content_block(page_details: PageDetails, text_chars: int, known: Optional[PageSummary] = None) -> str:
     """
-    Ask the LLM for guidance on how to interact with a webpage.
-    
-    Args:
-        session: The current crawl session
-        system_prompt: The system prompt to guide the LLM's behavior
-        user_instructions: The user's instructions for the crawl
-        page_details: Details of the current page
-        prev_page_action: Optional reference to the previous page action
-        
-    Returns:
-        Tuple containing:
-        - The LLM's response text (or None if there was an error)
-        - An error object (or None if there was no error)
+    What the prompt says about a page's content: for a page summarized before, its
+    stored summary and structure with the start of its text, otherwise its text with a
+    request for a reusable summary
     """
-    page_text = page_details.body_text
-    interactables = page_details.interactables
+    page_text = page_details.body_text[:text_chars]
+    if known is None:
+        return f"""Here is the text of the page:
+            {page_text}
+
+            Write the `summary` about the page itself, not about the user's prompt, so it can be reused for other prompts."""
+    excerpt = page_details.body_text[:min(text_chars, config.summary_store.excerpt_chars)]
+    return f"""This page was summarized before:
+            {known.summary}
+
+            Structure of the page:
+            {known.digest}
+
+            Start of the text of the page:
+            {excerpt}
 
+            The summary is known, so return an empty `summary` field."""
+
+def prompt_chars_saved(page_details: PageDetails, text_chars: int, known: PageSummary) -> int:
+    """Characters of page text a prompt leaves out by sending the stored summary"""
+    page_text = page_details.body_text[:text_chars]
+    return max(len(page_text) - len(page_content_block(page_details, text_chars, known)), 0)
+
+async def build_history_summary(session: CrawlSession, prev_page_action: Optional[PageAction], memory: Optional[SessionMemory] = None, include_action: bool = True) -> str:
+    """History block of a prompt: earlier pages, the previous page and, unless `include_action` is off, the action that led here"""
     history_summary = ""
     if prev_page_action is not None:
         try:
             prev_result = session.get_by_page_action(prev_page_action)
             if prev_result[0] is not None and prev_result[1] is not None:
                 prev_page_ctx, prev_action = prev_result
-                history_summary = f"""
+                if memory is not None:
+                    history_block = format_compact_history(await memory.compact(prev_page_ctx))
+                else:
+                    history_block = f"""
                 Here is the history of previous pages you have searched: 
-                {[session.summarize_page_context(page_ctx) for page_ctx in session.history if page_ctx.url() != prev_page_ctx.url()]}
+                {[session.summarize_page_context(page_ctx) for page_ctx in session.history if page_ctx.url() != prev_page_ctx.url()]}"""
+                history_summary = f"""{history_block}
 
                 Previous page explored: 
                 {session.summarize_page_context(prev_page_ctx)}
-
+                """
+                if include_action:
+                    history_summary += f"""
                 Action taken with a suggested goal for this page:
                 {prev_action}
                 """
@@ -64,6 +95,32 @@ async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions:
             print(f"DEBUG: Error getting previous page context: {str(e)}")
             # Continue without the history summary rather than failing
     
+    return history_summary
+
+async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions: str, page_details: PageDetails,prev_page_action : Optional[PageAction]= None, tier: Optional[LLMTierConfig] = None, retry_budget: Optional[RetryBudget] = None, memory: Optional[SessionMemory] = None, known_summary: Optional[PageSummary] = None) -> Tuple[Optional[str], Optional[WebScraperError]]:
+    """
+    Ask the LLM for guidance on how to interact with a webpage.
+    
+    Args:
+        session: The current crawl session
+        system_prompt: The system prompt to guide the LLM's behavior
+        user_instructions: The user's instructions for the crawl
+        page_details: Details of the current page
+        prev_page_action: Optional reference to the previous page action
+        tier: Cascade tier to query, defaults to the first (cheapest) tier
+        retry_budget: Per-crawl budget for retrying transient API failures
+        memory: Compacts the history block on deep crawls; without it every page summary is sent
+        known_summary: Stored summary of the page, sent instead of most of its text
+        
+    Returns:
+        Tuple containing:
+        - The LLM's response text (or None if there was an error)
+        - An error object (or None if there was no error)
+    """
+    interactables = page_details.interactables
+
+    history_summary = await build_history_summary(session, prev_page_action, memory)
+
     message = [
         {
             "role": "system",
@@ -80,8 +137,7 @@ async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions:
             Details of the page:
             {page_details}
             
-            Here is the text of the page:
-            {page_text[:2000]}
+            {page_content_block(page_details, PAGE_TEXT_CHARS, known_summary)}
 
             Here are the interactive elements (links, buttons, inputs):
             {[str(i) for i in interactables]}
@@ -91,21 +147,82 @@ async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions:
         }
     ]
 
+    return await complete_text(message, tier, retry_budget)
+
+async def ask_llm_batch(session: CrawlSession, system_prompt: str, user_instructions: str, pages: List[Tuple[PageDetails, PageAction, Optional[PageSummary]]], tier: Optional[LLMTierConfig] = None, retry_budget: Optional[RetryBudget] = None, memory: Optional[SessionMemory] = None) -> Tuple[Optional[str], Optional[WebScraperError]]:
+    """
+    Ask the LLM for one decision per page for sibling pages reached from the same parent,
+    sending the instruction and history only once.
+
+    Args:
+        session: The current crawl session
+        system_prompt: The system prompt to guide the LLM's behavior
+        user_instructions: The user's instructions for the crawl
+        pages: Details of each page with the action on the shared parent that led to it and its stored summary, if any
+        tier: Cascade tier to query, defaults to the first (cheapest) tier
+        retry_budget: Per-crawl budget for retrying transient API failures
+        memory: Compacts the history block on deep crawls
+
+    Returns:
+        Tuple containing:
+        - The LLM's response text, a JSON object keyed by page URL (or None if there was an error)
+        - An error object (or None if there was no error)
+    """
+    history_summary = await build_history_summary(session, pages[0][1], memory, include_action=False)
+    text_chars = config.llm_batching.page_text_chars
+
+    sections = []
+    for page_details, prev_page_action, known_summary in pages:
+        _, prev_action = session.get_by_page_action(prev_page_action)
+        sections.append(f"""
+            ### Page {page_details.url}
+            Action taken with a suggested goal for this page:
+            {prev_action}
+
+            Details of the page:
+            {page_details}
+
+            {page_content_block(page_details, text_chars, known_summary)}
+
+            Here are the interactive elements (links, buttons, inputs):
+            {[str(i) for i in page_details.interactables]}
+""")
+
+    message = [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": f"""
+            The user is requesting assistance in exploring a webpage to fulfill their prompt:
+            {user_instructions}
+
+            {history_summary}
+
+            The previous page led to the {len(pages)} pages below. Decide for each page separately
+            which elements we should interact with next, and why.
+            {"".join(sections)}
+            Return a single JSON object whose keys are the page URLs exactly as written after "### Page"
+            and whose values are the decision for that page, in the same format as for a single page.
+"""
+        }
+    ]
+    return await complete_text(message, tier, retry_budget)
+
+async def complete_text(message: List[dict], tier: Optional[LLMTierConfig] = None, retry_budget: Optional[RetryBudget] = None) -> Tuple[Optional[str], Optional[WebScraperError]]:
+    """Send a chat completion through the router and return the reply text or an LLMError"""
     print("LLM Request Message:")
     pprint(message)
     
     try:
         print("DEBUG: Sending request to LLM API...")
         timeout_value = config.timeouts.llm.request_timeout
-        # Set timeout directly on the API call
-        completion = await asyncio.wait_for(
-            client.chat.completions.create(
-                model=config.llm_model,  # Use the configurable model
-                messages=message
-            ),
-            timeout=timeout_value
-        )
-        print("DEBUG: LLM API response received")
+        if tier is None:
+            tier = llm_router.tiers()[0]
+        completion, route = await llm_router.complete(message, tier, retry_budget)
+        print(f"DEBUG: LLM API response received from {route_label(route)}")
         print("LLM completion:")
         pprint(completion)
         
@@ -137,7 +254,16 @@ async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions:
         )
         return None, error
     
-    except httpx.TimeoutException as e:
+    except CircuitOpenError as e:
+        print(f"ERROR: {str(e)}")
+        error = LLMError(
+            error_type="llm_circuit_open",
+            message=str(e),
+            details={"backend": e.backend, "retry_in": e.retry_in}
+        )
+        return None, error
+
+    except (httpx.TimeoutException, asyncio.TimeoutError) as e:
        
         print(f"ERROR: LLM API request timed out after {timeout_value} seconds: {str(e)}")
         error = LLMError(
@@ -154,4 +280,4 @@ async def ask_llm(session: CrawlSession, system_prompt: str, user_instructions:
             message=f"Error calling LLM API: {str(e)}",
             details={"error_type": "general_api_error"}
         )
-        return None, error
\ No newline at end of file
+        return None, error
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from app.config.strigil_config import config, LLMBatchingConfig
+from app.schemas.context_schema import PageAction, PageDetails
+from app.schemas.response_schema import LLMResponse
+from app.services.llm import ask_llm_batch
+from app.services.summary_store import PageSummary
+from app.services.llm_router import llm_router
+from app.services.metrics import metrics
+
+
+def extract_batch_from_response(response_text: str, urls: List[str]) -> Dict[str, LLMResponse]:
+    """
+    Extract the per-page decisions of a batched reply.
+
+    Args:
+        response_text: The text response from the LLM
+        urls: URLs of the pages in the batch
+
+    Returns:
+        URL mapped to its validated LLMResponse; pages that are missing or malformed are left out
+    """
+    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response_text, re.DOTALL)
+    if match is None:
+        match = re.search(r"(\{[\s\S]*\})", response_text, re.DOTALL)
+    if match is None:
+        return {}
+    try:
+        parsed = json.loads(match.group(1))
+    except json.JSONDecodeError as e:
+        print(f"DEBUG: Batched reply is not valid JSON: {str(e)}")
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+
+    # Models sometimes drop or add a trailing slash on the URL keys
+    by_key = {key.rstrip("/"): value for key, value in parsed.items()}
+    results = {}
+    for url in urls:
+        value = by_key.get(url.rstrip("/"))
+        if value is None:
+            continue
+        try:
+            results[url] = LLMResponse.model_validate(value)
+        except ValidationError as e:
+            print(f"DEBUG: Batched decision for {url} is invalid: {str(e)}")
+    return results
+
+
+def _resolve(items: List["_PendingDecision"], result: Optional[LLMResponse]) -> None:
+    for item in items:
+        if not item.future.done():
+            item.future.set_result(result)
+
+
+class _PendingDecision:
+    def __init__(self, details: PageDetails, prev_page_action: PageAction, known_summary: Optional[PageSummary], future: asyncio.Future):
+        self.details = details
+        self.prev_page_action = prev_page_action
+        self.known_summary = known_summary
+        self.future = future
+
+    @property
+    def url(self) -> str:
+        return str(self.details.url)
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[_PendingDecision] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class DecisionBatcher:
+    """
+    Collects LLM decisions for sibling pages, reached from the same parent at the same
+    depth, and asks for them in one request.
+
+    A batch is sent when it reaches `max_batch_size` pages or `window` seconds after
+    its first page arrived. The request goes to the cheapest cascade tier; pages whose
+    decision is missing or malformed in the reply, or whose confidence calls for
+    escalation, fall back to the controller's single-page path.
+    """
+
+    def __init__(self, controller, settings: Optional[LLMBatchingConfig] = None):
+        self.controller = controller
+        self._settings = settings
+        self._batches: Dict[Tuple[str, int], _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def settings(self) -> LLMBatchingConfig:
+        return self._settings or config.llm_batching
+
+    def batches(self, prev_page_action: Optional[PageAction]) -> bool:
+        """Whether a page reached by this action is decided in a batch with its siblings"""
+        return prev_page_action is not None and self.settings.max_batch_size >= 2
+
+    async def decide(self, details: PageDetails, depth: int, prev_page_action: Optional[PageAction], known_summary: Optional[PageSummary] = None) -> Optional[LLMResponse]:
+        instruction = self.controller.session.user_instruction
+        if not self.batches(prev_page_action):
+            return await self.controller._ask_llm(details, instruction, prev_page_action, known_summary=known_summary)
+
+        loop = asyncio.get_running_loop()
+        key = (str(prev_page_action.url), depth)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch()
+            batch.timer = loop.call_later(self.settings.window, self._flush, key)
+        item = _PendingDecision(details, prev_page_action, known_summary, loop.create_future())
+        batch.items.append(item)
+        if len(batch.items) >= self.settings.max_batch_size:
+            self._flush(key)
+        return await item.future
+
+    def _flush(self, key: Tuple[str, int]) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._run(batch.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def cancel(self) -> None:
+        """Cancel batched requests in flight; pages waiting for a decision get none"""
+        for key in list(self._batches):
+            batch = self._batches.pop(key)
+            if batch.timer is not None:
+                batch.timer.cancel()
+            _resolve(batch.items, None)
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _run(self, items: List[_PendingDecision]) -> None:
+        instruction = self.controller.session.user_instruction
+        if self.controller.stopped:
+            _resolve(items, None)
+            return
+        try:
+            results, escalate = await self._decide_batch(items) if len(items) > 1 else ({}, set())
+            fallbacks = [item for item in items if item.url not in results]
+            if len(items) > 1 and fallbacks:
+                metrics.incr("llm.batch_fallbacks", len(fallbacks))
+            answers = await asyncio.gather(*(
+                self.controller._ask_llm(item.details, instruction, item.prev_page_action, first_tier=1 if item.url in escalate else 0, known_summary=item.known_summary)
+                for item in fallbacks
+            ))
+            results.update({item.url: answer for item, answer in zip(fallbacks, answers)})
+            for item in items:
+                if not item.future.done():
+                    item.future.set_result(results.get(item.url))
+        except asyncio.CancelledError:
+            _resolve(items, None)
+            raise
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+
+    async def _decide_batch(self, items: List[_PendingDecision]) -> Tuple[Dict[str, LLMResponse], Set[str]]:
+        """Ask the first tier for every page in one request; returns usable decisions and pages to escalate"""
+        tiers = llm_router.tiers()
+        print(f"DEBUG: Asking for {len(items)} sibling pages in one request")
+        text, error = await ask_llm_batch(
+            self.controller.session,
+            config.system_prompt,
+            self.controller.session.user_instruction,
+            [(item.details, item.prev_page_action, item.known_summary) for item in items],
+            tier=tiers[0],
+            retry_budget=self.controller.retry_budget,
+            memory=self.controller.memory,
+        )
+        metrics.incr("llm.batches")
+        if error or not text:
+            print(f"DEBUG: Batched request failed, falling back to single pages: {error}")
+            return {}, set()
+
+        results = extract_batch_from_response(text, [item.url for item in items])
+        escalate = set()
+        if len(tiers) > 1:
+            for url, result in list(results.items()):
+                if result.confidence is not None and result.confidence < config.llm_routing.escalate_below_confidence:
+                    escalate.add(url)
+                    del results[url]
+        metrics.incr("llm.batched_pages", len(results))
+        return results, escalate
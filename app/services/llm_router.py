@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+from app.config.strigil_config import config, LLMBackendConfig, LLMRoutingConfig, LLMRouteConfig, LLMTierConfig
+from app.schemas.error_schema import RetryError
+from app.services.metrics import metrics, percentile
+from app.services.recording import recorder
+from app.services.resilience import RetryBudget, backoff_delay, breaker_for, is_transient, retry_after_from
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+class RouteStats:
+    """Latency, cost and hedge outcomes of one backend/model route"""
+
+    def __init__(self, max_samples: int = 500):
+        self.requests = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.races = 0
+        self.wins = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latencies: Deque[float] = deque(maxlen=max_samples)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "p50": percentile(self.latencies, 50),
+            "p95": percentile(self.latencies, 95),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": round(self.cost, 6),
+            "hedge_races": self.races,
+            "win_rate": self.wins / self.races if self.races else None,
+        }
+
+
+def route_label(route: LLMRouteConfig) -> str:
+    return f"{route.backend}/{route.model}"
+
+
+class LLMRouter:
+    """
+    Routes chat completions over the configured OpenAI-compatible backends.
+
+    The cascade is a list of tiers ordered from cheapest to strongest; callers walk
+    it and escalate when a tier's answer cannot be used. Within a tier, hedging
+    starts the tier's alternate route once the primary has been outstanding for
+    longer than its recent p95 latency, keeps whichever finishes first and cancels
+    the other. Transient failures are retried with jittered backoff, and every
+    backend sits behind a circuit breaker that fails fast during an outage.
+    """
+
+    def __init__(self, settings: Optional[LLMRoutingConfig] = None, default_model: Optional[str] = None):
+        self._settings = settings
+        self._default_model = default_model
+        self.clients: Dict[str, "AsyncOpenAI"] = {}
+        self.route_stats: Dict[str, RouteStats] = {}
+
+    @property
+    def settings(self) -> LLMRoutingConfig:
+        return self._settings or config.llm_routing
+
+    @property
+    def default_model(self) -> str:
+        return self._default_model or config.llm_model
+
+    @property
+    def backends(self) -> Dict[str, LLMBackendConfig]:
+        return {backend.name: backend for backend in self.settings.backends}
+
+    def tiers(self) -> List[LLMTierConfig]:
+        if self.settings.tiers:
+            return self.settings.tiers
+        default_backend = self.settings.backends[0].name
+        return [LLMTierConfig(route=LLMRouteConfig(backend=default_backend, model=self.default_model))]
+
+    def _client(self, backend_name: str) -> "AsyncOpenAI":
+        client = self.clients.get(backend_name)
+        if client is None:
+            # The OpenAI SDK takes a large share of import time, so it loads with the first client
+            import httpx
+            from openai import AsyncOpenAI
+
+            backend = self.backends[backend_name]
+            client = AsyncOpenAI(
+                base_url=backend.base_url,
+                # Replays never reach the backend, so they run without its key
+                api_key=os.getenv(backend.api_key_env) or ("replay" if recorder.replaying else None),
+                max_retries=0,  # retries are handled by complete() under the crawl's retry budget
+                timeout=httpx.Timeout(
+                    config.timeouts.llm.request_timeout,
+                    connect=config.timeouts.llm.connect_timeout
+                ),
+                # Replays answer from the recorded completions without touching the network
+                http_client=recorder.llm_http_client() if recorder.replaying else None,
+            )
+            self.clients[backend_name] = client
+        return client
+
+    def _stats(self, route: LLMRouteConfig) -> RouteStats:
+        return self.route_stats.setdefault(route_label(route), RouteStats())
+
+    def hedge_delay(self, route: LLMRouteConfig) -> float:
+        samples = self._stats(route).latencies
+        if len(samples) < self.settings.hedge_min_samples:
+            return self.settings.hedge_default_delay
+        return max(self.settings.hedge_min_delay, percentile(samples, self.settings.hedge_quantile))
+
+    async def _call(self, route: LLMRouteConfig, messages: List[dict]):
+        breaker = breaker_for(route.backend)
+        probe = breaker.before_call()
+        stats = self._stats(route)
+        stats.requests += 1
+        started = time.monotonic()
+        try:
+            completion = await asyncio.wait_for(
+                self._client(route.backend).chat.completions.create(
+                    model=route.model,
+                    messages=messages
+                ),
+                timeout=config.timeouts.llm.request_timeout
+            )
+        except asyncio.CancelledError:
+            # A hedge loser or a cancelled crawl says nothing about the backend
+            stats.cancelled += 1
+            if probe:
+                breaker.release_probe()
+            raise
+        except Exception as e:
+            stats.failures += 1
+            if is_transient(e):
+                breaker.record_failure()
+            elif probe:
+                breaker.release_probe()
+            raise
+
+        breaker.record_success()
+        latency = time.monotonic() - started
+        stats.latencies.append(latency)
+        metrics.observe("stage.llm", latency)
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost += (prompt_tokens * route.input_cost_per_1k + completion_tokens * route.output_cost_per_1k) / 1000
+        if recorder.recording:
+            recorder.record_completion(messages, route.model, completion)
+        return completion
+
+    async def complete(self, messages: List[dict], tier: LLMTierConfig, retry_budget: Optional[RetryBudget] = None) -> Tuple[object, LLMRouteConfig]:
+        """
+        Run a chat completion on one tier of the cascade, retrying transient failures.
+
+        Args:
+            messages: Chat messages to send
+            tier: Tier to run, hedged against `tier.hedge` when hedging is enabled
+            retry_budget: Per-crawl retry budget; without one, no retries are made
+
+        Returns:
+            Tuple of the completion and the route that produced it
+
+        Raises:
+            CircuitOpenError: If the tier's backend circuit is open
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._complete_once(messages, tier)
+            except Exception as e:
+                if not is_transient(e) or attempt >= config.resilience.llm_max_retries or retry_budget is None:
+                    raise
+                delay = backoff_delay(attempt, retry_after_from(e))
+                notice = RetryError(
+                    error_type="llm_retry",
+                    message=f"Retrying {route_label(tier.route)} in {delay:.2f}s after: {str(e) or type(e).__name__}",
+                    details={"model": route_label(tier.route), "attempt": attempt + 1, "delay": delay}
+                )
+                if not retry_budget.take(notice):
+                    raise
+                print(f"DEBUG: {notice.message}")
+                metrics.incr("llm.retries")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _complete_once(self, messages: List[dict], tier: LLMTierConfig) -> Tuple[object, LLMRouteConfig]:
+        if not (self.settings.hedging and tier.hedge):
+            return await self._call(tier.route, messages), tier.route
+
+        routes = {}
+        primary = asyncio.create_task(self._call(tier.route, messages))
+        routes[primary] = tier.route
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(tier.route))
+            if primary in done and primary.exception() is None:
+                return primary.result(), tier.route
+
+            print(f"DEBUG: Hedging {route_label(tier.route)} with {route_label(tier.hedge)}")
+            metrics.incr("llm.hedges")
+            hedge = asyncio.create_task(self._call(tier.hedge, messages))
+            routes[hedge] = tier.hedge
+            pending = {task for task in (primary, hedge) if not task.done()}
+            self._stats(tier.route).races += 1
+            self._stats(tier.hedge).races += 1
+
+            last_error = primary.exception() if primary.done() else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._stats(routes[task]).wins += 1
+                        return task.result(), routes[task]
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def preconnect(self, timeout: float) -> Dict[str, str]:
+        """
+        Open a pooled connection to every backend used by the cascade, so the first
+        crawl does not pay for DNS, TCP and TLS set-up.
+
+        Returns:
+            Backend name mapped to "connected" or the reason the connection failed
+        """
+        import openai
+
+        names = {tier.route.backend for tier in self.tiers()}
+        names.update(tier.hedge.backend for tier in self.tiers() if tier.hedge is not None)
+        results = {}
+        for name in sorted(names):
+            try:
+                await asyncio.wait_for(self._client(name).models.list(), timeout=timeout)
+                results[name] = "connected"
+            except openai.APIStatusError:
+                # Any HTTP answer means the connection is open, even if listing models is not allowed
+                results[name] = "connected"
+            except Exception as e:
+                results[name] = f"{type(e).__name__}: {str(e)}"
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {label: stats.summary() for label, stats in self.route_stats.items()}
+
+
+llm_router = LLMRouter()
+metrics.register("llm_routes", llm_router.stats)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import re
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.config.strigil_config import config, MemoryConfig
+from app.schemas.context_schema import CrawlSession, PageContext
+from app.services.metrics import metrics
+from app.services.resilience import RetryBudget
+
+ROOT_BRANCH = "root"
+OTHER_BRANCHES = "other branches"
+WORD_PATTERN = re.compile(r"[a-z0-9]{4,}")
+
+
+class CompactHistory(BaseModel):
+    """History block of one LLM prompt"""
+    summaries: List[dict] = Field(default_factory=list, description="Page summaries sent verbatim")
+    ancestors: List[dict] = Field(default_factory=list, description="Path from the start page to the previous page, in full")
+    digests: Dict[str, str] = Field(default_factory=dict, description="Rolling digest of the remaining pages, per branch of the crawl tree")
+    folded_pages: int = 0
+
+
+def words(text: str) -> set:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+class SessionMemory:
+    """
+    Keeps the history block of `ask_llm` roughly constant in size on deep crawls.
+
+    Until the crawl has visited `full_history_pages` pages every summary is sent, as
+    before. After that the prompt gets the ancestor path of the current page in full,
+    the most recent and the most instruction-relevant summaries verbatim, and one
+    rolling digest per branch of the crawl tree for everything else. Digests are
+    folded locally by truncation, or by a batched LLM call refreshed every
+    `fold_every` pages of a branch, with local lines for the pages in between.
+    """
+
+    def __init__(self, session: CrawlSession, retry_budget: Optional[RetryBudget] = None, settings: Optional[MemoryConfig] = None):
+        self.session = session
+        self.retry_budget = retry_budget
+        self._settings = settings
+        self._by_url: Dict[str, PageContext] = {}
+        self._indexed = 0
+        # LLM digests and the pages already folded into them, per branch
+        self._digests: Dict[str, str] = {}
+        self._folded: Dict[str, set] = {}
+        self._fold_lock = asyncio.Lock()
+        self._instruction_words = words(session.user_instruction or "")
+
+    @property
+    def settings(self) -> MemoryConfig:
+        return self._settings or config.memory
+
+    def _index(self) -> None:
+        # History is append-only, so only new entries need indexing
+        for page_ctx in self.session.history[self._indexed:]:
+            self._by_url.setdefault(str(page_ctx.url()), page_ctx)
+        self._indexed = len(self.session.history)
+
+    def _parent(self, page_ctx: PageContext) -> Optional[PageContext]:
+        if page_ctx.prev_page_action is None:
+            return None
+        return self._by_url.get(str(page_ctx.prev_page_action.url))
+
+    def ancestors(self, page_ctx: PageContext) -> List[PageContext]:
+        """Pages from the start page down to, and excluding, `page_ctx`"""
+        path, seen = [], {str(page_ctx.url())}
+        parent = self._parent(page_ctx)
+        while parent is not None and str(parent.url()) not in seen:
+            seen.add(str(parent.url()))
+            path.append(parent)
+            parent = self._parent(parent)
+        return list(reversed(path))
+
+    def branch(self, page_ctx: PageContext) -> str:
+        """URL of the ancestor at `branch_depth` that roots the page's branch of the crawl tree"""
+        if page_ctx.depth < self.settings.branch_depth:
+            return ROOT_BRANCH
+        for ancestor in [*self.ancestors(page_ctx), page_ctx]:
+            if ancestor.depth == self.settings.branch_depth:
+                return str(ancestor.url())
+        return ROOT_BRANCH
+
+    def _summarize(self, page_ctx: PageContext) -> dict:
+        try:
+            return self.session.summarize_page_context(page_ctx)
+        except Exception:
+            return {"depth": page_ctx.depth, "details": page_ctx.details.summarized(), "summary": page_ctx.summary}
+
+    async def compact(self, prev_page_ctx: PageContext) -> CompactHistory:
+        """
+        Build the history block for a page reached from `prev_page_ctx`.
+
+        The previous page itself is left out, since `ask_llm` lists it separately.
+        """
+        self._index()
+        settings = self.settings
+        prev_url = str(prev_page_ctx.url())
+        others = [page_ctx for page_ctx in self.session.history if str(page_ctx.url()) != prev_url]
+        if len(self.session.history) <= settings.full_history_pages:
+            return CompactHistory(summaries=[self._summarize(page_ctx) for page_ctx in others])
+
+        ancestors = self.ancestors(prev_page_ctx)
+        ancestor_urls = {str(page_ctx.url()) for page_ctx in ancestors}
+        others = [page_ctx for page_ctx in others if str(page_ctx.url()) not in ancestor_urls]
+
+        keep = settings.recent_summaries
+        recent = others[-keep:] if keep > 0 else []
+        older = others[:-keep] if keep > 0 else others
+        overlap = {id(page_ctx): len(self._instruction_words & words(f"{page_ctx.details.title} {page_ctx.summary}")) for page_ctx in older}
+        relevant = sorted(
+            (page_ctx for page_ctx in older if overlap[id(page_ctx)] > 0),
+            key=lambda page_ctx: overlap[id(page_ctx)],
+            reverse=True,
+        )[:settings.relevant_summaries]
+        relevant_ids = {id(page_ctx) for page_ctx in relevant}
+        folded = [page_ctx for page_ctx in older if id(page_ctx) not in relevant_ids]
+
+        verbatim_ids = relevant_ids | {id(page_ctx) for page_ctx in recent}
+        verbatim = [page_ctx for page_ctx in others if id(page_ctx) in verbatim_ids]
+        return CompactHistory(
+            summaries=[self._summarize(page_ctx) for page_ctx in verbatim],
+            ancestors=[self._summarize(page_ctx) for page_ctx in ancestors],
+            digests=await self._branch_digests(folded),
+            folded_pages=len(folded),
+        )
+
+    async def _branch_digests(self, folded: List[PageContext]) -> Dict[str, str]:
+        settings = self.settings
+        branches: Dict[str, List[PageContext]] = {}
+        for page_ctx in folded:
+            branches.setdefault(self.branch(page_ctx), []).append(page_ctx)
+        if not branches:
+            return {}
+
+        # Branches are ordered by their most recently folded page; the oldest share one digest
+        position = {id(page_ctx): index for index, page_ctx in enumerate(folded)}
+        order = sorted(branches, key=lambda name: position[id(branches[name][-1])], reverse=True)
+        if len(order) > settings.max_branch_digests:
+            kept = order[:max(settings.max_branch_digests - 1, 0)]
+            merged = [page_ctx for name in order[len(kept):] for page_ctx in branches[name]]
+            branches = {name: branches[name] for name in kept}
+            branches[OTHER_BRANCHES] = merged
+
+        if settings.fold == "llm":
+            await self._refresh_llm_digests(branches)
+        digests = {}
+        for name, pages in branches.items():
+            if name in self._digests:
+                pending = [page_ctx for page_ctx in pages if str(page_ctx.url()) not in self._folded[name]]
+                digests[name] = self._append_lines(self._digests[name], pending)
+            else:
+                digests[name] = self._append_lines("", pages)
+        return digests
+
+    def _append_lines(self, digest: str, pages: List[PageContext]) -> str:
+        """Append one line per page to `digest`, dropping the oldest lines beyond `digest_max_chars`"""
+        lines = [f"{page_ctx.details.title}: {page_ctx.summary.split('. ')[0].strip()}" for page_ctx in pages]
+        limit = self.settings.digest_max_chars
+        # Room for the "(+N more pages)" marker
+        budget = limit - len(digest) - 24
+        kept: List[str] = []
+        size = 0
+        for line in reversed(lines):
+            if size + len(line) + 2 > budget and (kept or digest):
+                break
+            kept.insert(0, line)
+            size += len(line) + 2
+        dropped = len(lines) - len(kept)
+        parts = [digest] if digest else []
+        if dropped:
+            parts.append(f"(+{dropped} more pages)")
+        parts.extend(line[:limit] for line in kept)
+        return "; ".join(parts)
+
+    async def _refresh_llm_digests(self, branches: Dict[str, List[PageContext]]) -> None:
+        """Fold every branch with at least `fold_every` new pages in one batched LLM call"""
+        stale = {
+            name: [page_ctx for page_ctx in pages if str(page_ctx.url()) not in self._folded.get(name, set())]
+            for name, pages in branches.items()
+        }
+        stale = {name: pages for name, pages in stale.items() if len(pages) >= self.settings.fold_every}
+        # A fold already in flight serves the other prompts; they use local lines until it lands
+        if not stale or self._fold_lock.locked():
+            return
+        async with self._fold_lock:
+            try:
+                digests = await self._fold_with_llm(stale)
+                metrics.incr("memory.folds")
+            except Exception as e:
+                print(f"DEBUG: Digest fold failed, folding locally: {str(e)}")
+                metrics.incr("memory.fold_failures")
+                digests = {}
+            for name, pages in stale.items():
+                # Branches the reply left out are folded locally, so they are not retried on every prompt
+                if isinstance(digests.get(name), str):
+                    self._digests[name] = digests[name][:self.settings.digest_max_chars]
+                else:
+                    self._digests[name] = self._append_lines("", branches[name])
+                self._folded.setdefault(name, set()).update(str(page_ctx.url()) for page_ctx in pages)
+                metrics.incr("memory.pages_folded", len(pages))
+
+    async def _fold_with_llm(self, stale: Dict[str, List[PageContext]]) -> Dict[str, str]:
+        from app.services.llm_router import llm_router
+
+        branches = {
+            name: {
+                "previous_digest": self._digests.get(name, ""),
+                "new_pages": [{"title": page_ctx.details.title, "summary": page_ctx.summary} for page_ctx in pages],
+            }
+            for name, pages in stale.items()
+        }
+        message = [
+            {
+                "role": "system",
+                "content": "You condense the browsing history of a web crawler. Reply with JSON only."
+            },
+            {
+                "role": "user",
+                "content": f"""
+            The crawler is following this instruction:
+            {self.session.user_instruction}
+
+            For each branch below, merge the previous digest with the new pages into one digest of
+            at most {self.settings.digest_max_chars} characters. Keep what matters for the instruction.
+
+            {json.dumps(branches)}
+
+            Return a JSON object mapping each branch name to its new digest.
+"""
+            }
+        ]
+        completion, _ = await llm_router.complete(message, llm_router.tiers()[0], self.retry_budget)
+        content = completion.choices[0].message.content or ""
+        match = re.search(r"\{.*\}", content, re.DOTALL)
+        if match is None:
+            raise ValueError("fold reply contains no JSON object")
+        return json.loads(match.group(0))
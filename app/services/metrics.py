@@ -0,0 +1,63 @@
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+
+def percentile(samples: Iterable[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of a sample set.
+
+    Args:
+        samples: Observed values
+        q: Percentile between 0 and 100
+
+    Returns:
+        The percentile value, or None if there are no samples
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """Process-wide counters, latency samples and snapshot providers served by the /metrics endpoint"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=max_samples))
+        self.providers: Dict[str, Callable[[], Any]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.latencies[name].append(seconds)
+
+    def register(self, name: str, provider: Callable[[], Any]) -> None:
+        """Register a callable whose result is included in every snapshot under `name`"""
+        self.providers[name] = provider
+
+    def latency_summary(self, name: str) -> Dict[str, Any]:
+        samples = list(self.latencies.get(name, ()))
+        return {
+            "count": len(samples),
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "counters": dict(self.counters),
+            "latencies": {name: self.latency_summary(name) for name in list(self.latencies)},
+        }
+        for name, provider in self.providers.items():
+            try:
+                snapshot[name] = provider()
+            except Exception as e:
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+from w3lib.url import canonicalize_url
+
+from app.config.strigil_config import config, PageCacheConfig
+from app.schemas.context_schema import PageDetails
+from app.services.metrics import metrics
+
+
+class CachedPage(BaseModel):
+    """A cached extraction together with the validators of the response it came from"""
+    url: str
+    details: PageDetails
+    stored_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def cache_key(url: str) -> str:
+    # Fragments are kept: single-page apps route on them, so they may render different pages
+    return hashlib.sha256(canonicalize_url(str(url), keep_fragments=True).encode()).hexdigest()
+
+
+def _header(headers, name: str) -> Optional[str]:
+    if headers is None:
+        return None
+    # Scrapy headers are case-insensitive, Playwright lower-cases header names
+    value = headers.get(name) or headers.get(name.lower())
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    return value
+
+
+class PageCache:
+    """
+    Size-bounded on-disk cache of `PageDetails` keyed by canonical URL and shared by
+    every crawl session. Entries are served while younger than the TTL; older entries
+    are revalidated with a conditional HEAD request when they carry an ETag or
+    Last-Modified validator, and treated as misses otherwise.
+    """
+
+    def __init__(self, settings: Optional[PageCacheConfig] = None):
+        self._settings = settings
+        # key -> file size, least recently used first
+        self.index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._loaded = False
+        # Disk I/O runs in worker threads, so index updates are serialised
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> PageCacheConfig:
+        return self._settings or config.page_cache
+
+    @property
+    def directory(self) -> Path:
+        return Path(self.settings.directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _load_index(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            size = path.stat().st_size
+            self.index[path.stem] = size
+            self.total_bytes += size
+
+    def _read(self, key: str) -> Optional[CachedPage]:
+        with self._lock:
+            self._load_index()
+            if key not in self.index:
+                return None
+            try:
+                entry = CachedPage.model_validate_json(self._path(key).read_text())
+            except Exception as e:
+                print(f"DEBUG: Dropping unreadable cache entry {key}: {str(e)}")
+                self._remove(key)
+                return None
+            self.index.move_to_end(key)
+            return entry
+
+    def _write(self, key: str, entry: CachedPage) -> None:
+        data = entry.model_dump_json()
+        with self._lock:
+            self._load_index()
+            tmp_path = self._path(key).with_suffix(".tmp")
+            tmp_path.write_text(data)
+            os.replace(tmp_path, self._path(key))
+            self.total_bytes += len(data) - self.index.pop(key, 0)
+            self.index[key] = len(data)
+            self._evict()
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self.index.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.settings.max_bytes and len(self.index) > 1:
+            oldest = next(iter(self.index))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get(self, url: str, fresh_only: bool = False) -> Optional[PageDetails]:
+        """
+        Look up a cached extraction for `url`.
+
+        Args:
+            url: URL about to be rendered
+            fresh_only: Skip the cache and force a render for this request
+
+        Returns:
+            The cached page details, or None if the page must be rendered
+        """
+        if not self.settings.enabled:
+            return None
+        if fresh_only:
+            self.bypassed += 1
+            return None
+
+        key = cache_key(url)
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if time.time() - entry.stored_at > self.settings.ttl:
+            if not (self.settings.revalidate and await self._revalidate(entry)):
+                self.misses += 1
+                return None
+            self.revalidated += 1
+            entry.stored_at = time.time()
+            await asyncio.to_thread(self._write, key, entry)
+
+        self.hits += 1
+        metrics.incr("page_cache.hits")
+        return entry.details
+
+    async def put(self, url: str, details: PageDetails, headers=None) -> None:
+        """Store an extraction, keeping the response validators for later revalidation"""
+        if not self.settings.enabled:
+            return
+        entry = CachedPage(
+            url=str(url),
+            details=details,
+            stored_at=time.time(),
+            etag=_header(headers, "ETag"),
+            last_modified=_header(headers, "Last-Modified"),
+        )
+        try:
+            await asyncio.to_thread(self._write, cache_key(url), entry)
+        except OSError as e:
+            print(f"DEBUG: Could not write cache entry for {url}: {str(e)}")
+
+    async def _revalidate(self, entry: CachedPage) -> bool:
+        if not entry.etag and not entry.last_modified:
+            return False
+        request_headers = {}
+        if entry.etag:
+            request_headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            request_headers["If-Modified-Since"] = entry.last_modified
+        import httpx
+
+        try:
+            async with httpx.AsyncClient(timeout=self.settings.revalidate_timeout, follow_redirects=True) as http:
+                response = await http.head(entry.url, headers=request_headers)
+        except httpx.HTTPError as e:
+            print(f"DEBUG: Revalidation of {entry.url} failed: {str(e)}")
+            return False
+        if response.status_code == 304:
+            return True
+        if response.status_code != 200:
+            return False
+        if entry.etag:
+            return response.headers.get("ETag") == entry.etag
+        return response.headers.get("Last-Modified") == entry.last_modified
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+page_cache = PageCache()
+metrics.register("page_cache", page_cache.stats)
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Tuple
+
+from app.config.strigil_config import config, ProfilingConfig
+from app.schemas.api_schema import CrawlProfile
+from app.schemas.context_schema import CrawlSession
+from app.services.metrics import metrics
+
+ProfileLevel = Literal["full", "sampled"]
+BROWSER_NAMES = ("chrom", "headless_shell")
+# Leaf Python frame of an event loop blocked waiting for I/O (selectors.*Selector.select)
+IDLE_FUNCTIONS = {"select"}
+MAX_STACK_DEPTH = 64
+
+_active: Dict[str, "CrawlProfiler"] = {}
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+_tracemalloc_lock = threading.Lock()
+# Crawls to profile regardless of the sample rate, set through the admin endpoint
+_profile_next = 0
+
+
+def profile_next(count: int) -> None:
+    global _profile_next
+    _profile_next = max(count, 0)
+
+
+def should_profile(requested: bool, settings: Optional[ProfilingConfig] = None) -> Optional[ProfileLevel]:
+    """
+    Whether and how to profile a crawl.
+
+    Returns:
+        "full" when the crawl asked for a profile or `profile_next` crawls remain,
+        "sampled" for a `sample_rate` share of the other crawls, otherwise None
+    """
+    global _profile_next
+    settings = settings or config.profiling
+    if requested:
+        return "full"
+    if _profile_next > 0:
+        _profile_next -= 1
+        return "full"
+    if settings.sample_rate > 0 and random.random() < settings.sample_rate:
+        return "sampled"
+    return None
+
+
+def profiling_status() -> dict:
+    return {"sample_rate": config.profiling.sample_rate, "profile_next": _profile_next, "active": sorted(_active)}
+
+
+def profiler_for(session: CrawlSession) -> Optional["CrawlProfiler"]:
+    return _active.get(session.crawl_id) if session.crawl_id else None
+
+
+def browser_processes() -> List[Tuple[int, int]]:
+    """PID and RSS in bytes of the Chromium processes descending from this process; empty without /proc"""
+    if not os.path.isdir("/proc"):
+        return []
+    parents: Dict[int, List[int]] = {}
+    names: Dict[int, str] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is parenthesised and may contain spaces
+        name, rest = stat.split("(", 1)[1].rsplit(")", 1)
+        names[int(entry)] = name.lower()
+        parents.setdefault(int(rest.split()[1]), []).append(int(entry))
+
+    found, pending = [], list(parents.get(os.getpid(), []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(parents.get(pid, []))
+        if names.get(pid, "").startswith(BROWSER_NAMES):
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    found.append((pid, int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")))
+            except OSError:
+                continue
+    return found
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    return f"{path.parent.name}/{path.name}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class CrawlProfiler:
+    """
+    Profiles one crawl: tracemalloc snapshots at start and end, sampled CPU stacks of
+    every thread, Chromium process RSS and per-page Chromium metrics over CDP.
+
+    Sampled profiles skip tracemalloc unless `sampled_tracemalloc` is set, since
+    tracing slows every allocation in the process. Python allocations and CPU samples
+    are process-wide, so crawls running at the same time show up in each other's
+    profiles; with overlapping profiled crawls, the peak traced memory is the peak since
+    the first of them started, so it is only approximate. Per-page Chromium metrics
+    are only read for "full" profiles. Artifacts are written to
+    `<directory>/<crawl_id>/` when the crawl ends:
+
+        profile.json      the CrawlProfile summary
+        allocations.txt   allocation sites by memory still held at the end of the crawl
+        cpu.folded        sampled stacks in folded format, for flame graph tools
+        browser.json      Chromium RSS samples and per-page metrics
+    """
+
+    def __init__(self, crawl_id: str, level: ProfileLevel = "full", settings: Optional[ProfilingConfig] = None):
+        self.crawl_id = crawl_id
+        self.level = level
+        self.settings = settings or config.profiling
+        self.directory = Path(self.settings.directory) / crawl_id
+        self.stacks: Counter = Counter()
+        self.browser_samples: List[dict] = []
+        self.page_metrics: List[dict] = []
+        self._start_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{crawl_id[:8]}", daemon=True)
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        global _tracemalloc_users, _tracemalloc_owned
+        self._started_at = time.monotonic()
+        if self.settings.tracemalloc and (self.level == "full" or self.settings.sampled_tracemalloc):
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start(self.settings.tracemalloc_frames)
+                    _tracemalloc_owned = True
+                if _tracemalloc_users == 0:
+                    # The peak is process-wide; resetting it under another profiled crawl would lose that crawl's peak
+                    tracemalloc.reset_peak()
+                _tracemalloc_users += 1
+            self._start_snapshot = tracemalloc.take_snapshot()
+        _active[self.crawl_id] = self
+        self._thread.start()
+        metrics.incr("profiling.crawls")
+        print(f"DEBUG: Profiling crawl {self.crawl_id}")
+
+    async def stop(self) -> CrawlProfile:
+        """Stop sampling and write the artifacts; the file work runs off the event loop"""
+        _active.pop(self.crawl_id, None)
+        self._stop.set()
+        return await asyncio.to_thread(self._finish)
+
+    def _sample(self) -> None:
+        next_browser_sample = 0.0
+        own = threading.get_ident()
+        while not self._stop.wait(self.settings.cpu_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                thread = "event-loop" if ident == self._loop_thread else names.get(ident, str(ident))
+                self.stacks[";".join([thread, *reversed(stack)])] += 1
+            if time.monotonic() >= next_browser_sample:
+                next_browser_sample = time.monotonic() + self.settings.browser_interval
+                processes = browser_processes()
+                self.browser_samples.append({
+                    "seconds": round(time.monotonic() - self._started_at, 2),
+                    "processes": len(processes),
+                    "rss_mb": round(sum(rss for _, rss in processes) / 2**20, 1),
+                })
+
+    async def record_page(self, url: str, page) -> None:
+        """Chromium performance metrics of a rendered page, read over CDP"""
+        if not self.settings.page_metrics or page is None or self.level != "full":
+            # A CDP session per page is too costly for sampled profiles
+            return
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            try:
+                await cdp.send("Performance.enable")
+                result = await cdp.send("Performance.getMetrics")
+            finally:
+                await cdp.detach()
+        except Exception as e:
+            print(f"DEBUG: Could not read page metrics for {url}: {str(e)}")
+            return
+        self.page_metrics.append({"url": url, **{m["name"]: m["value"] for m in result.get("metrics", [])}})
+
+    def _finish(self) -> CrawlProfile:
+        global _tracemalloc_users, _tracemalloc_owned
+        self._thread.join()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        artifacts = []
+        profile = CrawlProfile(
+            crawl_id=self.crawl_id,
+            level=self.level,
+            seconds=round(time.monotonic() - self._started_at, 3),
+            directory=str(self.directory),
+        )
+
+        if self._start_snapshot is not None:
+            profile.peak_traced_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            ignored = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*"))
+            end_snapshot = tracemalloc.take_snapshot().filter_traces(ignored)
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                # Tracing started outside the profiler, e.g. by PYTHONTRACEMALLOC, is left on
+                if _tracemalloc_users == 0 and _tracemalloc_owned:
+                    tracemalloc.stop()
+                    _tracemalloc_owned = False
+            diff = end_snapshot.compare_to(self._start_snapshot.filter_traces(ignored), "lineno")
+            profile.top_allocators = [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in diff[:self.settings.top_allocators]
+            ]
+            with open(self.directory / "allocations.txt", "w") as f:
+                f.writelines(f"{stat}\n" for stat in diff[:500])
+            artifacts.append("allocations.txt")
+
+        with open(self.directory / "cpu.folded", "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        artifacts.append("cpu.folded")
+        loop_samples = Counter()
+        idle = 0
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            if frames[0] != "event-loop" or len(frames) < 2:
+                continue
+            leaf = frames[-1].rsplit(":", 1)[-1].rsplit(".", 1)[-1]
+            if leaf in IDLE_FUNCTIONS:
+                idle += count
+            else:
+                loop_samples[frames[-1]] += count
+        busy = sum(loop_samples.values())
+        profile.cpu_samples = sum(self.stacks.values())
+        profile.idle_ratio = round(idle / (idle + busy), 3) if idle + busy else None
+        profile.top_functions = [
+            {"function": function, "samples": count, "share": round(count / busy, 3)}
+            for function, count in loop_samples.most_common(self.settings.top_functions)
+        ]
+
+        if self.browser_samples:
+            profile.browser_peak_rss_mb = max(sample["rss_mb"] for sample in self.browser_samples)
+            profile.browser_processes = max(sample["processes"] for sample in self.browser_samples)
+        for entry in self.page_metrics:
+            for name, value in entry.items():
+                if name != "url" and isinstance(value, (int, float)):
+                    profile.page_metrics[name] = max(profile.page_metrics.get(name, value), value)
+        with open(self.directory / "browser.json", "w") as f:
+            json.dump({"rss": self.browser_samples, "pages": self.page_metrics}, f, indent=2)
+        artifacts.extend(["browser.json", "profile.json"])
+        profile.artifacts = {name: f"/profiles/{self.crawl_id}/{name}" for name in artifacts}
+        with open(self.directory / "profile.json", "w") as f:
+            f.write(profile.model_dump_json(indent=2))
+        print(f"DEBUG: Wrote profile of crawl {self.crawl_id} to {self.directory}")
+        return profile
+
+
+def profile_artifact(crawl_id: str, name: str, settings: Optional[ProfilingConfig] = None) -> Optional[Path]:
+    """Path of a profile artifact, or None if it does not exist or the names are not plain file names"""
+    settings = settings or config.profiling
+    if not crawl_id.isalnum() or name not in {"profile.json", "allocations.txt", "cpu.folded", "browser.json"}:
+        return None
+    path = Path(settings.directory) / crawl_id / name
+    return path if path.is_file() else None
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from w3lib.url import canonicalize_url
+
+from app.config.strigil_config import config
+from app.schemas.context_schema import CrawlSession
+from app.services.metrics import metrics
+
+SCRIPT_PATTERN = re.compile(r"<script\b[^>]*>[\s\S]*?</script\s*>", re.IGNORECASE)
+PAGE_URL_PATTERN = re.compile(r"Details of the page:\s*\{'url': (?:HttpUrl\()?'([^']+)'")
+BATCH_PAGE_PATTERN = re.compile(r"### Page (\S+)")
+
+
+def request_key(messages: List[dict]) -> str:
+    """
+    Replay key of an LLM request.
+
+    Page decisions are keyed by the URLs of the pages they decide on, so a replay
+    finds them even though the history in the prompt depends on crawl order. Other
+    requests are keyed by a hash of their messages.
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in messages if message.get("role") == "user")
+    urls = BATCH_PAGE_PATTERN.findall(prompt) or PAGE_URL_PATTERN.findall(prompt)
+    if urls:
+        return "pages:" + "|".join(sorted(canonicalize_url(url) for url in urls))
+    return "sha256:" + hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+
+
+class SessionArchive:
+    """
+    On-disk recording of crawls:
+
+        manifest.json   sessions and the snapshot file of every page, by canonical URL
+        pages/*.html    rendered DOM of each page after load
+        llm.jsonl       one LLM request/completion per line
+        har/*.har       optional HAR files of the recorded browser contexts
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest: Dict[str, Any] = {"version": 1, "sessions": [], "pages": {}}
+        self.llm: Dict[str, Dict[str, dict]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "SessionArchive":
+        archive = cls(path)
+        with open(path / "manifest.json") as f:
+            archive.manifest = json.load(f)
+        llm_path = path / "llm.jsonl"
+        if llm_path.exists():
+            with open(llm_path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        archive.llm.setdefault(entry["key"], {})[entry["model"]] = entry
+        return archive
+
+    def page(self, url: str) -> Optional[str]:
+        entry = self.manifest["pages"].get(canonicalize_url(url))
+        if entry is None:
+            return None
+        return (self.path / entry["file"]).read_text(encoding="utf-8")
+
+    def add_page(self, url: str, html: str, recorded_at: Optional[float] = None) -> None:
+        key = canonicalize_url(url)
+        name = f"pages/{hashlib.sha256(key.encode()).hexdigest()[:24]}.html"
+        (self.path / "pages").mkdir(parents=True, exist_ok=True)
+        (self.path / name).write_text(html, encoding="utf-8")
+        self.manifest["pages"][key] = {"url": url, "file": name, "recorded_at": time.time() if recorded_at is None else recorded_at}
+
+    def completion(self, messages: List[dict], model: str) -> Optional[dict]:
+        """Recorded completion for a request, preferring the same model"""
+        by_model = self.llm.get(request_key(messages))
+        if not by_model:
+            return None
+        entry = by_model.get(model) or next(iter(by_model.values()))
+        return entry["completion"]
+
+    def add_completion(self, messages: List[dict], model: str, completion: dict) -> None:
+        entry = {"key": request_key(messages), "model": model, "messages": messages, "completion": completion}
+        self.llm.setdefault(entry["key"], {})[model] = entry
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "llm.jsonl", "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def save(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / "manifest.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path / "manifest.json")
+
+
+class Recorder:
+    """
+    Records crawls into a `SessionArchive`, or replays one.
+
+    While recording, the crawl controller stores the rendered DOM of every page and
+    the router stores every LLM completion. While replaying, browser requests are
+    answered from the archive through Playwright routes (sub-resources are aborted,
+    snapshots are self-contained) and the OpenAI client talks to an in-process
+    OpenAI-compatible stand-in that serves the recorded completions, so crawls run
+    without network access. Only one crawl is recorded at a time, and recording is
+    refused with the crawl pool on, whose workers would write to the same archive.
+    Without a configured archive name, every crawl is recorded into a new archive.
+    """
+
+    def __init__(self):
+        self.archive: Optional[SessionArchive] = None
+        self.active_crawl: Optional[str] = None
+
+    @property
+    def recording(self) -> bool:
+        return config.recording.mode == "record" and self.archive is not None
+
+    @property
+    def replaying(self) -> bool:
+        return config.recording.mode == "replay"
+
+    def _archive_path(self, default_name: Optional[str] = None) -> Path:
+        name = config.recording.archive or default_name
+        if name is None:
+            raise ValueError("recording.archive must name the archive to replay")
+        path = Path(name)
+        return path if path.is_absolute() or path.exists() else Path(config.recording.directory) / name
+
+    def _replay_archive(self) -> SessionArchive:
+        if self.archive is None:
+            self.archive = SessionArchive.load(self._archive_path())
+            print(f"DEBUG: Replaying archive {self.archive.path} with {len(self.archive.manifest['pages'])} pages")
+        return self.archive
+
+    def begin(self, session: CrawlSession) -> None:
+        """Prepare a crawl for recording or replay; both bypass the page cache so every page is rendered"""
+        mode = config.recording.mode
+        if mode == "off":
+            return
+        session.fresh_only = True
+        if mode == "replay":
+            self._replay_archive()
+            return
+        if config.crawl_pool.enabled:
+            raise ValueError("Recording needs crawl_pool.enabled off: its worker processes would write to the same archive")
+        if self.active_crawl is not None:
+            raise RuntimeError(f"Crawl {self.active_crawl} is being recorded; record one crawl at a time")
+        path = self._archive_path(f"{time.strftime('%Y%m%d-%H%M%S')}-{(session.crawl_id or '')[:8]}")
+        if self.archive is None or self.archive.path != path:
+            self.archive = SessionArchive.load(path) if (path / "manifest.json").exists() else SessionArchive(path)
+            print(f"DEBUG: Recording crawl into {path}")
+        self.active_crawl = session.crawl_id
+        self.archive.manifest["sessions"].append({
+            "start_urls": [str(url) for url in session.start_urls],
+            "user_instruction": session.user_instruction,
+            "max_depth": session.max_depth,
+            "recorded_at": time.time(),
+        })
+        self.archive.save()
+
+    def end(self, session: CrawlSession) -> None:
+        if self.recording and session.crawl_id == self.active_crawl:
+            self.archive.save()
+            self.active_crawl = None
+
+    def har_path(self) -> Optional[str]:
+        """Where the next browser context records its HAR, when HAR recording is on"""
+        if not (self.recording and config.recording.har):
+            return None
+        (self.archive.path / "har").mkdir(parents=True, exist_ok=True)
+        return str(self.archive.path / "har" / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.har")
+
+    async def record_page(self, url: str, page) -> None:
+        html = await page.content()
+        if config.recording.strip_scripts:
+            html = SCRIPT_PATTERN.sub("", html)
+        self.archive.add_page(url, html)
+        metrics.incr("recording.pages")
+
+    def record_completion(self, messages: List[dict], model: str, completion) -> None:
+        self.archive.add_completion(messages, model, completion.model_dump(mode="json"))
+        metrics.incr("recording.llm")
+
+    async def route(self, route) -> None:
+        """Playwright route handler answering browser requests from the archive"""
+        request = route.request
+        if request.resource_type != "document":
+            await route.abort()
+            return
+        html = self._replay_archive().page(request.url)
+        if html is None:
+            metrics.incr("replay.page_misses")
+            await route.fulfill(status=404, content_type="text/plain", body=f"{request.url} is not in the archive")
+            return
+        await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+
+    def llm_http_client(self):
+        """httpx client for the OpenAI SDK that serves recorded completions instead of calling a backend"""
+        import httpx
+
+        archive = self._replay_archive()
+
+        def handle(request: httpx.Request) -> httpx.Response:
+            if not request.url.path.endswith("/chat/completions"):
+                return httpx.Response(404, json={"error": {"message": "Only chat completions are replayed"}})
+            body = json.loads(request.content)
+            completion = archive.completion(body.get("messages", []), body.get("model", ""))
+            if completion is None:
+                metrics.incr("replay.llm_misses")
+                return httpx.Response(404, json={"error": {"message": f"No recorded completion for {request_key(body.get('messages', []))}"}})
+            return httpx.Response(200, json=completion)
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+
+async def replay_page_init(page, request) -> None:
+    """scrapy-playwright `playwright_page_init_callback` that routes the page through the archive"""
+    await page.route("**/*", recorder.route)
+
+
+recorder = Recorder()
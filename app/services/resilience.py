@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+from app.config.strigil_config import config
+from app.schemas.error_schema import WebScraperError
+from app.services.metrics import metrics
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff for the given zero-based attempt.
+
+    A server supplied Retry-After takes precedence, bounded by `retry_max_delay`.
+    """
+    settings = config.resilience
+    if retry_after is not None:
+        return min(settings.retry_max_delay, retry_after)
+    return random.uniform(0, min(settings.retry_max_delay, settings.retry_base_delay * 2 ** attempt))
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an LLM call failure is worth retrying: timeouts, connection errors, 429 and 5xx"""
+    import httpx
+    import openai
+
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def retry_after_from(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Caps the number of retries a single crawl may spend across LLM calls and page
+    fetches, and records each retry in the crawl's error list.
+    """
+
+    def __init__(self, limit: int, errors: Optional[List[WebScraperError]] = None):
+        self.limit = limit
+        self.used = 0
+        self.errors = errors if errors is not None else []
+
+    def take(self, error: WebScraperError) -> bool:
+        """Spend one retry and record `error`; returns False once the budget is exhausted"""
+        if self.used >= self.limit:
+            metrics.incr("retry.budget_exhausted")
+            return False
+        self.used += 1
+        self.errors.append(error)
+        return True
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open"""
+
+    def __init__(self, backend: str, retry_in: float):
+        super().__init__(f"Circuit for LLM backend '{backend}' is open, retry in {retry_in:.1f}s")
+        self.backend = backend
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one backend.
+
+    After `breaker_failure_threshold` transient failures the circuit opens and calls
+    fail fast for `breaker_reset_timeout` seconds. The first call after that is let
+    through as a probe; its outcome closes the circuit or opens it again. A probe that
+    ends without an outcome, because it was cancelled or failed non-transiently, is
+    released so the next call probes again, and a probe still unresolved after
+    `breaker_reset_timeout` expires, so one lost outcome cannot block the backend.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+
+    def retry_in(self) -> float:
+        if self.state == "closed":
+            return 0.0
+        since = self.probe_started_at if self.state == "half_open" else self.opened_at
+        return max(0.0, since + config.resilience.breaker_reset_timeout - time.monotonic())
+
+    def before_call(self) -> bool:
+        """
+        Let a call through or raise `CircuitOpenError`.
+
+        Returns:
+            True if the call is the half-open probe, whose outcome must be recorded or released
+        """
+        if self.state == "closed":
+            return False
+        if self.retry_in() == 0:
+            if self.state == "half_open":
+                print(f"WARNING: Probe of LLM backend '{self.name}' expired without an outcome")
+                metrics.incr("breaker.probes_expired")
+            self.state = "half_open"
+            self.probe_started_at = time.monotonic()
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(self.name, max(self.retry_in(), 0.5))
+
+    def release_probe(self) -> None:
+        """The probe ended without telling whether the backend recovered; let the next call probe"""
+        if self.state != "half_open":
+            return
+        self.state = "open"
+        self.opened_at = time.monotonic() - config.resilience.breaker_reset_timeout
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= config.resilience.breaker_failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+                metrics.incr("breaker.opened")
+                print(f"WARNING: Opening circuit for LLM backend '{self.name}' after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in": round(self.retry_in(), 3),
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(backend: str) -> CircuitBreaker:
+    breaker = breakers.get(backend)
+    if breaker is None:
+        breaker = breakers[backend] = CircuitBreaker(backend)
+    return breaker
+
+
+metrics.register("breakers", lambda: {name: breaker.snapshot() for name, breaker in breakers.items()})
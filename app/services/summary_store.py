@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+from w3lib.url import canonicalize_url
+
+from app.config.strigil_config import config, SummaryStoreConfig
+from app.schemas.context_schema import PageDetails
+from app.services.interaction import state_fingerprint
+from app.services.metrics import metrics
+
+
+class PageSummary(BaseModel):
+    """What a page is about, written without regard to any crawl's instruction"""
+    url: str
+    content_hash: str
+    summary: str
+    digest: str  # structure of the page, computed locally
+    stored_at: float
+    uses: int = 0
+
+
+def structural_digest(details: PageDetails, max_chars: int) -> str:
+    """Size of the page text, its links and other controls, and its short lines, which are mostly headings and labels"""
+    links = sum(1 for item in details.interactables if item.href)
+    outline = []
+    for line in details.body_text.splitlines():
+        line = line.strip()
+        if line and len(line) <= 80 and line not in outline:
+            outline.append(line)
+    digest = f"{len(details.body_text)} characters of text, {links} links, {len(details.interactables) - links} other controls. Outline: {' | '.join(outline)}"
+    return digest[:max_chars]
+
+
+class SummaryStore:
+    """
+    Instruction-independent page summaries shared by every crawl in the process, keyed
+    by canonical URL and a hash of the page content, so a page that changed is
+    summarized again.
+
+    The first crawl to decide a page stores the summary from its reply. Later prompts
+    for the same content send the stored summary, a structural digest and the start of
+    the page text instead of the whole text, and only ask for the instruction-specific
+    actions. Each decision looks its page up once, with `get`. The store keeps
+    at most `max_entries` summaries, evicting the least recently used; summaries older
+    than `max_age` are stale, are not served and are replaced by the next one written.
+    """
+
+    def __init__(self, settings: Optional[SummaryStoreConfig] = None):
+        self._settings = settings
+        self.entries: "OrderedDict[Tuple[str, str], PageSummary]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def settings(self) -> SummaryStoreConfig:
+        return self._settings or config.summary_store
+
+    @staticmethod
+    def key(details: PageDetails) -> Tuple[str, str]:
+        return canonicalize_url(str(details.url)), state_fingerprint(details)
+
+    def peek(self, details: PageDetails) -> Optional[PageSummary]:
+        """The fresh summary of this page content, without counting a lookup"""
+        if not self.settings.enabled:
+            return None
+        entry = self.entries.get(self.key(details))
+        if entry is None or time.time() - entry.stored_at > self.settings.max_age:
+            return None
+        return entry
+
+    def get(self, details: PageDetails) -> Optional[PageSummary]:
+        """Look up the summary of a page for a prompt"""
+        if not self.settings.enabled:
+            return None
+        key = self.key(details)
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry.stored_at > self.settings.max_age:
+            self.stale += 1
+            metrics.incr("summary_store.stale")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        entry.uses += 1
+        self.hits += 1
+        metrics.incr("summary_store.hits")
+        return entry
+
+    def put(self, details: PageDetails, summary: str) -> None:
+        if not self.settings.enabled or not summary.strip():
+            return
+        key = self.key(details)
+        self.entries.pop(key, None)
+        self.entries[key] = PageSummary(
+            url=key[0],
+            content_hash=key[1],
+            summary=summary,
+            digest=structural_digest(details, self.settings.digest_max_chars),
+            stored_at=time.time(),
+        )
+        while len(self.entries) > self.settings.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        now = time.time()
+        return {
+            "entries": len(self.entries),
+            "stale_entries": sum(1 for entry in self.entries.values() if now - entry.stored_at > self.settings.max_age),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+summary_store = SummaryStore()
+metrics.register("summary_store", summary_store.stats)
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.robotparser import RobotFileParser
+
+from pydantic import BaseModel
+
+from app.config.strigil_config import config, ThrottleConfig
+from app.services.metrics import metrics
+
+
+class DomainState(BaseModel):
+    """Adaptive limits and observed behaviour of a single domain"""
+    domain: str
+    concurrency: float
+    delay: float
+    in_flight: int = 0
+    latency_ewma: Optional[float] = None
+    next_start_at: float = 0.0
+    blocked_until: float = 0.0
+    crawl_delay: Optional[float] = None
+    successes: int = 0
+    errors: int = 0
+    throttled: int = 0
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as delta-seconds or as an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if the header is missing or invalid
+    """
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainThrottle:
+    """
+    Per-domain AIMD controller shared by every crawl session in the process.
+
+    Concurrency grows additively while a domain renders below the target latency
+    and is cut multiplicatively on errors, slow renders or throttling statuses. The
+    delay between request starts moves in the opposite direction. Retry-After and,
+    optionally, robots.txt Crawl-delay put a floor under the wait for a domain.
+    """
+
+    def __init__(self, settings: Optional[ThrottleConfig] = None):
+        self._settings = settings
+        self.domains: Dict[str, DomainState] = {}
+        self._robots_checked: set = set()
+
+    @property
+    def settings(self) -> ThrottleConfig:
+        return self._settings or config.throttle
+
+    def _state(self, domain: str) -> DomainState:
+        state = self.domains.get(domain)
+        if state is None:
+            state = DomainState(
+                domain=domain,
+                concurrency=self.settings.initial_concurrency,
+                delay=self.settings.initial_delay,
+            )
+            self.domains[domain] = state
+        return state
+
+    async def acquire(self, domain: str, url: Optional[str] = None) -> None:
+        """Wait until the domain has a free slot and its delay has elapsed, then take the slot"""
+        state = self._state(domain)
+        if self.settings.obey_robots_crawl_delay and url and domain not in self._robots_checked:
+            self._robots_checked.add(domain)
+            state.crawl_delay = await fetch_crawl_delay(url)
+
+        while True:
+            now = time.monotonic()
+            wait = max(state.blocked_until, state.next_start_at) - now
+            if wait <= 0 and state.in_flight < max(1, int(state.concurrency)):
+                state.in_flight += 1
+                state.next_start_at = now + max(state.delay, state.crawl_delay or 0.0)
+                return
+            await asyncio.sleep(wait if wait > 0 else self.settings.poll_interval)
+
+    def release(self, domain: str, latency: Optional[float], status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        """
+        Free the slot taken by `acquire` and adapt the domain limits.
+
+        Args:
+            domain: Domain the request was sent to
+            latency: Observed render latency in seconds, if the request completed
+            status: HTTP status of the response, or None if the request failed
+            retry_after: Parsed Retry-After value of the response, if any
+        """
+        settings = self.settings
+        state = self._state(domain)
+        state.in_flight = max(0, state.in_flight - 1)
+
+        if latency is not None:
+            state.latency_ewma = latency if state.latency_ewma is None else 0.7 * state.latency_ewma + 0.3 * latency
+
+        throttled = status in settings.throttled_statuses
+        failed = status is None or status >= 500
+        slow = latency is not None and latency > settings.target_latency
+
+        if throttled or failed:
+            state.concurrency = max(settings.min_concurrency, state.concurrency * settings.backoff_factor)
+            state.delay = min(settings.max_delay, max(state.delay * 2, settings.delay_step))
+        elif slow:
+            state.concurrency = max(settings.min_concurrency, state.concurrency * settings.backoff_factor)
+        else:
+            state.concurrency = min(settings.max_concurrency, state.concurrency + settings.concurrency_step)
+            state.delay = max(settings.min_delay, state.delay - settings.delay_step)
+
+        if throttled:
+            state.throttled += 1
+            metrics.incr("throttle.throttled_responses")
+            pause = retry_after if retry_after is not None else settings.default_retry_after
+            state.blocked_until = max(state.blocked_until, time.monotonic() + min(pause, settings.max_retry_after))
+        elif failed:
+            state.errors += 1
+        else:
+            state.successes += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        return {
+            domain: {
+                "concurrency": int(state.concurrency),
+                "delay": round(state.delay, 3),
+                "in_flight": state.in_flight,
+                "latency_ewma": round(state.latency_ewma, 3) if state.latency_ewma is not None else None,
+                "blocked_for": round(max(0.0, state.blocked_until - now), 3),
+                "crawl_delay": state.crawl_delay,
+                "successes": state.successes,
+                "errors": state.errors,
+                "throttled": state.throttled,
+            }
+            for domain, state in self.domains.items()
+        }
+
+
+async def fetch_crawl_delay(url: str) -> Optional[float]:
+    """Fetch robots.txt for the host of `url` and return its Crawl-delay for all agents"""
+    import httpx
+
+    parts = httpx.URL(url)
+    robots_url = f"{parts.scheme}://{parts.netloc.decode()}/robots.txt"
+    try:
+        async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as http:
+            response = await http.get(robots_url)
+        if response.status_code != 200:
+            return None
+        parser = RobotFileParser(robots_url)
+        parser.parse(response.text.splitlines())
+        delay = parser.crawl_delay("*")
+        return float(delay) if delay is not None else None
+    except Exception as e:
+        print(f"DEBUG: Could not read {robots_url}: {str(e)}")
+        return None
+
+
+domain_throttle = DomainThrottle()
+metrics.register("domains", domain_throttle.snapshot)
@@ -0,0 +1,151 @@
+import asyncio
+import importlib
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel
+
+from app.config.strigil_config import config, get_config, StrigilConfig
+from app.services.metrics import metrics
+
+
+class WarmupStage(BaseModel):
+    """Progress of one start-up warm-up stage"""
+    name: str
+    required: bool = True
+    status: Literal["pending", "running", "ready", "failed", "skipped"] = "pending"
+    seconds: Optional[float] = None
+    detail: Optional[str] = None
+
+
+class Warmup:
+    """
+    Warms up the heavy parts of the service after the API has started listening:
+    validates the configuration, imports the crawl engine, opens connections to the
+    LLM backends and launches the browser or the crawl worker pool.
+
+    Stages run in order; a failed stage does not stop the ones after it. The
+    service is ready once every stage has finished and no required stage failed.
+    Connections to the LLM backends are not required, since the circuit breakers
+    already handle backends that are down.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, WarmupStage] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _plan(self) -> List[WarmupStage]:
+        return [
+            WarmupStage(name="config"),
+            WarmupStage(name="crawl_engine"),
+            WarmupStage(name="llm_connections", required=False),
+            WarmupStage(name="browser"),
+            WarmupStage(name="crawl_pool"),
+        ]
+
+    async def run(self) -> None:
+        self.started_at = time.monotonic()
+        self.stages = {stage.name: stage for stage in self._plan()}
+        steps: Dict[str, Callable[[], Awaitable[Optional[str]]]] = {
+            "config": self._validate_config,
+            "crawl_engine": self._import_engine,
+            "llm_connections": self._preopen_llm_connections,
+            "browser": self._launch_browser,
+            "crawl_pool": self._start_crawl_pool,
+        }
+        for name, step in steps.items():
+            await self._run_stage(self.stages[name], step)
+        self.finished_at = time.monotonic()
+        metrics.observe("startup.warmup", self.finished_at - self.started_at)
+        print(f"DEBUG: Warm-up finished in {self.finished_at - self.started_at:.2f}s, ready: {self.ready}")
+
+    async def _run_stage(self, stage: WarmupStage, step: Callable[[], Awaitable[Optional[str]]]) -> None:
+        stage.status = "running"
+        started = time.monotonic()
+        try:
+            detail = await asyncio.wait_for(step(), timeout=config.warmup.stage_timeout)
+            stage.status = "skipped" if detail is not None and detail.startswith("skipped") else "ready"
+            stage.detail = detail
+        except Exception as e:
+            stage.status = "failed"
+            stage.detail = f"{type(e).__name__}: {str(e)}"
+            print(f"WARNING: Warm-up stage {stage.name} failed: {stage.detail}")
+        stage.seconds = round(time.monotonic() - started, 3)
+
+    async def _validate_config(self) -> Optional[str]:
+        """Validate the configuration file strictly; `load_config` would fall back to defaults silently"""
+        path = os.getenv("STRIGIL_CONFIG", 'app/config/strigil_config.json')
+        with open(path) as f:
+            StrigilConfig.model_validate(json.load(f))
+        get_config()
+        return path
+
+    async def _import_engine(self) -> Optional[str]:
+        if config.crawl_pool.enabled:
+            return "skipped: crawls run in worker processes"
+        # Imports run in a thread so /health keeps answering; the reactor is installed on the loop
+        await asyncio.to_thread(importlib.import_module, "app.services.crawl_controller")
+        if config.crawl_engine == "asyncio":
+            await asyncio.to_thread(importlib.import_module, "app.services.async_engine")
+        else:
+            await asyncio.to_thread(importlib.import_module, "app.spiders.llm_spider")
+            from app.services.crawler import prepare_scrapy_engine
+            prepare_scrapy_engine()
+        return config.crawl_engine
+
+    async def _preopen_llm_connections(self) -> Optional[str]:
+        if not config.warmup.preopen_llm_connections or config.crawl_pool.enabled:
+            return "skipped"
+        await asyncio.to_thread(importlib.import_module, "openai")
+        from app.services.llm_router import llm_router
+
+        results = await llm_router.preconnect(timeout=config.timeouts.llm.connect_timeout)
+        failed = {name: reason for name, reason in results.items() if reason != "connected"}
+        if failed:
+            raise ConnectionError(", ".join(f"{name}: {reason}" for name, reason in failed.items()))
+        return ", ".join(sorted(results))
+
+    async def _launch_browser(self) -> Optional[str]:
+        if not config.warmup.prelaunch_browser or config.crawl_pool.enabled:
+            return "skipped"
+        if config.crawl_engine != "asyncio":
+            # scrapy-playwright launches its browser with each crawler's download handler
+            return "skipped: the Scrapy engine launches its browser per crawl"
+        from app.services.async_engine import get_browser
+
+        browser = await get_browser()
+        return f"chromium {browser.version}"
+
+    async def _start_crawl_pool(self) -> Optional[str]:
+        if not config.crawl_pool.enabled:
+            return "skipped"
+        from app.services.crawl_pool import crawl_pool
+
+        if not crawl_pool.started:
+            crawl_pool.start()
+        return f"{config.crawl_pool.workers} workers"
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        if not config.warmup.enabled:
+            return True
+        return self.finished and not any(stage.required and stage.status == "failed" for stage in self.stages.values())
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "ready": self.ready,
+            "enabled": config.warmup.enabled,
+            "seconds": round(self.finished_at - self.started_at, 3) if self.finished else None,
+            "stages": [stage.model_dump() for stage in self.stages.values()],
+        }
+
+
+warmup = Warmup()
+metrics.register("warmup", warmup.report)
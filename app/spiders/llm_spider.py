@@ -1,15 +1,28 @@
 '''LLM Spider'''
 
+import asyncio
 import json
+import time
 import traceback
+from typing import Optional
 from scrapy import Spider, Request, signals
-from scrapy.utils.reactor import install_reactor
 from app.schemas.context_schema import CrawlSession, PageAction
-from app.services.llm import ask_llm
+from app.services.metrics import metrics
+from app.services.resilience import backoff_delay
 from app.config.strigil_config import config
-from app.schemas.response_schema import LLMResponse
-from app.services.crawl_controller import CrawlController, extract_json_from_response
-from app.schemas.error_schema import WebScraperError, NetworkError, LLMError, ParsingError
+from app.services.crawl_controller import CrawlController
+from app.services.recording import recorder, replay_page_init
+from app.schemas.error_schema import NetworkError, ParsingError, RetryError
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.spidermiddlewares.httperror import HttpError
+
+
+def is_transient_fetch_failure(failure) -> bool:
+    """Timeouts, connection and browser errors and 5xx responses are retried; 4xx and filtered requests are not"""
+    if failure.check(HttpError):
+        return failure.value.response.status >= 500
+    return not failure.check(IgnoreRequest)
      
 class LLMPlaywrightSpider(Spider):
     name = "llm_playwright"
@@ -20,41 +33,98 @@ class LLMPlaywrightSpider(Spider):
         },
         "PLAYWRIGHT_BROWSER_TYPE": "chromium",
         "PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT": config.timeouts.playwright.navigation_timeout,
+        # Per-domain limits are enforced by the adaptive throttle, so Scrapy's own slots must not be tighter
+        "DOWNLOADER_MIDDLEWARES": {
+            "app.spiders.middlewares.PageCacheMiddleware": 540,
+            "app.spiders.middlewares.AdaptiveThrottleMiddleware": 560,
+        },
+        "CONCURRENT_REQUESTS_PER_DOMAIN": int(config.throttle.max_concurrency),
+        "DOWNLOAD_DELAY": 0,
     }
-    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
 
     def __init__(self, session: CrawlSession, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.session = session
         print("Constructing llm spider", self.session)
-        self.controller = CrawlController(self.session)
-        self.controller.spider = self  # backref to yield requests
-        self.errors = []
+        self.controller = CrawlController(self.session, self)
+        self.errors = self.controller.errors
+        self.retry_budget = self.controller.retry_budget
+        # Browser pages of downloads in flight and of responses being parsed, until closed
+        self.open_pages = set()
 
     def start_requests(self):
         print("Starting requests", self.session.start_urls)
         for url in self.session.start_urls:
             print("Requesting fetch:",url)
-            yield Request(
-                str(url),
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True, 
-                    "playwright_page_methods": [
-                        {"method": "wait_for_load_state", "args": ["networkidle"]}
-                    ],
-                    "download_timeout": config.timeouts.scrapy.download_timeout,
-                    "depth": 0,
-                    "prev_url": None,
-                    "prev_action_key": None,
-                },
-                callback=self.parse,
-                errback=self.errback,
-            )
+            yield self.make_request(str(url), 0, None, None)
+
+    def make_request(self, url: str, depth: int, prev_url: Optional[str], prev_action_key: Optional[str]) -> Request:
+        """Build the Playwright request for a page the controller decided to visit"""
+        meta = {
+            "playwright": True,
+            "playwright_include_page": True, 
+            "playwright_page_methods": [
+                {"method": "wait_for_load_state", "args": ["networkidle"]}
+            ],
+            "download_timeout": config.timeouts.scrapy.download_timeout,
+            "depth": depth,
+            "prev_url": prev_url,
+            "prev_action_key": prev_action_key,
+            "playwright_page_init_callback": self._page_init,
+        }
+        return Request(url, meta=meta, callback=self.parse, errback=self.errback)
+
+    async def _page_init(self, page, request):
+        """Track the browser page from the start of its download, so `abort` can close it"""
+        self.open_pages.add(page)
+        page.on("close", lambda _: self.open_pages.discard(page))
+        if recorder.replaying:
+            # Serve the page and its requests from the recorded archive
+            await replay_page_init(page, request)
+
+    def pause(self):
+        self.crawler.engine.pause()
+
+    def unpause(self):
+        self.crawler.engine.unpause()
+
+    def stop(self, reason: str) -> int:
+        """Close the spider, dropping its scheduled requests; returns how many were dropped"""
+        if self.crawler.engine is None:
+            # Not running yet or already closed
+            return 0
+        try:
+            pending = len(self.crawler.engine.scheduler)
+        except Exception:
+            pending = 0
+        engine = self.crawler.engine
+        if hasattr(engine, "close_spider_async"):
+            closing = deferred_from_coro(engine.close_spider_async(reason=reason))
+        else:
+            # Scrapy before 2.14
+            closing = engine.close_spider(self, reason)
+        closing.addErrback(self._close_failed)
+        return pending
+
+    def _close_failed(self, failure):
+        # E.g. "Spider not opened" when the spider closed on its own meanwhile
+        self.logger.warning(f"Could not close the spider: {failure.getErrorMessage()}")
+
+    def abort(self):
+        """
+        Close the browser pages of downloads in flight and of responses being parsed, so
+        they fail now instead of at their timeout; Scrapy only finishes closing the spider
+        once they are done.
+        """
+        if self.crawler.engine is None:
+            return
+        for page in list(self.open_pages):
+            asyncio.ensure_future(page.close())
 
     async def parse(self, response):
+        # Pages served from the page cache have no browser page
+        page = response.meta.get("playwright_page")
         try:
-            page = response.meta["playwright_page"]
             url = response.url
             depth = response.meta.get("depth", 0)
             prev_url = response.meta.get("prev_url", None)
@@ -62,7 +132,12 @@ class LLMPlaywrightSpider(Spider):
             prev_page_action = None
             if prev_url != None and prev_action_key != None:
                 prev_page_action = PageAction(url = prev_url, action_key = prev_action_key)
-            next_requests = await self.controller.handle_page(url, depth, page, prev_page_action)
+            next_requests = await self.controller.handle_page(
+                url, depth, page, prev_page_action,
+                cached_details=response.meta.get("cached_details"),
+                headers=response.headers,
+                request_url=response.request.url,
+            )
             for req in next_requests:
                 yield req
         except Exception as e:
@@ -73,12 +148,38 @@ class LLMPlaywrightSpider(Spider):
             )
             self.errors.append(error)
             self.logger.error(f"Error parsing page {response.url}: {str(e)}")
+        finally:
+            if page is not None:
+                await page.close()
 
     def errback(self, failure):
         self.logger.error(f"Request failed: {failure.request.url}")
         self.logger.error(f"Failure type: {type(failure)}")
         self.logger.error(repr(failure))
 
+        request = failure.request
+        page = request.meta.pop("playwright_page", None)
+        if page is not None:
+            asyncio.ensure_future(page.close())
+        if self.controller.stopped:
+            # Downloads cut short by an early stop are not failures
+            return None
+
+        retries = request.meta.get("fetch_retries", 0)
+        if is_transient_fetch_failure(failure) and retries < config.resilience.fetch_max_retries:
+            delay = backoff_delay(retries)
+            notice = RetryError(
+                error_type="request_retry",
+                message=f"Re-queueing {request.url} in {delay:.2f}s after: {str(failure.value)}",
+                details={"url": request.url, "attempt": retries + 1, "delay": delay}
+            )
+            if self.retry_budget.take(notice):
+                metrics.incr("fetch.retries")
+                retry = request.replace(dont_filter=True)
+                retry.meta["fetch_retries"] = retries + 1
+                retry.meta["retry_not_before"] = time.monotonic() + delay
+                return retry
+
         download_timeout = config.timeouts.scrapy.download_timeout
         error = NetworkError(
             error_type="network_error",
@@ -86,63 +187,12 @@ class LLMPlaywrightSpider(Spider):
             details={
                 "url": failure.request.url,
                 "error": str(failure.value),
-                "depth": failure.request.meta.get("depth", -1)
+                "depth": failure.request.meta.get("depth", -1),
+                "retries": retries
             }
         )
         self.errors.append(error)
 
-    async def _ask_llm(self, details, instruction, prev_page_action) -> LLMResponse | None:
-        try:
-            system_prompt = config.system_prompt
-            decision_text, error = await ask_llm(self.session, system_prompt, instruction, details, prev_page_action)
-            
-            # If there was an error from the LLM call, add it to our errors list
-            if error:
-                print("DEBUG: LLM API error:", error)
-                self.errors.append(error)
-                return None
-                
-            if not decision_text:
-                error = LLMError(
-                    error_type="llm_error",
-                    message="LLM returned no response",
-                    details={"url": details.url}
-                )
-                print("DEBUG: LLM returned no response:", error)
-                self.errors.append(error)
-                return None
-            
-            print("DEBUG: LLM raw response:", decision_text)
-            result, validation_error = extract_json_from_response(decision_text)
-            
-            # If there was a validation error, add it to our errors list
-            if validation_error:
-                print("DEBUG: JSON validation error:", validation_error)
-                self.errors.append(validation_error)
-                return None
-                
-            if not result:
-                error = LLMError(
-                    error_type="llm_error",
-                    message="Failed to parse LLM response",
-                    details={"url": details.url, "response": decision_text}
-                )
-                print("DEBUG: Failed to parse LLM response:", e)
-                self.errors.append(error)
-                return None
-            
-            print("DEBUG: Successfully parsed LLM response:", result)
-            return result
-        except Exception as e:
-            error = LLMError(
-                error_type="llm_error",
-                message=f"Error in LLM processing: {str(e)}",
-                details={"url": details.url, "error_type": "llm_processing_error"}
-            )
-            print("DEBUG: Unexpected error in LLM processing:", e)
-            self.errors.append(error)
-            return None
-    
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
@@ -150,15 +200,7 @@ class LLMPlaywrightSpider(Spider):
         return spider
 
     def spider_closed(self, spider):
-        # Serialize session history
-        # serialized = [page_context.model_dump() for page_context in self.session.history]
-        # log = json.dumps(serialized, indent=2)
-        # print("Crawl logs:", log)
-        # f = open("results.json", "a")
-        # f.write(log)
-        # print("Saved crawl session history to results.json", f.name)
-        # f.close()
-        
+        # Pages and errors are streamed to the configured export sinks while the crawl runs
         # Store errors in the session
         print("DEBUG: Total error count -", len(self.errors))
         self.session.errors = self.errors
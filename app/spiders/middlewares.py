@@ -0,0 +1,88 @@
+'''Downloader middlewares for the LLM spider'''
+
+import asyncio
+import time
+from scrapy.http import HtmlResponse
+from scrapy.utils.httpobj import urlparse_cached
+from app.config.strigil_config import config
+from app.services.metrics import metrics
+from app.services.page_cache import page_cache
+from app.services.throttle import domain_throttle, parse_retry_after
+
+
+class PageCacheMiddleware:
+    """
+    Answers requests for pages with a fresh cached extraction before they reach
+    the browser. The cached `PageDetails` travel in `meta["cached_details"]` on an
+    empty response, and `CrawlController.handle_page` uses them instead of rendering.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls()
+
+    async def process_request(self, request, spider):
+        fresh_only = getattr(getattr(spider, "session", None), "fresh_only", False)
+        details = await page_cache.get(request.url, fresh_only=fresh_only)
+        if details is None:
+            return None
+        request.meta["cached_details"] = details
+        return HtmlResponse(url=request.url, status=200, body=b"", request=request, flags=["cached"])
+
+
+class AdaptiveThrottleMiddleware:
+    """
+    Gates every request through the process-wide per-domain throttle and feeds
+    render latency and status codes back into it. Re-queued failures wait out their
+    backoff here before taking a slot. Throttled responses (429/503)
+    are re-queued after the domain's Retry-After pause instead of surfacing as errors.
+    """
+
+    def __init__(self, throttle):
+        self.throttle = throttle
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(domain_throttle)
+
+    async def process_request(self, request, spider):
+        # Failed fetches are re-queued by the spider's errback with a backoff deadline
+        not_before = request.meta.pop("retry_not_before", None)
+        if not_before is not None and not_before > time.monotonic():
+            await asyncio.sleep(not_before - time.monotonic())
+        if not config.throttle.enabled:
+            return None
+        domain = urlparse_cached(request).hostname or ""
+        await self.throttle.acquire(domain, request.url)
+        request.meta["throttle_domain"] = domain
+        request.meta["throttle_started"] = time.monotonic()
+        return None
+
+    async def process_response(self, request, response, spider):
+        domain = request.meta.pop("throttle_domain", None)
+        if domain is None:
+            return response
+        started = request.meta.pop("throttle_started", time.monotonic())
+        latency = request.meta.get("download_latency", time.monotonic() - started)
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        self.throttle.release(domain, latency, response.status, retry_after)
+        metrics.observe("stage.render", latency)
+
+        retries = request.meta.get("throttle_retries", 0)
+        if response.status in config.throttle.throttled_statuses and retries < config.throttle.max_throttle_retries:
+            page = request.meta.pop("playwright_page", None)
+            if page is not None:
+                await page.close()
+            spider.logger.info(f"Throttled by {domain} ({response.status}), re-queueing {request.url}")
+            metrics.incr("throttle.requeued")
+            retry = request.replace(dont_filter=True)
+            retry.meta["throttle_retries"] = retries + 1
+            return retry
+        return response
+
+    def process_exception(self, request, exception, spider):
+        domain = request.meta.pop("throttle_domain", None)
+        if domain is not None:
+            request.meta.pop("throttle_started", None)
+            self.throttle.release(domain, None)
+        return None
@@ -0,0 +1 @@
+'''Benchmarks, local fixture servers and fault-injection checks for WebStrigil'''
@@ -0,0 +1,175 @@
+'''
+Compares per-page and batched LLM decisions on a recorded crawl: LLM requests,
+prompt and completion tokens, and wall-clock time.
+
+Recorded page extractions are replayed straight into the crawl controller, so no
+browser or site is needed. Without --session a recording of the fixture site tree
+is generated; a session JSON returned by a crawl (with `details` per page) can be
+replayed instead.
+
+    python -m benchmarks.bench_batching --pages 120 --fanout 4 --llm-latency 0.3
+    python -m benchmarks.bench_batching --session recorded_session.json
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from benchmarks.bench_config import use_bench_config
+from benchmarks.fixture_site import FixtureSiteSettings, children
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer
+
+FIXTURE_URL = "http://fixture.local"
+
+
+def fixture_recording(settings: FixtureSiteSettings) -> Dict[str, dict]:
+    """Page extractions of the fixture site, as `extract_details` would produce them"""
+    pages = {}
+    for page_id in range(settings.pages):
+        url = f"{FIXTURE_URL}/" if page_id == 0 else f"{FIXTURE_URL}/page/{page_id}"
+        pages[url] = {
+            "url": url,
+            "title": f"Fixture page {page_id}",
+            "body_text": f"Fixture page {page_id}\nThis is synthetic content for page {page_id}.",
+            "interactables": [
+                {"tag": "a", "text": f"Section {child}", "href": f"/page/{child}", "key": f"Section {child}"}
+                for child in children(page_id, settings)
+            ],
+        }
+    return pages
+
+
+def session_recording(path: str) -> Dict[str, dict]:
+    with open(path) as f:
+        session = json.load(f)
+    return {page["details"]["url"]: page["details"] for page in session["history"]}
+
+
+class ReplayEngine:
+    """Crawl engine that serves recorded page extractions to a `CrawlController`"""
+
+    def __init__(self, session, pages: Dict[str, object], concurrency: int):
+        from app.services.crawl_controller import CrawlController
+
+        self.session = session
+        self.pages = pages
+        self.concurrency = concurrency
+        self.controller = CrawlController(session, self)
+        self.frontier: asyncio.Queue = asyncio.Queue()
+        self.seen = set()
+
+    def make_request(self, url: str, depth: int, prev_url: Optional[str], prev_action_key: Optional[str]):
+        return url, depth, prev_url, prev_action_key
+
+    def pause(self):
+        pass
+
+    def unpause(self):
+        pass
+
+    def stop(self, reason: str) -> int:
+        dropped = 0
+        while not self.frontier.empty():
+            self.frontier.get_nowait()
+            self.frontier.task_done()
+            dropped += 1
+        return dropped
+
+    def enqueue(self, request) -> None:
+        if request[0] in self.pages and request[0] not in self.seen:
+            self.seen.add(request[0])
+            self.frontier.put_nowait(request)
+
+    async def run(self) -> None:
+        for url in self.session.start_urls:
+            self.enqueue(self.make_request(str(url), 0, None, None))
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        await self.frontier.join()
+        for worker in workers:
+            worker.cancel()
+
+    async def _worker(self) -> None:
+        from app.schemas.context_schema import PageAction
+
+        while True:
+            url, depth, prev_url, prev_action_key = await self.frontier.get()
+            try:
+                prev_page_action = PageAction(url=prev_url, action_key=prev_action_key) if prev_url else None
+                next_requests = await self.controller.handle_page(url, depth, None, prev_page_action, cached_details=self.pages[url])
+                for request in next_requests:
+                    self.enqueue(request)
+            finally:
+                self.frontier.task_done()
+
+
+async def main(args, recording: Dict[str, dict]) -> list:
+    from app.config.strigil_config import config
+    from app.schemas.context_schema import CrawlSession, PageDetails
+    from app.services.llm_router import llm_router
+    from app.services.metrics import metrics
+
+    pages = {url: PageDetails.model_validate(details) for url, details in recording.items()}
+    start_url = args.start_url or next(iter(pages))
+    runs = []
+    for mode in args.modes:
+        config.llm_batching.enabled = mode == "batched"
+        for repeat in range(args.repeat):
+            llm_router.route_stats.clear()
+            metrics.counters.clear()
+            session = CrawlSession(start_urls=[start_url], user_instruction="Benchmark crawl", max_depth=args.max_depth)
+            engine = ReplayEngine(session, pages, args.concurrency)
+            started = time.monotonic()
+            await engine.run()
+            elapsed = time.monotonic() - started
+            routes = llm_router.stats().values()
+            result = {
+                "mode": mode,
+                "repeat": repeat,
+                "pages": len(session.history),
+                "llm_requests": sum(route["requests"] for route in routes),
+                "prompt_tokens": sum(route["prompt_tokens"] for route in routes),
+                "completion_tokens": sum(route["completion_tokens"] for route in routes),
+                "seconds": round(elapsed, 3),
+                "batches": metrics.counters.get("llm.batches", 0),
+                "batch_fallbacks": metrics.counters.get("llm.batch_fallbacks", 0),
+            }
+            result["tokens_per_page"] = round((result["prompt_tokens"] + result["completion_tokens"]) / result["pages"], 1) if result["pages"] else None
+            print(json.dumps(result))
+            runs.append(result)
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session", help="Session JSON to replay instead of the fixture site")
+    parser.add_argument("--start-url", help="Start URL in the recording, defaults to its first page")
+    parser.add_argument("--modes", nargs="+", default=["single", "batched"], choices=["single", "batched"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages processed concurrently, like CONCURRENT_REQUESTS")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--window", type=float, default=0.25, help="Batching window in seconds")
+    parser.add_argument("--max-batch-size", type=int, default=6)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.session:
+        recording = session_recording(args.session)
+    else:
+        recording = fixture_recording(FixtureSiteSettings(pages=args.pages, fanout=args.fanout))
+    llm = BackgroundServer(create_mock_llm_app(MockLLMSettings(latency_median=args.llm_latency, click_fanout=args.fanout))).start()
+    config_path = use_bench_config(llm.url, {"llm_batching": {"window": args.window, "max_batch_size": args.max_batch_size}})
+    try:
+        runs = asyncio.run(main(args, recording))
+    finally:
+        llm.stop()
+        os.unlink(config_path)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "llm_batching", "runs": runs}, f, indent=2)
@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict
+
+BASE_CONFIG = "app/config/strigil_config.json"
+
+
+def deep_update(target: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_update(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def use_bench_config(mock_llm_url: str, overrides: Dict[str, Any] = None) -> str:
+    """
+    Write a benchmark copy of the configuration that sends every LLM call to the mock
+    server and disables the page cache, and point STRIGIL_CONFIG at it.
+
+    Must run before the configuration is first used, since it is read once on first
+    access; worker processes inherit the environment variable.
+    """
+    with open(BASE_CONFIG) as f:
+        data = json.load(f)
+    deep_update(data, {
+        "llm_model": "mock-model",
+        "llm_routing": {
+            "backends": [{"name": "mock", "base_url": f"{mock_llm_url}/v1", "api_key_env": "MOCK_LLM_KEY"}],
+        },
+        "page_cache": {"enabled": False},
+        "throttle": {"initial_concurrency": 8, "max_concurrency": 32},
+    })
+    deep_update(data, overrides or {})
+
+    fd, path = tempfile.mkstemp(prefix="strigil-bench-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.environ["STRIGIL_CONFIG"] = path
+    os.environ.setdefault("MOCK_LLM_KEY", "mock")
+    return path
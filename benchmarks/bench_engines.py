@@ -0,0 +1,78 @@
+'''
+Compares the Scrapy and native asyncio crawl engines on the local fixture site with
+the mock LLM: pages/sec and the engine's time per page outside the LLM call, from
+render start to the LLM request and from the reply to the follow-up requests.
+
+    python -m benchmarks.bench_engines --engines scrapy asyncio --repeat 3
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.bench_config import use_bench_config
+from benchmarks.fixture_site import FixtureSiteSettings, create_fixture_site
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer
+
+
+async def main(args) -> list:
+    from app.config.strigil_config import config
+    from app.services.crawler import run_crawl
+    from app.services.metrics import metrics
+
+    runs = []
+    for engine in args.engines:
+        config.crawl_engine = engine
+        for repeat in range(args.repeat):
+            metrics.latencies.clear()
+            started = time.monotonic()
+            session, errors = await run_crawl(f"{args.site_url}/", "Benchmark crawl", args.max_depth, fresh_only=True)
+            elapsed = time.monotonic() - started
+            pages = len(session.history)
+            llm = metrics.latency_summary("stage.llm")
+            render = list(metrics.latencies["stage.render"])
+            work = list(metrics.latencies["stage.page_work"])
+            result = {
+                "engine": engine,
+                "repeat": repeat,
+                "pages": pages,
+                "errors": len(session.errors) + len(errors),
+                "seconds": round(elapsed, 3),
+                "pages_per_sec": round(pages / elapsed, 3) if elapsed else None,
+                # Measured per page, since pages render and wait for the LLM concurrently
+                "overhead_ms_per_page": round((sum(render) / len(render) if render else 0.0) * 1000 + sum(work) / len(work) * 1000, 1) if work else None,
+                "render_p50": metrics.latency_summary("stage.render")["p50"],
+                "llm_p50": llm["p50"],
+            }
+            print(json.dumps(result))
+            runs.append(result)
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["scrapy", "asyncio"], choices=["scrapy", "asyncio"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    site = BackgroundServer(create_fixture_site(FixtureSiteSettings(pages=args.pages, fanout=args.fanout))).start()
+    llm = BackgroundServer(create_mock_llm_app(MockLLMSettings(latency_median=args.llm_latency, click_fanout=args.fanout))).start()
+    config_path = use_bench_config(llm.url)
+    args.site_url = site.url
+    try:
+        runs = asyncio.run(main(args))
+    finally:
+        site.stop()
+        llm.stop()
+        os.unlink(config_path)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "crawl_engines", "runs": runs}, f, indent=2)
@@ -0,0 +1,86 @@
+'''
+Crawl throughput of the process-pool backend for increasing worker counts, against
+the local fixture site and mock LLM.
+
+    python -m benchmarks.bench_pool --workers 1 2 4 8 --crawls 16
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.bench_config import use_bench_config
+from benchmarks.fixture_site import FixtureSiteSettings, create_fixture_site
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer
+
+
+async def measure(pool, site_url: str, crawls: int, max_depth: int) -> dict:
+    started = time.monotonic()
+    results = await asyncio.gather(*[
+        pool.submit(f"{site_url}/", f"Benchmark crawl {i}", max_depth, fresh_only=True)
+        for i in range(crawls)
+    ])
+    elapsed = time.monotonic() - started
+    pages = sum(len(session.history) for session, _ in results)
+    if max_depth and not pages:
+        # Throughput without pages measures nothing, e.g. when the browser could not launch
+        print("WARNING: No pages were crawled; is Chromium installed (playwright install chromium)?")
+    errors = sum(len(session.errors) + len(errors) for session, errors in results)
+    return {
+        "crawls": crawls,
+        "pages": pages,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else None,
+        "crawls_per_sec": round(crawls / elapsed, 3) if elapsed else None,
+    }
+
+
+async def main(args) -> list:
+    from app.config.strigil_config import CrawlPoolConfig
+    from app.services.crawl_pool import CrawlWorkerPool
+
+    runs = []
+    for workers in args.workers:
+        pool = CrawlWorkerPool(CrawlPoolConfig(workers=workers, jobs_per_worker=args.jobs_per_worker))
+        pool.start()
+        try:
+            # One crawl per worker first, so process start-up and browser launch are not measured
+            await measure(pool, args.site_url, workers, 0)
+            result = await measure(pool, args.site_url, args.crawls, args.max_depth)
+        finally:
+            await pool.close()
+        result["workers"] = workers
+        print(json.dumps(result))
+        runs.append(result)
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs-per-worker", type=int, default=2)
+    parser.add_argument("--crawls", type=int, default=8)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    site = BackgroundServer(create_fixture_site(FixtureSiteSettings(pages=args.pages, fanout=args.fanout))).start()
+    llm = BackgroundServer(create_mock_llm_app(MockLLMSettings(latency_median=args.llm_latency, click_fanout=args.fanout))).start()
+    config_path = use_bench_config(llm.url)
+    args.site_url = site.url
+    try:
+        runs = asyncio.run(main(args))
+    finally:
+        site.stop()
+        llm.stop()
+        os.unlink(config_path)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "crawl_pool", "runs": runs}, f, indent=2)
@@ -0,0 +1,177 @@
+'''
+Records crawls into archives and replays them offline, for deterministic benchmarks.
+
+    # Record the local fixture site with the mock LLM, or a live site with the configured LLM
+    python -m benchmarks.bench_replay record --archive benchmarks/corpus/my-site
+    python -m benchmarks.bench_replay record --start-url https://example.com --live-llm --archive benchmarks/corpus/example
+
+    # Write the fixture site archive without a browser (the committed corpus/fixture-tree)
+    python -m benchmarks.bench_replay synthesize --archive benchmarks/corpus/fixture-tree
+
+    # Replay an archive: no network access, same pages and decisions on every run
+    python -m benchmarks.bench_replay replay --archive benchmarks/corpus/fixture-tree --repeat 3
+
+Replays report pages/sec, LLM tokens and archive misses per run, and whether every
+run visited the same pages with the same decisions.
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_config import BASE_CONFIG, deep_update, use_bench_config
+from benchmarks.fixture_site import FixtureSiteSettings, children, create_fixture_site, render_page
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer
+
+FIXTURE_URL = "http://fixture.local"
+MOCK_MODEL = "mock-model"
+
+
+def use_recording_config(overrides: dict) -> str:
+    """Copy of the configuration with only the recording section changed, for live crawls"""
+    with open(BASE_CONFIG) as f:
+        data = deep_update(json.load(f), overrides)
+    fd, path = tempfile.mkstemp(prefix="strigil-replay-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.environ["STRIGIL_CONFIG"] = path
+    return path
+
+
+def synthesize(archive_path: str, settings: FixtureSiteSettings, instruction: str, max_depth: int) -> None:
+    """Write an archive of the fixture site as a recording would, with mock decisions for every page"""
+    from pathlib import Path
+    from app.services.recording import SessionArchive
+
+    archive = SessionArchive(Path(archive_path))
+    # Completions are appended, so a rewrite starts from an empty log
+    (archive.path / "llm.jsonl").unlink(missing_ok=True)
+    archive.manifest["sessions"].append({
+        "start_urls": [f"{FIXTURE_URL}/"],
+        "user_instruction": instruction,
+        "max_depth": max_depth,
+        "recorded_at": 0,
+    })
+    for page_id in range(settings.pages):
+        url = f"{FIXTURE_URL}/" if page_id == 0 else f"{FIXTURE_URL}/page/{page_id}"
+        archive.add_page(url, render_page(page_id, settings), recorded_at=0)
+        actions = [
+            {"action": "click", "target": f"Section {child}", "reason": "mock decision", "goal": f"explore section {child}"}
+            for child in children(page_id, settings)
+        ] or [{"action": "stop", "reason": "nothing to click"}]
+        decision = {"summary": f"Fixture page {page_id}.", "actions": actions, "confidence": 0.9}
+        content = f"```json\n{json.dumps(decision)}\n```"
+        prompt = f"Details of the page: {{'url': '{url}'}}"
+        archive.add_completion([{"role": "user", "content": prompt}], MOCK_MODEL, {
+            "id": f"replay-{page_id}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": MOCK_MODEL,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 1200, "completion_tokens": len(content) // 4, "total_tokens": 1200 + len(content) // 4},
+        })
+    archive.save()
+    print(f"Wrote {settings.pages} pages to {archive_path}")
+
+
+async def record(args) -> None:
+    from app.services.crawler import run_crawl
+
+    session, errors = await run_crawl(args.start_url, args.instruction, args.max_depth, fresh_only=True)
+    print(f"Recorded {len(session.history)} pages into {args.archive} ({len(session.errors) + len(errors)} errors)")
+
+
+async def replay(args) -> list:
+    from app.services.crawler import run_crawl
+    from app.services.llm_router import llm_router
+    from app.services.metrics import metrics
+    from app.services.recording import recorder
+
+    recorded = recorder._replay_archive().manifest["sessions"][0]
+    runs, outcomes = [], []
+    for repeat in range(args.repeat):
+        llm_router.route_stats.clear()
+        metrics.counters.clear()
+        started = time.monotonic()
+        session, errors = await run_crawl(
+            recorded["start_urls"][0],
+            recorded["user_instruction"],
+            args.max_depth if args.max_depth is not None else recorded["max_depth"],
+        )
+        elapsed = time.monotonic() - started
+        routes = llm_router.stats().values()
+        outcomes.append({
+            str(page_ctx.url()): [action.model_dump(mode="json") for action in page_ctx.actions]
+            for page_ctx in session.history
+        })
+        result = {
+            "repeat": repeat,
+            "pages": len(session.history),
+            "errors": len(session.errors) + len(errors),
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(len(session.history) / elapsed, 2) if elapsed else None,
+            "prompt_tokens": sum(route["prompt_tokens"] for route in routes),
+            "completion_tokens": sum(route["completion_tokens"] for route in routes),
+            "page_misses": metrics.counters.get("replay.page_misses", 0),
+            "llm_misses": metrics.counters.get("replay.llm_misses", 0),
+        }
+        print(json.dumps(result))
+        runs.append(result)
+    deterministic = all(outcome == outcomes[0] for outcome in outcomes)
+    print(json.dumps({"deterministic": deterministic}))
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["record", "synthesize", "replay"])
+    parser.add_argument("--archive", required=True, help="Archive directory")
+    parser.add_argument("--engine", choices=["scrapy", "asyncio"], default="scrapy")
+    parser.add_argument("--start-url", help="Site to record, defaults to a local fixture site")
+    parser.add_argument("--instruction", default="Benchmark crawl")
+    parser.add_argument("--max-depth", type=int, help="Defaults to 3 when recording and to the recorded depth on replay")
+    parser.add_argument("--live-llm", action="store_true", help="Record the configured LLM backends instead of the mock LLM")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the replay results as JSON to this file")
+    args = parser.parse_args()
+
+    fixture = FixtureSiteSettings(pages=args.pages, fanout=args.fanout)
+    if args.command == "synthesize":
+        synthesize(args.archive, fixture, args.instruction, args.max_depth if args.max_depth is not None else 3)
+    elif args.command == "record":
+        args.max_depth = args.max_depth if args.max_depth is not None else 3
+        overrides = {"crawl_engine": args.engine, "recording": {"mode": "record", "archive": os.path.abspath(args.archive)}}
+        servers = []
+        if args.start_url is None:
+            site = BackgroundServer(create_fixture_site(fixture)).start()
+            servers.append(site)
+            args.start_url = f"{site.url}/"
+        if args.live_llm:
+            config_path = use_recording_config(overrides)
+        else:
+            llm = BackgroundServer(create_mock_llm_app(MockLLMSettings(click_fanout=args.fanout))).start()
+            servers.append(llm)
+            config_path = use_bench_config(llm.url, overrides)
+        try:
+            asyncio.run(record(args))
+        finally:
+            for server in servers:
+                server.stop()
+            os.unlink(config_path)
+    else:
+        overrides = {"crawl_engine": args.engine, "recording": {"mode": "replay", "archive": os.path.abspath(args.archive)}}
+        # The mock URL is never contacted: replayed completions come from the archive
+        config_path = use_bench_config("http://replay.invalid", overrides)
+        try:
+            runs = asyncio.run(replay(args))
+        finally:
+            os.unlink(config_path)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"benchmark": "replay", "archive": args.archive, "runs": runs}, f, indent=2)
@@ -0,0 +1,128 @@
+'''
+Cold start benchmark: import time of `api.main`, the packages it spends that time
+in, and how long a fresh API process takes to answer /health and /ready.
+
+    python -m benchmarks.bench_startup --repeat 5 --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --tolerance 0.25
+
+With --baseline, exits with status 1 when the median import time or time to ready
+regressed by more than the tolerance.
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.bench_config import use_bench_config
+from benchmarks.mock_llm_server import create_mock_llm_app
+from benchmarks.serving import BackgroundServer, free_port
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import api.main; print(time.perf_counter() - started)"
+
+
+def measure_import(repeat: int) -> dict:
+    """Import `api.main` in fresh interpreters; wall time includes interpreter start-up"""
+    imports, walls = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True).stdout
+        walls.append(time.perf_counter() - started)
+        imports.append(float(output.strip().splitlines()[-1]))
+    return {
+        "import_seconds": round(statistics.median(imports), 4),
+        "import_seconds_min": round(min(imports), 4),
+        "process_seconds": round(statistics.median(walls), 4),
+    }
+
+
+def import_breakdown(top: int) -> dict:
+    """Self import time per top-level package from `python -X importtime`, largest first"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.main"], capture_output=True, text=True, check=True)
+    per_package = Counter()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        per_package[name.strip().split(".")[0]] += int(self_us)
+    return {package: round(us / 1e6, 4) for package, us in per_package.most_common(top)}
+
+
+def measure_server(timeout: float) -> dict:
+    """Start the API with uvicorn and time the first successful /health and /ready answers"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {"health_seconds": None, "ready_seconds": None, "warmup": None}
+    try:
+        with httpx.Client(timeout=2.0) as http:
+            while time.perf_counter() - started < timeout and result["ready_seconds"] is None:
+                path = "/health" if result["health_seconds"] is None else "/ready"
+                try:
+                    response = http.get(url + path)
+                except httpx.HTTPError:
+                    response = None
+                if response is not None and response.status_code == 200:
+                    key = "health_seconds" if path == "/health" else "ready_seconds"
+                    result[key] = round(time.perf_counter() - started, 4)
+                    if path == "/ready":
+                        result["warmup"] = response.json()
+                    continue
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return result
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for key in ("import_seconds", "ready_seconds"):
+        before, after = baseline.get(key), current.get(key)
+        if before and after and after > before * (1 + tolerance):
+            found.append(f"{key}: {before}s -> {after}s (+{(after / before - 1) * 100:.0f}%)")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Packages listed in the import breakdown")
+    parser.add_argument("--engine", choices=["scrapy", "asyncio"], default="scrapy")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server to become ready")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    llm = BackgroundServer(create_mock_llm_app()).start()
+    config_path = use_bench_config(llm.url, {"crawl_engine": args.engine})
+    try:
+        results = {"benchmark": "startup", "engine": args.engine}
+        results.update(measure_import(args.repeat))
+        results["import_breakdown"] = import_breakdown(args.top)
+        results.update(measure_server(args.timeout))
+    finally:
+        llm.stop()
+        os.unlink(config_path)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,340 @@
+'''
+End-to-end crawl benchmark over a matrix of synthetic sites, mock LLM behaviours and
+concurrency levels, through `run_crawl` in this process or the /crawl API of a fresh
+uvicorn server.
+
+Each run reports pages/sec, crawl latency and p50/p95/p99 latency per stage (render,
+extract, interact, llm), peak RSS of the crawling process tree and peak Chromium process count.
+Prompt tokens per page show how much the summary store saves: the crawls of a run
+visit the same site with different instructions, and --no-summary-store turns it
+off for comparison. With --deadline, crawls are cut short and the runs also report how long crawls took
+to release their pages and LLM calls after being cancelled.
+
+    python -m benchmarks.bench_suite --targets run_crawl api --concurrency 1 4 --output suite.json
+    python -m benchmarks.bench_suite --scenarios js heavy --engine asyncio --baseline suite.json
+
+With --baseline, exits with status 1 when pages/sec of a run dropped by more than the
+tolerance against the run with the same scenario, target and concurrency. When
+crawling through `run_crawl` the fixture servers share the measured process, so its
+RSS includes them.
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_config import use_bench_config
+from benchmarks.fixture_site import FixtureSiteSettings, create_fixture_site
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer, free_port
+
+STAGES = ["stage.render", "stage.extract", "stage.interact", "stage.llm"]
+BROWSER_NAMES = ("chrom", "headless_shell")
+
+SCENARIOS: Dict[str, dict] = {
+    "baseline": {"site": {}, "llm": {}},
+    "js": {"site": {"js_rendering": True}, "llm": {}},
+    "heavy": {"site": {"page_weight_kb": 500}, "llm": {}},
+    "slow": {"site": {"slow_every": 5, "slow_seconds": 2.0}, "llm": {}},
+    "llm_tail": {"site": {}, "llm": {"latency_median": 0.3, "latency_sigma": 0.8}},
+    "spa": {"site": {"spa": True}, "llm": {}},
+}
+
+
+def _read_proc(pid: int, name: str) -> str:
+    with open(f"/proc/{pid}/{name}") as f:
+        return f.read()
+
+
+def process_tree(root: int) -> List[int]:
+    """`root` and all its descendants, from /proc"""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            # The command name is parenthesised and may contain spaces, so split after it
+            fields = _read_proc(int(entry), "stat").rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents.setdefault(int(fields[1]), []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(parents.get(pid, []))
+    return tree
+
+
+def rss_bytes(pid: int) -> int:
+    for line in _read_proc(pid, "status").splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+class ResourceSampler:
+    """Samples RSS and Chromium processes of a process tree on a background thread, keeping the peaks"""
+
+    def __init__(self, root: int, interval: float = 0.1):
+        self.root = root
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_browser_rss = 0
+        self.peak_browser_processes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        total, browser_rss, browsers = 0, 0, 0
+        for pid in process_tree(self.root):
+            try:
+                rss = rss_bytes(pid)
+                name = _read_proc(pid, "comm").strip().lower()
+            except OSError:
+                continue
+            total += rss
+            if name.startswith(BROWSER_NAMES):
+                browsers += 1
+                browser_rss += rss
+        self.peak_rss = max(self.peak_rss, total)
+        self.peak_browser_rss = max(self.peak_browser_rss, browser_rss)
+        self.peak_browser_processes = max(self.peak_browser_processes, browsers)
+
+    def report(self) -> dict:
+        return {
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "peak_browser_rss_mb": round(self.peak_browser_rss / 2**20, 1),
+            "peak_browser_processes": self.peak_browser_processes,
+        }
+
+
+def prompt_tokens(route_stats: dict) -> int:
+    return sum(stats.get("prompt_tokens", 0) for stats in route_stats.values())
+
+
+def summarize(latencies: List[float]) -> dict:
+    from app.services.metrics import percentile
+
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def run_bounded(crawls: int, concurrency: int, crawl_once) -> List[dict]:
+    """Run `crawls` crawls with at most `concurrency` in flight; each returns pages, errors and its completion"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> dict:
+        async with semaphore:
+            started = time.monotonic()
+            pages, errors, completion = await crawl_once(index)
+            return {"pages": pages, "errors": errors, "seconds": time.monotonic() - started, "completion": completion}
+
+    return await asyncio.gather(*(one(index) for index in range(crawls)))
+
+
+async def bench_run_crawl(site_url: str, args, concurrency: int) -> dict:
+    from app.services.crawler import run_crawl
+    from app.services.llm_router import llm_router
+    from app.services.metrics import metrics
+
+    async def crawl_once(index: int):
+        session, errors = await run_crawl(f"{site_url}/", f"Benchmark crawl {index}", args.max_depth, fresh_only=True, deadline=args.deadline)
+        return len(session.history), len(session.errors) + len(errors), session.completion.model_dump()
+
+    metrics.latencies.clear()
+    tokens_before = prompt_tokens(llm_router.stats())
+    with ResourceSampler(os.getpid()) as sampler:
+        started = time.monotonic()
+        crawls = await run_bounded(args.crawls, concurrency, crawl_once)
+        elapsed = time.monotonic() - started
+    stages = {stage: metrics.latency_summary(stage) for stage in STAGES}
+    tokens = prompt_tokens(llm_router.stats()) - tokens_before
+    return {"elapsed": elapsed, "crawls": crawls, "stages": stages, "prompt_tokens": tokens, "resources": sampler.report()}
+
+
+def start_api(timeout: float) -> tuple:
+    """Start the API on a free port and wait until /ready answers 200"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    report = None
+    with httpx.Client(timeout=2.0) as http:
+        while time.monotonic() < deadline:
+            try:
+                response = http.get(f"{url}/ready")
+                if response.status_code == 200:
+                    return process, url
+                report = response.text
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"API on port {port} was not ready after {timeout}s: {report}")
+
+
+async def bench_api(site_url: str, args, concurrency: int) -> dict:
+    process, api_url = start_api(args.ready_timeout)
+    try:
+        async with httpx.AsyncClient(timeout=None) as http:
+            async def crawl_once(index: int):
+                response = await http.post(f"{api_url}/crawl", json={
+                    "start_url": f"{site_url}/",
+                    "user_instruction": f"Benchmark crawl {index}",
+                    "max_depth": args.max_depth,
+                    "fresh_only": True,
+                    "deadline_seconds": args.deadline,
+                })
+                if response.status_code != 200:
+                    return 0, 1, {}
+                body = response.json()
+                return len(body.get("history", [])), len(body.get("errors") or []), body.get("completion") or {}
+
+            with ResourceSampler(process.pid) as sampler:
+                started = time.monotonic()
+                crawls = await run_bounded(args.crawls, concurrency, crawl_once)
+                elapsed = time.monotonic() - started
+            snapshot = (await http.get(f"{api_url}/metrics")).json()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    stages = {stage: snapshot["latencies"].get(stage, summarize([])) for stage in STAGES}
+    tokens = prompt_tokens(snapshot.get("llm_routes", {}))
+    return {"elapsed": elapsed, "crawls": crawls, "stages": stages, "prompt_tokens": tokens, "resources": sampler.report()}
+
+
+async def main(args, llm_app) -> list:
+    from app.config.strigil_config import config
+
+    config.crawl_engine = args.engine
+    runs = []
+    for scenario in args.scenarios:
+        spec = SCENARIOS[scenario]
+        site = BackgroundServer(create_fixture_site(FixtureSiteSettings(pages=args.pages, fanout=args.fanout, **spec["site"]))).start()
+        llm_app.state.settings = MockLLMSettings(**{"click_fanout": args.fanout, "latency_median": args.llm_latency, "seed": 1, **spec["llm"]})
+        try:
+            for target in args.targets:
+                for concurrency in args.concurrency:
+                    measure = bench_run_crawl if target == "run_crawl" else bench_api
+                    measured = await measure(site.url, args, concurrency)
+                    pages = sum(crawl["pages"] for crawl in measured["crawls"])
+                    completions = [crawl["completion"] for crawl in measured["crawls"]]
+                    result = {
+                        "scenario": scenario,
+                        "target": target,
+                        "concurrency": concurrency,
+                        "crawls": len(measured["crawls"]),
+                        "pages": pages,
+                        "errors": sum(crawl["errors"] for crawl in measured["crawls"]),
+                        "seconds": round(measured["elapsed"], 3),
+                        "pages_per_sec": round(pages / measured["elapsed"], 3) if measured["elapsed"] else None,
+                        "prompt_tokens_per_page": round(measured["prompt_tokens"] / pages, 1) if pages else None,
+                        "crawl_seconds": summarize([crawl["seconds"] for crawl in measured["crawls"]]),
+                        "truncated": sum(1 for completion in completions if completion.get("truncated")),
+                        "release_seconds": summarize([c["release_seconds"] for c in completions if c.get("release_seconds") is not None]),
+                        "stages": measured["stages"],
+                        **measured["resources"],
+                    }
+                    print(json.dumps(result))
+                    runs.append(result)
+        finally:
+            site.stop()
+    return runs
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(runs: list, baseline: dict, tolerance: float) -> list:
+    key = lambda run: (run["scenario"], run["target"], run["concurrency"])
+    before = {key(run): run for run in baseline.get("runs", [])}
+    found = []
+    for run in runs:
+        previous = before.get(key(run))
+        if previous and previous.get("pages_per_sec") and run["pages_per_sec"] is not None:
+            if run["pages_per_sec"] < previous["pages_per_sec"] * (1 - tolerance):
+                found.append(f"{'/'.join(map(str, key(run)))}: {previous['pages_per_sec']} -> {run['pages_per_sec']} pages/sec")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--targets", nargs="+", default=["run_crawl"], choices=["run_crawl", "api"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Crawls in flight at once")
+    parser.add_argument("--crawls", type=int, default=4, help="Crawls per run")
+    parser.add_argument("--engine", choices=["scrapy", "asyncio"], default="scrapy")
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--deadline", type=float, help="Deadline of every crawl in seconds")
+    parser.add_argument("--no-summary-store", action="store_true", help="Send every page's text, without stored summaries")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for the API to become ready")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed drop in pages/sec against the baseline")
+    args = parser.parse_args()
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    llm_app = create_mock_llm_app()
+    llm = BackgroundServer(llm_app).start()
+    # The API subprocesses read the same configuration through STRIGIL_CONFIG
+    config_path = use_bench_config(llm.url, {"crawl_engine": args.engine, "summary_store": {"enabled": not args.no_summary_store}})
+    try:
+        runs = asyncio.run(main(args, llm_app))
+    finally:
+        llm.stop()
+        os.unlink(config_path)
+
+    results = {
+        "benchmark": "suite",
+        "engine": args.engine,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "started_at": started_at,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(runs, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,91 @@
+'''
+Checks LLM retries, the retry budget and circuit breaking against the mock LLM
+server with injected faults. Exits non-zero if any check fails.
+
+    python -m benchmarks.fault_injection
+'''
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+from app.config.strigil_config import config, LLMBackendConfig, LLMRouteConfig, LLMRoutingConfig, LLMTierConfig
+from app.services.llm_router import LLMRouter
+from app.services.resilience import CircuitOpenError, RetryBudget, breaker_for
+from benchmarks.mock_llm_server import MockLLMSettings, create_mock_llm_app
+from benchmarks.serving import BackgroundServer
+
+MESSAGES = [{"role": "user", "content": "Which ones should we interact with next, and why?"}]
+
+
+async def run_phase(router, tier, budget, calls):
+    outcome = {"ok": 0, "failed": 0, "circuit_open": 0, "seconds": 0.0}
+    started = time.monotonic()
+    for _ in range(calls):
+        try:
+            await router.complete(MESSAGES, tier, budget)
+            outcome["ok"] += 1
+        except CircuitOpenError:
+            outcome["circuit_open"] += 1
+        except Exception:
+            outcome["failed"] += 1
+    outcome["seconds"] = round(time.monotonic() - started, 3)
+    return outcome
+
+
+async def main() -> int:
+    config.resilience.retry_base_delay = 0.01
+    config.resilience.retry_max_delay = 0.2
+    config.resilience.breaker_failure_threshold = 6
+    config.resilience.breaker_reset_timeout = 1.0
+    config.timeouts.llm.request_timeout = 2.0
+
+    server = BackgroundServer(create_mock_llm_app(MockLLMSettings(latency_median=0.01, seed=7))).start()
+    os.environ.setdefault("MOCK_LLM_KEY", "mock")
+    router = LLMRouter(LLMRoutingConfig(
+        backends=[LLMBackendConfig(name="mock", base_url=f"{server.url}/v1", api_key_env="MOCK_LLM_KEY")],
+    ), "mock-model")
+    tier = LLMTierConfig(route=LLMRouteConfig(backend="mock", model="mock-model"))
+
+    async def set_faults(**faults):
+        async with httpx.AsyncClient() as http:
+            await http.post(f"{server.url}/mock/settings", json=faults)
+
+    results, checks = {}, {}
+    try:
+        await set_faults(error_rate=0.15, rate_limit_rate=0.05, retry_after=0.05)
+        budget = RetryBudget(1000)
+        results["flaky"] = await run_phase(router, tier, budget, 30)
+        results["flaky"]["retries"] = budget.used
+        checks["flaky calls mostly recover"] = results["flaky"]["ok"] >= 27 and budget.used > 0
+
+        await set_faults(error_rate=1.0, rate_limit_rate=0.0)
+        results["outage"] = await run_phase(router, tier, RetryBudget(1000), 10)
+        results["outage"]["breaker"] = breaker_for("mock").snapshot()
+        checks["outage opens the circuit"] = results["outage"]["circuit_open"] > 0
+        checks["open circuit fails fast"] = results["outage"]["seconds"] < 5
+
+        await set_faults(error_rate=0.0)
+        await asyncio.sleep(config.resilience.breaker_reset_timeout)
+        results["recovery"] = await run_phase(router, tier, RetryBudget(1000), 5)
+        checks["circuit closes after recovery"] = breaker_for("mock").state == "closed" and results["recovery"]["ok"] == 5
+
+        await set_faults(error_rate=1.0)
+        budget = RetryBudget(2)
+        breaker_for("mock").record_success()
+        await run_phase(router, tier, budget, 1)
+        checks["retry budget caps retries"] = budget.used == 2
+    finally:
+        server.stop()
+
+    results["routes"] = router.stats()
+    print(json.dumps({"results": results, "checks": checks}, indent=2))
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
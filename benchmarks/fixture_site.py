@@ -0,0 +1,147 @@
+'''
+Synthetic local website for crawl benchmarks.
+
+Pages form a tree: page N links to pages N*fanout+1 .. N*fanout+fanout until
+`pages` pages exist. Links can be rendered by JavaScript, pages padded to a given
+weight, and every `slow_every`-th page delayed. In SPA mode the links are buttons
+without an href that fetch the child page as JSON, swap it in and push its route.
+Run standalone with:
+    python -m benchmarks.fixture_site --port 8200 --pages 200 --fanout 4 --js-rendering --page-weight-kb 200
+'''
+
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, JSONResponse
+from pydantic import BaseModel, Field
+
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore. "
+
+
+class FixtureSiteSettings(BaseModel):
+    """Shape of the generated site"""
+    pages: int = Field(default=50, description="Total number of pages")
+    fanout: int = Field(default=3, description="Links from each page to child pages")
+    js_rendering: bool = Field(default=False, description="Insert the links with a script after load, so only a rendered DOM has them")
+    js_delay_ms: int = Field(default=50, description="Delay before the script inserts the links")
+    page_weight_kb: int = Field(default=0, description="Pad each page with filler text up to roughly this many kilobytes")
+    slow_every: int = Field(default=0, description="Delay every n-th page, 0 for none")
+    slow_seconds: float = Field(default=2.0, description="Delay of slow pages in seconds")
+    spa: bool = Field(default=False, description="Render links as buttons that load the child page client-side, with pushState and popstate")
+
+
+def children(page_id: int, settings: FixtureSiteSettings):
+    first = page_id * settings.fanout + 1
+    return [child for child in range(first, first + settings.fanout) if child < settings.pages]
+
+
+def is_slow(page_id: int, settings: FixtureSiteSettings) -> bool:
+    return settings.slow_every > 0 and page_id > 0 and page_id % settings.slow_every == 0
+
+
+SPA_SCRIPT = """<script>
+async function show(id, push) {
+  const data = await (await fetch("/api/page/" + id)).json();
+  document.title = data.title;
+  document.getElementById("content").innerHTML = data.content;
+  if (push) history.pushState({id: id}, "", "/page/" + id);
+}
+document.addEventListener("click", function (event) {
+  const button = event.target.closest("button[data-page]");
+  if (button) show(button.dataset.page, true);
+});
+window.addEventListener("popstate", function () {
+  const match = location.pathname.match(/\\/page\\/(\\d+)/);
+  show(match ? match[1] : 0, false);
+});
+</script>"""
+
+
+def render_content(page_id: int, settings: FixtureSiteSettings) -> str:
+    if settings.spa:
+        items = [f'<li><button type="button" data-page="{child}">Section {child}</button></li>' for child in children(page_id, settings)]
+    else:
+        items = [f'<li><a href="/page/{child}">Section {child}</a></li>' for child in children(page_id, settings)]
+    if settings.js_rendering and not settings.spa:
+        links = f"""<ul id="links"></ul>
+<script>
+setTimeout(function () {{
+  document.getElementById("links").innerHTML = {json.dumps("".join(items))};
+}}, {settings.js_delay_ms});
+</script>"""
+    else:
+        links = "<ul>\n" + "\n".join(items) + "\n</ul>"
+    padding = ""
+    if settings.page_weight_kb > 0:
+        paragraph = f"<p>{FILLER * 10}</p>\n"
+        padding = paragraph * max(1, settings.page_weight_kb * 1024 // len(paragraph))
+    return f"""<h1>Fixture page {page_id}</h1>
+<p>This is synthetic content for page {page_id}.</p>
+{links}
+{padding}"""
+
+
+def render_page(page_id: int, settings: FixtureSiteSettings) -> str:
+    return f"""<!doctype html>
+<html>
+<head><title>Fixture page {page_id}</title></head>
+<body>
+<main id="content">
+{render_content(page_id, settings)}</main>
+{SPA_SCRIPT if settings.spa else ""}</body>
+</html>"""
+
+
+def create_fixture_site(settings: Optional[FixtureSiteSettings] = None) -> FastAPI:
+    settings = settings or FixtureSiteSettings()
+    app = FastAPI(title="Fixture site")
+
+    @app.get("/", response_class=HTMLResponse)
+    async def index():
+        return render_page(0, settings)
+
+    @app.get("/page/{page_id}", response_class=HTMLResponse)
+    async def page(page_id: int):
+        if page_id >= settings.pages:
+            return HTMLResponse("Not found", status_code=404)
+        if is_slow(page_id, settings):
+            await asyncio.sleep(settings.slow_seconds)
+        return render_page(page_id, settings)
+
+    @app.get("/api/page/{page_id}")
+    async def page_data(page_id: int):
+        if page_id >= settings.pages:
+            return JSONResponse({"error": "Not found"}, status_code=404)
+        if is_slow(page_id, settings):
+            await asyncio.sleep(settings.slow_seconds)
+        return {"title": f"Fixture page {page_id}", "content": render_content(page_id, settings)}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--js-rendering", action="store_true")
+    parser.add_argument("--page-weight-kb", type=int, default=0)
+    parser.add_argument("--slow-every", type=int, default=0)
+    parser.add_argument("--slow-seconds", type=float, default=2.0)
+    parser.add_argument("--spa", action="store_true")
+    args = parser.parse_args()
+    settings = FixtureSiteSettings(
+        pages=args.pages,
+        fanout=args.fanout,
+        js_rendering=args.js_rendering,
+        page_weight_kb=args.page_weight_kb,
+        slow_every=args.slow_every,
+        slow_seconds=args.slow_seconds,
+        spa=args.spa,
+    )
+    uvicorn.run(create_fixture_site(settings), host="127.0.0.1", port=args.port)
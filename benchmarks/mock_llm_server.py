@@ -0,0 +1,150 @@
+'''
+Mock OpenAI-compatible chat completions server with latency and fault injection.
+
+Run standalone with:
+    python -m benchmarks.mock_llm_server --port 8100 --error-rate 0.2
+'''
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+
+class MockLLMSettings(BaseModel):
+    """Behaviour of the mock LLM; can be changed at runtime through POST /mock/settings"""
+    latency_median: float = Field(default=0.2, description="Median response latency in seconds")
+    latency_sigma: float = Field(default=0.0, description="Sigma of the log-normal latency distribution, 0 for fixed latency")
+    error_rate: float = Field(default=0.0, description="Fraction of requests answered with HTTP 500")
+    rate_limit_rate: float = Field(default=0.0, description="Fraction of requests answered with HTTP 429")
+    retry_after: Optional[float] = Field(default=None, description="Retry-After seconds sent with 429 responses")
+    hang_rate: float = Field(default=0.0, description="Fraction of requests that hang for hang_seconds before answering")
+    hang_seconds: float = Field(default=60.0, description="How long a hanging request stalls")
+    malformed_rate: float = Field(default=0.0, description="Fraction of replies that are not valid JSON")
+    click_fanout: int = Field(default=2, description="Number of interactables the canned decision clicks")
+    confidence: float = Field(default=0.9, description="Confidence reported in canned decisions")
+    satisfied_marker: Optional[str] = Field(default=None, description="Report the instruction satisfied once this text appears in the prompt")
+    seed: Optional[int] = Field(default=None, description="Seed for reproducible fault and latency sequences")
+
+
+KEY_PATTERN = re.compile(r"'key': '((?:[^'\\]|\\.)*)'")
+BATCH_PAGE_PATTERN = re.compile(r"### Page (\S+)")
+
+
+def canned_decision(prompt: str, settings: MockLLMSettings) -> dict:
+    """Click the first `click_fanout` interactables listed in the prompt, or stop if there are none"""
+    keys = KEY_PATTERN.findall(prompt)[:settings.click_fanout]
+    actions = [
+        {"action": "click", "target": key, "reason": "mock decision", "goal": f"explore {key}"}
+        for key in keys
+    ] or [{"action": "stop", "reason": "nothing to click"}]
+    decision = {"summary": "Mock summary of the page.", "actions": actions, "confidence": settings.confidence}
+    if settings.satisfied_marker is not None and settings.satisfied_marker in prompt:
+        decision.update(instruction_satisfied=True, satisfaction_confidence=settings.confidence)
+    return decision
+
+
+def canned_batch_decision(prompt: str, settings: MockLLMSettings) -> Optional[dict]:
+    """Decisions keyed by page URL for a batched prompt, or None if the prompt is for a single page"""
+    parts = BATCH_PAGE_PATTERN.split(prompt)
+    if len(parts) < 3:
+        return None
+    # split() alternates text and captured URLs: [preamble, url1, section1, url2, section2, ...]
+    return {url: canned_decision(section, settings) for url, section in zip(parts[1::2], parts[2::2])}
+
+
+def create_mock_llm_app(settings: Optional[MockLLMSettings] = None) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    app.state.settings = settings or MockLLMSettings()
+    app.state.random = random.Random(app.state.settings.seed)
+    app.state.stats = Counter()
+
+    def latency() -> float:
+        s = app.state.settings
+        if s.latency_sigma <= 0:
+            return s.latency_median
+        return app.state.random.lognormvariate(math.log(max(s.latency_median, 1e-6)), s.latency_sigma)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        s = app.state.settings
+        rng = app.state.random
+        body = await request.json()
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        app.state.stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < s.error_rate:
+            app.state.stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "injected server error"}})
+        roll -= s.error_rate
+        if roll < s.rate_limit_rate:
+            app.state.stats["rate_limited"] += 1
+            headers = {"Retry-After": str(s.retry_after)} if s.retry_after is not None else {}
+            return JSONResponse(status_code=429, content={"error": {"message": "injected rate limit"}}, headers=headers)
+        roll -= s.rate_limit_rate
+        if roll < s.hang_rate:
+            app.state.stats["hangs"] += 1
+            await asyncio.sleep(s.hang_seconds)
+        else:
+            await asyncio.sleep(latency())
+
+        if rng.random() < s.malformed_rate:
+            app.state.stats["malformed"] += 1
+            content = "I think you should click something, but I will not say which."
+        else:
+            batch = canned_batch_decision(prompt, s)
+            if batch is not None:
+                app.state.stats["batched"] += 1
+            content = "```json\n" + json.dumps(batch if batch is not None else canned_decision(prompt, s)) + "\n```"
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        app.state.stats["completed"] += 1
+        return {
+            "id": f"mock-{app.state.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @app.post("/mock/settings")
+    async def update_settings(update: dict):
+        app.state.settings = app.state.settings.model_copy(update=update)
+        return app.state.settings.model_dump()
+
+    @app.get("/mock/stats")
+    async def stats():
+        return dict(app.state.stats)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    for name, field in MockLLMSettings.model_fields.items():
+        if name == "seed":
+            parser.add_argument("--seed", type=int, default=None)
+        elif name == "retry_after":
+            parser.add_argument("--retry-after", type=float, default=None)
+        elif name == "satisfied_marker":
+            parser.add_argument("--satisfied-marker", default=None, help=field.description)
+        else:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=type(field.default), default=field.default, help=field.description)
+    args = vars(parser.parse_args())
+    port = args.pop("port")
+    uvicorn.run(create_mock_llm_app(MockLLMSettings(**args)), host="127.0.0.1", port=port)
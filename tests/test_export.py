@@ -0,0 +1,130 @@
+import asyncio
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from app.config.strigil_config import ExportConfig
+from app.schemas.context_schema import PageContext, PageDetails
+from app.schemas.error_schema import WebScraperError
+from app.services import export
+from app.services.export import JsonlSink, ResultExporter, SqliteSink, error_row
+
+
+def error(index: int) -> WebScraperError:
+    return WebScraperError(error_type="network_error", message=f"error {index}", details={"index": index})
+
+
+def page(index: int) -> PageContext:
+    return PageContext(depth=0, details=PageDetails(f"https://example.com/{index}", "Title", "Text", []), summary="Summary", actions=[])
+
+
+def rows(count: int):
+    return [error_row("crawl", error(index)) for index in range(count)]
+
+
+class BlockingSink(JsonlSink):
+    """JSONL sink whose writes wait until the test releases them"""
+    release = threading.Event()
+
+    def write(self, kind, rows):
+        self.release.wait(timeout=10)
+        super().write(kind, rows)
+
+
+@pytest.fixture
+def blocking_sink(monkeypatch):
+    BlockingSink.release = threading.Event()
+    monkeypatch.setitem(export.SINKS, "jsonl", BlockingSink)
+    yield BlockingSink.release
+    BlockingSink.release.set()
+
+
+def read_jsonl(files):
+    return [json.loads(line) for path in files for line in open(path)]
+
+
+def test_jsonl_sink_rotates_files(tmp_path):
+    sink = JsonlSink(tmp_path, ExportConfig(rotate_bytes=200))
+    for _ in range(3):
+        sink.write("error", rows(2))
+    sink.close()
+    assert len(sink.files) == 3
+    assert [path.rsplit("/", 1)[1] for path in sink.files] == ["results-00001.jsonl", "results-00002.jsonl", "results-00003.jsonl"]
+    assert len(read_jsonl(sink.files)) == 6
+
+
+def test_jsonl_sink_keeps_writing_to_a_file_below_the_limit(tmp_path):
+    sink = JsonlSink(tmp_path, ExportConfig(rotate_bytes=10 * 1024 * 1024))
+    for _ in range(3):
+        sink.write("error", rows(2))
+    sink.close()
+    assert len(sink.files) == 1
+    assert {record["kind"] for record in read_jsonl(sink.files)} == {"error"}
+
+
+def test_sqlite_sink_rotates_files(tmp_path):
+    sink = SqliteSink(tmp_path, ExportConfig(rotate_bytes=1))
+    sink.write("error", rows(2))
+    sink.write("error", rows(3))
+    sink.close()
+    assert len(sink.files) == 2
+    counts = [sqlite3.connect(path).execute("SELECT COUNT(*) FROM errors").fetchone()[0] for path in sink.files]
+    assert counts == [2, 3]
+
+
+def test_exporter_writes_pages_and_errors(tmp_path):
+    async def run():
+        exporter = ResultExporter("crawl", ExportConfig(sinks=["jsonl"], directory=str(tmp_path), flush_interval=0.05))
+        exporter.start()
+        exporter.on_page(page(0))
+        exporter.on_error(error(0))
+        return await exporter.close()
+
+    result = asyncio.run(run())
+    assert (result.pages, result.errors, result.failures) == (1, 1, [])
+    records = read_jsonl(result.files)
+    assert sorted(record["kind"] for record in records) == ["error", "page"]
+    assert next(record for record in records if record["kind"] == "page")["url"] == "https://example.com/0"
+
+
+def test_full_queue_applies_back_pressure_without_blocking(tmp_path, blocking_sink):
+    async def run():
+        settings = ExportConfig(sinks=["jsonl"], directory=str(tmp_path), max_queue=2, batch_size=1, flush_interval=0.05)
+        exporter = ResultExporter("crawl", settings)
+        exporter.start()
+        for index in range(8):
+            # Returns at once although the writer is stuck
+            exporter.on_page(page(index))
+        assert exporter._overflow
+        waiting = asyncio.create_task(exporter.wait_for_room())
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        blocking_sink.set()
+        await asyncio.wait_for(waiting, timeout=5)
+        assert not exporter._overflow
+        return await exporter.close()
+
+    result = asyncio.run(run())
+    assert result.pages == 8
+    assert [record["url"] for record in read_jsonl(result.files)] == [f"https://example.com/{index}" for index in range(8)]
+
+
+def test_overflowing_error_records_are_dropped(tmp_path, blocking_sink):
+    async def run():
+        settings = ExportConfig(sinks=["jsonl"], directory=str(tmp_path), max_queue=1, batch_size=1, flush_interval=0.05)
+        exporter = ResultExporter("crawl", settings)
+        exporter.start()
+        for index in range(20):
+            exporter.on_error(error(index))
+        assert len(exporter._overflow) <= settings.max_queue
+        dropped = exporter.dropped_errors
+        blocking_sink.set()
+        return dropped, await exporter.close()
+
+    dropped, result = asyncio.run(run())
+    assert dropped > 0
+    assert result.errors == 20 - dropped
+    assert len(read_jsonl(result.files)) == result.errors
+    assert result.failures == [f"{dropped} error records dropped while the export queue was full"]
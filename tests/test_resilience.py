@@ -0,0 +1,136 @@
+import pytest
+
+from app.config.strigil_config import config
+from app.schemas.error_schema import RetryError
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock) -> CircuitBreaker:
+    monkeypatch.setattr(resilience, "time", clock)
+    monkeypatch.setattr(config.resilience, "breaker_failure_threshold", 3)
+    monkeypatch.setattr(config.resilience, "breaker_reset_timeout", 10.0)
+    return CircuitBreaker("test")
+
+
+def open_circuit(breaker: CircuitBreaker) -> None:
+    for _ in range(config.resilience.breaker_failure_threshold):
+        breaker.record_failure()
+
+
+def notice(attempt: int) -> RetryError:
+    return RetryError(error_type="llm_retry", message=f"retry {attempt}", details={})
+
+
+def test_retry_budget_records_retries_until_exhausted():
+    errors = []
+    budget = RetryBudget(2, errors)
+    assert budget.take(notice(1))
+    assert budget.take(notice(2))
+    assert not budget.take(notice(3))
+    assert budget.used == 2
+    assert [error.message for error in errors] == ["retry 1", "retry 2"]
+
+
+def test_retry_budget_of_zero_allows_no_retry():
+    budget = RetryBudget(0)
+    assert not budget.take(notice(1))
+    assert budget.errors == []
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 1
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.failures == 1
+
+
+def test_open_breaker_rejects_calls_until_the_reset_timeout(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(4.0)
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.retry_in == pytest.approx(6.0)
+    assert breaker.rejected == 1
+
+
+def test_probe_success_closes_the_circuit(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(10.0)
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_probe_failure_opens_the_circuit_again(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(10.0)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+    assert breaker.retry_in() == pytest.approx(10.0)
+
+
+def test_only_one_probe_at_a_time(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(10.0)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_lets_the_next_call_probe(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(10.0)
+    breaker.before_call()
+    # E.g. the probe was a hedge loser and got cancelled
+    breaker.release_probe()
+    assert breaker.state == "open"
+    assert breaker.retry_in() == 0.0
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+
+
+def test_release_probe_outside_half_open_does_nothing(breaker):
+    breaker.release_probe()
+    assert breaker.state == "closed"
+    open_circuit(breaker)
+    opened_at = breaker.opened_at
+    breaker.release_probe()
+    assert breaker.state == "open"
+    assert breaker.opened_at == opened_at
+
+
+def test_unresolved_probe_expires_after_the_reset_timeout(breaker, clock):
+    open_circuit(breaker)
+    clock.advance(10.0)
+    breaker.before_call()
+    clock.advance(9.0)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(1.0)
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    assert breaker.probe_started_at == clock.now
+
+
+def test_breaker_for_returns_one_breaker_per_backend(monkeypatch):
+    monkeypatch.setattr(resilience, "breakers", {})
+    assert resilience.breaker_for("a") is resilience.breaker_for("a")
+    assert resilience.breaker_for("a") is not resilience.breaker_for("b")
@@ -0,0 +1,94 @@
+import pytest
+
+from app.config.strigil_config import SummaryStoreConfig
+from app.schemas.context_schema import Interactable, PageDetails
+from app.services import summary_store as summary_store_module
+from app.services.summary_store import SummaryStore, structural_digest
+
+
+def page(url: str = "https://example.com/a", text: str = "Heading\nSome longer body text of the page") -> PageDetails:
+    return PageDetails(url, "Title", text, [Interactable("a", "Next", "/next", "Next")])
+
+
+@pytest.fixture
+def store(monkeypatch, clock) -> SummaryStore:
+    monkeypatch.setattr(summary_store_module, "time", clock)
+    return SummaryStore(SummaryStoreConfig(max_entries=2, max_age=100.0))
+
+
+def test_stored_summary_is_served_for_the_same_content(store):
+    store.put(page(), "About A")
+    entry = store.get(page())
+    assert entry.summary == "About A"
+    assert entry.uses == 1
+    assert (store.hits, store.misses) == (1, 0)
+
+
+def test_changed_content_misses(store):
+    store.put(page(), "About A")
+    assert store.get(page(text="Other text")) is None
+    assert store.misses == 1
+
+
+def test_url_is_canonicalized(store):
+    store.put(page("https://example.com/a?b=2&a=1"), "About A")
+    assert store.get(page("https://example.com/a?a=1&b=2")) is not None
+
+
+def test_least_recently_used_summary_is_evicted(store):
+    store.put(page("https://example.com/a"), "A")
+    store.put(page("https://example.com/b"), "B")
+    # Reading A makes B the least recently used
+    store.get(page("https://example.com/a"))
+    store.put(page("https://example.com/c"), "C")
+    assert store.evictions == 1
+    assert store.peek(page("https://example.com/b")) is None
+    assert store.peek(page("https://example.com/a")) is not None
+    assert store.peek(page("https://example.com/c")) is not None
+
+
+def test_stale_summary_is_not_served(store, clock):
+    store.put(page(), "About A")
+    clock.advance(101.0)
+    assert store.peek(page()) is None
+    assert store.get(page()) is None
+    assert store.stale == 1
+    assert store.misses == 1
+    assert store.stats()["stale_entries"] == 1
+
+
+def test_writing_again_replaces_a_stale_summary(store, clock):
+    store.put(page(), "Old")
+    clock.advance(101.0)
+    store.put(page(), "New")
+    assert store.get(page()).summary == "New"
+    assert len(store.entries) == 1
+
+
+def test_peek_does_not_count_a_lookup(store):
+    store.put(page(), "About A")
+    assert store.peek(page()) is not None
+    assert store.peek(page("https://example.com/missing")) is None
+    assert (store.hits, store.misses) == (0, 0)
+
+
+def test_empty_summary_is_not_stored(store):
+    store.put(page(), "  ")
+    assert store.entries == {}
+
+
+def test_disabled_store_stores_and_serves_nothing(monkeypatch, clock):
+    monkeypatch.setattr(summary_store_module, "time", clock)
+    store = SummaryStore(SummaryStoreConfig(enabled=False))
+    store.put(page(), "About A")
+    assert store.get(page()) is None
+    assert store.entries == {}
+    assert store.misses == 0
+
+
+def test_structural_digest_lists_short_lines_once_within_the_limit():
+    details = page(text="Menu\nMenu\nA paragraph that is considerably longer than eighty characters and so is not a heading at all")
+    digest = structural_digest(details, 1000)
+    assert "1 links, 0 other controls" in digest
+    assert digest.endswith("Outline: Menu")
+    assert len(structural_digest(details, 20)) == 20